@@ -50,4 +50,173 @@ WEATHER_CACHE_ENABLED = True
 HISTORICAL_WEATHER_LOOKBACK_DAYS = 30  # Days of historical weather to fetch
 WEATHER_API_TIMEOUT = 30  # seconds
 
+# Historical weather archive: daily values per (grid cell, date) in SQLite.
+# Range queries are served locally; only missing days are fetched.
+WEATHER_ARCHIVE_PATH = CACHE_DIR / "weather_archive.db"
+WEATHER_ARCHIVE_GRID_DEG = 0.1  # ~11 km, finer than the reanalysis grid
+WEATHER_ARCHIVE_MAX_ROWS = int(os.getenv("WEATHER_ARCHIVE_MAX_ROWS", "2000000"))  # ~200 MB on disk
+WEATHER_ARCHIVE_FINAL_AFTER_DAYS = 7  # newer days may still be back-filled upstream
 
+# Offline climatology: per-station day-of-year statistics from the bundled
+# 2020-2024 archive, interpolated to any point by inverse distance weighting
+CLIMATOLOGY_SOURCE_PATH = DATA_DIR / "weather" / "vietnam_weather_2020_2024.json"
+CLIMATOLOGY_CACHE_PATH = CACHE_DIR / "climatology.npz"
+CLIMATOLOGY_WINDOW_DAYS = 7  # +/- days pooled around each day of year
+CLIMATOLOGY_QUANTILES = (0.1, 0.5, 0.9)
+CLIMATOLOGY_IDW_POWER = 2.0
+
+# Flattened weather training frame (per-province daily rows with lag features)
+WEATHER_TRAINING_CACHE_PATH = CACHE_DIR / "weather_training.npz"
+
+# Batch weather outlook: all provinces rolled forward together, cached per
+# model version and start date so the national outlook is computed once a day
+WEATHER_OUTLOOK_DAYS = 7  # horizon computed (and cached) for every batch
+WEATHER_BATCH_MAX_DAYS = 14
+WEATHER_OUTLOOK_CACHE_ENTRIES = 4
+
+
+
+# Response cache for read-mostly endpoints (e.g. /api/v1/hazard/zones)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_GZIP_LEVEL = 6
+
+# Server-sent events (/api/v1/events/stream)
+SSE_HEARTBEAT_SECONDS = 15
+SSE_QUEUE_SIZE = 100  # Per-client backlog before a slow client is disconnected
+SSE_REPLAY_BUFFER = 256  # Recent events kept for Last-Event-ID resume
+HIGH_PRIORITY_SCORE_THRESHOLD = float(os.getenv("HIGH_PRIORITY_SCORE_THRESHOLD", "70"))
+
+# Inference executor: CPU-bound model calls run in per-model thread pools
+# instead of on the event loop. Keep sum(workers * native threads) <= cores.
+INFERENCE_OFFLOAD = os.getenv("INFERENCE_OFFLOAD", "1") == "1"
+INFERENCE_THREADS = {
+    'scorer': int(os.getenv("INFERENCE_THREADS_SCORER", "2")),
+    'duplicate': int(os.getenv("INFERENCE_THREADS_DUPLICATE", "1")),
+    'hazard': int(os.getenv("INFERENCE_THREADS_HAZARD", "2")),
+    'weather': int(os.getenv("INFERENCE_THREADS_WEATHER", "1")),
+    'weather_api': int(os.getenv("INFERENCE_THREADS_WEATHER_API", "8")),  # Blocking HTTP, not CPU
+}
+INFERENCE_N_JOBS = 1  # joblib workers per prediction (training still uses -1)
+INFERENCE_BLAS_THREADS = int(os.getenv("INFERENCE_BLAS_THREADS", "1"))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "2"))
+
+# Admission control: per-endpoint priority queues with fast 429 + Retry-After.
+# Concurrency matches the inference budget so queueing happens in priority order.
+ADMISSION_LIMITS = {
+    'score': {
+        'concurrency': INFERENCE_THREADS['scorer'],
+        'max_queue': int(os.getenv("ADMISSION_MAX_QUEUE_SCORE", "200")),
+        'max_wait_ms': float(os.getenv("ADMISSION_MAX_WAIT_MS_SCORE", "2000")),
+    },
+    'duplicate': {
+        'concurrency': INFERENCE_THREADS['duplicate'],
+        'max_queue': int(os.getenv("ADMISSION_MAX_QUEUE_DUPLICATE", "100")),
+        'max_wait_ms': float(os.getenv("ADMISSION_MAX_WAIT_MS_DUPLICATE", "3000")),
+    },
+}
+
+# Overload degradation: cheaper model paths (Jaccard duplicates, no live weather,
+# no per-tree confidence) when CPU or queue depth crosses the high watermark.
+# Full quality resumes once both stay below the low watermark for the hold time.
+DEGRADE_ENABLED = os.getenv("DEGRADE_ENABLED", "1") == "1"
+DEGRADE_CPU_HIGH = float(os.getenv("DEGRADE_CPU_HIGH", "90"))
+DEGRADE_CPU_LOW = float(os.getenv("DEGRADE_CPU_LOW", "70"))
+DEGRADE_QUEUE_HIGH = int(os.getenv("DEGRADE_QUEUE_HIGH", "50"))
+DEGRADE_QUEUE_LOW = int(os.getenv("DEGRADE_QUEUE_LOW", "10"))
+DEGRADE_RECOVER_SECONDS = float(os.getenv("DEGRADE_RECOVER_SECONDS", "10"))
+DEGRADE_CHECK_INTERVAL = 1.0  # seconds between load samples
+
+# Per-request deadlines: clients send their remaining budget in milliseconds.
+# Downstream timeouts (weather API, inference) are taken from what is left.
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+DEADLINE_MAX_MS = 60000  # clamp client-supplied budgets
+DEADLINE_RESERVE_MS = 50  # kept back to assemble the (partial) response
+DEADLINE_MIN_TIMEOUT = 0.05  # seconds; floor for derived HTTP timeouts (requests rejects 0)
+
+# Open-Meteo resilience: serve stale weather while refreshing in the background,
+# and stop calling upstream for a cool-down after repeated failures.
+WEATHER_FRESH_SECONDS = {'current': 600, 'forecast': 3600}
+WEATHER_STALE_SECONDS = 6 * 3600  # oldest entry still served while refreshing
+WEATHER_SWR_MAX_ENTRIES = 1024
+WEATHER_BREAKER_FAILURES = int(os.getenv("WEATHER_BREAKER_FAILURES", "5"))
+WEATHER_BREAKER_COOLDOWN_SECONDS = float(os.getenv("WEATHER_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Cache pre-warming: refresh weather and hazard predictions in the background
+# for provinces expected to see traffic (configured list, else seasonal high risk)
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1") == "1"
+PREWARM_INTERVAL_SECONDS = float(os.getenv("PREWARM_INTERVAL_SECONDS", "300"))
+PREWARM_PROVINCES = [p.strip() for p in os.getenv("PREWARM_PROVINCES", "").split(",") if p.strip()]
+PREWARM_MAX_PROVINCES = 15
+PREWARM_MIN_SEASONAL_RISK = 4.0  # base risk x seasonal multiplier
+PREWARM_POINTS_PER_PROVINCE = 10  # recently requested points kept per province
+PREWARM_DEMAND_TTL_SECONDS = 6 * 3600
+
+# Materialized risk outlook: every province x hazard type x next N days,
+# recomputed in the background; changed risk levels go to a change feed
+RISK_OUTLOOK_ENABLED = os.getenv("RISK_OUTLOOK_ENABLED", "1") == "1"
+RISK_OUTLOOK_INTERVAL_SECONDS = float(os.getenv("RISK_OUTLOOK_INTERVAL_SECONDS", "1800"))
+RISK_OUTLOOK_DAYS = 7
+RISK_OUTLOOK_CHANGE_BUFFER = 5000  # changes kept for /api/v1/hazard/outlook/changes
+
+# Collector polling: every feed on its own adaptive interval, polled
+# concurrently with at most INGESTION_HOST_CONCURRENCY requests per host
+INGESTION_ENABLED = os.getenv("INGESTION_ENABLED", "0") == "1"
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "8"))
+INGESTION_HOST_CONCURRENCY = 1
+INGESTION_HOST_MIN_GAP_SECONDS = 1.0  # between polls of the same host
+INGESTION_BASE_INTERVAL_SECONDS = float(os.getenv("INGESTION_BASE_INTERVAL_SECONDS", "300"))
+INGESTION_MIN_INTERVAL_SECONDS = 60  # while a source keeps producing new items
+INGESTION_MAX_INTERVAL_SECONDS = 1800  # quiet or failing sources
+INGESTION_SPEEDUP = 0.5  # interval multiplier after a poll with new items
+INGESTION_SLOWDOWN = 1.5  # interval multiplier after a quiet poll
+
+# Shared outbound HTTP for the alert collectors: pooled connections,
+# conditional GETs against an on-disk ETag/Last-Modified cache, jittered retries
+HTTP_CACHE_DIR = CACHE_DIR / "http"
+HTTP_TIMEOUT_SECONDS = 30
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))  # after the first attempt
+HTTP_BACKOFF_BASE_SECONDS = 0.5
+HTTP_BACKOFF_MAX_SECONDS = 8.0
+HTTP_POOL_MAXSIZE = 4  # keep-alive connections per host
+HTTP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# Seen-item filter: items already ingested (by canonical link or content
+# hash) are skipped before classification. Bloom filter in memory, exact
+# keys in SQLite.
+SEEN_ITEMS_PATH = CACHE_DIR / "seen_items.db"
+SEEN_ITEMS_CAPACITY = 200000  # Bloom filter sized for this many keys
+SEEN_ITEMS_ERROR_RATE = 0.01
+SEEN_ITEMS_RETENTION_DAYS = 60
+
+# NCHMF archive paging for fetch_historical_warnings: pages are fetched
+# newest-first, NCHMF_HISTORY_CONCURRENCY at a time, until one is older
+# than the requested window
+NCHMF_ARCHIVE_URL = os.getenv("NCHMF_ARCHIVE_URL", "http://nchmf.gov.vn/KttvsWeb/vi-VN/1/index.html?page={page}")
+NCHMF_HISTORY_CONCURRENCY = 4
+NCHMF_HISTORY_MAX_PAGES = 50
+
+# Ingestion pipeline: polled collector alerts flow through normalize ->
+# dedupe -> score -> persist stages over bounded queues; a full queue
+# blocks the stage before it (and finally the collectors)
+PIPELINE_QUEUE_SIZE = 500  # alerts per stage queue
+PIPELINE_BATCH_SIZE = 32  # alerts per duplicate-detection / scoring model call
+PIPELINE_BATCH_WAIT_SECONDS = 0.5  # longest wait to fill a batch
+PIPELINE_SUBMIT_TIMEOUT_SECONDS = 30.0  # collectors block this long on a full pipeline; the rest waits for the next poll
+PIPELINE_DEDUPE_WINDOW = 500  # recently accepted alerts new ones are compared with
+PIPELINE_DEDUPE_HOURS = 48
+PIPELINE_STAGE_RETRIES = 2  # retries of a failed stage batch before it is dead-lettered
+PIPELINE_RETRY_BACKOFF_SECONDS = 1.0  # times the attempt number
+
+# Offline geocoder: province coordinates plus this district centroid table
+GEO_DISTRICTS_PATH = DATA_DIR / "geo" / "vietnam_districts.csv"
+
+# Historical event store: events indexed by (province, month) plus the
+# precomputed seasonal pattern table served by get_seasonal_patterns
+HISTORICAL_EVENTS_PATH = TRAINING_DIR / "historical_events.db"
+HISTORICAL_EVENTS_START_YEAR = 2000
+
+# Kaggle ingestion (scripts/ingest_kaggle_datasets.py): downloaded CSVs
+# are read in chunks, normalized to (province, date, hazard_type,
+# severity) and appended to columnar parts partitioned by type and year
+HAZARD_EVENTS_DIR = DATA_DIR / "kaggle" / "hazard_events"
+KAGGLE_INGEST_CHUNK_ROWS = 100000  # CSV rows held in memory at a time
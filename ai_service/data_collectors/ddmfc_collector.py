@@ -6,8 +6,15 @@ Reliability: 1.0 (100%) - Official Government Source
 import feedparser
 import requests
 from datetime import datetime
+from pathlib import Path
 from typing import List, Dict, Optional
 import time
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from data_collectors.http_client import CachedHttpClient, get_shared_client
+from data_collectors.seen_items import SEEN_KEYS_FIELD, SeenItemFilter, item_id
+from data_collectors.text_matcher import get_matcher
 
 
 class DDMFCCollector:
@@ -26,21 +33,36 @@ class DDMFCCollector:
         f"{BASE_URL}/tin-tuc/rss",
     ]
     
-    def __init__(self, delay_seconds: float = 1.0):
+    def __init__(
+        self,
+        delay_seconds: float = 1.0,
+        http_client: CachedHttpClient = None,
+        seen_filter: SeenItemFilter = None
+    ):
         """
         Initialize collector
         
         Args:
             delay_seconds: Delay between requests
+            http_client: HTTP client (default: the shared pooled, caching client)
+            seen_filter: If given, entries seen in earlier runs are skipped
+                         before parsing and only new alerts returned
         """
         self.delay_seconds = delay_seconds
+        self.http = http_client or get_shared_client()
+        self.seen_filter = seen_filter
+        self.matcher = get_matcher()
+        self._parsed_feeds = {}  # rss_url -> entries of the last downloaded copy
     
-    def fetch_alerts(self, max_alerts: int = 50) -> List[Dict]:
+    def fetch_alerts(self, max_alerts: int = 50, mark_seen: bool = True) -> List[Dict]:
         """
         Fetch disaster alerts from DDMFC RSS feeds
         
         Args:
             max_alerts: Maximum number of alerts to fetch
+            mark_seen: Mark returned alerts seen now. With False they carry
+                       their keys (SEEN_KEYS_FIELD) and the consumer marks
+                       them with SeenItemFilter.mark_items once stored
             
         Returns:
             List of alert dicts with structure:
@@ -60,22 +82,42 @@ class DDMFCCollector:
             }
         """
         all_alerts = []
+        feed_found = False
         
         for rss_url in self.RSS_FEEDS:
             try:
                 print(f"[DDMFC] Trying RSS feed: {rss_url}")
-                feed = feedparser.parse(rss_url)
+                entries = self._feed_entries(rss_url)
                 
-                if feed.entries:
-                    print(f"[DDMFC] Found {len(feed.entries)} entries in feed")
+                if entries:
+                    print(f"[DDMFC] Found {len(entries)} entries in feed")
+                    seen_keys = []
                     
-                    for entry in feed.entries[:max_alerts]:
+                    for entry in entries[:max_alerts]:
+                        # Skip entries already processed in an earlier run
+                        if self.seen_filter is not None:
+                            keys = self.seen_filter.keys(
+                                entry.get('link', ''), entry.get('title', ''), entry.get('summary', '')
+                            )
+                            if self.seen_filter.seen(keys):
+                                feed_found = True
+                                continue
+                            seen_keys.extend(keys)
+                        
                         alert = self._parse_rss_entry(entry)
                         if alert:
+                            if self.seen_filter is not None:
+                                del seen_keys[-len(keys):]
+                                alert[SEEN_KEYS_FIELD] = [key.hex() for key in keys]
                             all_alerts.append(alert)
                     
-                    # If we got results from this feed, use it
-                    if all_alerts:
+                    if self.seen_filter is not None:
+                        self.seen_filter.mark(seen_keys, source='DDMFC')
+                        if mark_seen:
+                            self.seen_filter.mark_items(all_alerts)
+                    
+                    # If we got results from this feed (new or already seen), use it
+                    if all_alerts or feed_found:
                         break
                 
                 time.sleep(self.delay_seconds)
@@ -85,13 +127,23 @@ class DDMFCCollector:
                 continue
         
         # If RSS feeds don't work, try web scraping
-        if not all_alerts:
+        if not all_alerts and not feed_found:
             print("[DDMFC] RSS feeds not available, trying web scraping...")
             all_alerts = self._fetch_from_website(max_alerts)
         
         print(f"[DDMFC] Fetched {len(all_alerts)} alerts")
         return all_alerts
     
+    def _feed_entries(self, rss_url: str) -> list:
+        """Entries of a feed, re-parsed only when the server sent a new copy"""
+        response = self.http.get(rss_url)
+        if response.not_modified and rss_url in self._parsed_feeds:
+            return self._parsed_feeds[rss_url]
+        
+        entries = feedparser.parse(response.content).entries
+        self._parsed_feeds[rss_url] = entries
+        return entries
+    
     def _parse_rss_entry(self, entry) -> Optional[Dict]:
         """
         Parse RSS entry into structured alert dict
@@ -109,13 +161,14 @@ class DDMFCCollector:
             published = entry.get('published', '')
             created_at = self._parse_rss_date(published)
             
-            # Extract severity and type from content
-            severity = self._extract_severity(title + " " + content)
-            alert_type = self._extract_alert_type(title + " " + content)
-            province = self._extract_province(title + " " + content)
+            # Extract severity, type and province in one scan
+            analysis = self.matcher.analyze(title + " " + content)
+            severity = analysis['severity']
+            alert_type = analysis['alert_type']
+            province = analysis['province']
             
             # Generate ID
-            alert_id = f"DDMFC_{int(created_at.timestamp())}"
+            alert_id = item_id("DDMFC", created_at, link, title, summary)
             
             return {
                 'id': alert_id,
@@ -166,60 +219,6 @@ class DDMFCCollector:
         
         return datetime.now()
     
-    def _extract_severity(self, text: str) -> str:
-        """Extract severity from text"""
-        text_lower = text.lower()
-        
-        if any(kw in text_lower for kw in ['nghiêm trọng', 'cực kỳ', 'khẩn cấp', 'cấp độ 4']):
-            return 'critical'
-        elif any(kw in text_lower for kw in ['cao', 'nguy hiểm', 'cấp độ 3']):
-            return 'high'
-        elif any(kw in text_lower for kw in ['trung bình', 'cấp độ 2']):
-            return 'medium'
-        else:
-            return 'medium'
-    
-    def _extract_alert_type(self, text: str) -> str:
-        """Extract alert type from text"""
-        text_lower = text.lower()
-        
-        if any(kw in text_lower for kw in ['sơ tán', 'evacuation']):
-            return 'evacuation'
-        elif any(kw in text_lower for kw in ['lũ', 'lụt', 'flood', 'ngập']):
-            return 'disaster'
-        elif any(kw in text_lower for kw in ['bão', 'storm']):
-            return 'weather'
-        elif any(kw in text_lower for kw in ['thiên tai', 'disaster']):
-            return 'disaster'
-        else:
-            return 'general'
-    
-    def _extract_province(self, text: str) -> str:
-        """Extract province from text"""
-        # Same province list as NCHMF collector
-        provinces = [
-            'Hà Nội', 'Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ',
-            'An Giang', 'Bà Rịa - Vũng Tàu', 'Bạc Liêu', 'Bắc Giang', 'Bắc Kạn',
-            'Bắc Ninh', 'Bến Tre', 'Bình Định', 'Bình Dương', 'Bình Phước',
-            'Bình Thuận', 'Cà Mau', 'Cao Bằng', 'Đắk Lắk', 'Đắk Nông',
-            'Điện Biên', 'Đồng Nai', 'Đồng Tháp', 'Gia Lai', 'Hà Giang',
-            'Hà Nam', 'Hà Tĩnh', 'Hải Dương', 'Hậu Giang', 'Hòa Bình',
-            'Hưng Yên', 'Khánh Hòa', 'Kiên Giang', 'Kon Tum', 'Lai Châu',
-            'Lâm Đồng', 'Lạng Sơn', 'Lào Cai', 'Long An', 'Nam Định',
-            'Nghệ An', 'Ninh Bình', 'Ninh Thuận', 'Phú Thọ', 'Phú Yên',
-            'Quảng Bình', 'Quảng Nam', 'Quảng Ngãi', 'Quảng Ninh', 'Quảng Trị',
-            'Sóc Trăng', 'Sơn La', 'Tây Ninh', 'Thái Bình', 'Thái Nguyên',
-            'Thanh Hóa', 'Thừa Thiên Huế', 'Tiền Giang', 'Trà Vinh', 'Tuyên Quang',
-            'Vĩnh Long', 'Vĩnh Phúc', 'Yên Bái'
-        ]
-        
-        text_lower = text.lower()
-        for province in provinces:
-            if province.lower() in text_lower:
-                return province
-        
-        return 'Toàn quốc'
-    
     def _fetch_from_website(self, max_alerts: int) -> List[Dict]:
         """
         Fallback: Fetch from website if RSS not available
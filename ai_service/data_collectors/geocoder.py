@@ -0,0 +1,223 @@
+"""
+Offline gazetteer geocoder for alerts without coordinates
+
+Province coordinates come from VIETNAM_PROVINCES and district / city
+centroids from the bundled table data/geo/vietnam_districts.csv. All
+names sit in one character trie over normalized spellings, so a lookup
+or a scan of an alert's text needs no external geocoding service.
+"""
+import csv
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import GEO_DISTRICTS_PATH
+from data_collectors.text_matcher import NATIONWIDE, normalize, strip_diacritics
+from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
+
+# Other spellings of VIETNAM_PROVINCES keys (collectors say 'Hồ Chí Minh')
+PROVINCE_ALIASES = {
+    'Hồ Chí Minh': 'TP.HCM',
+    'Thành phố Hồ Chí Minh': 'TP.HCM',
+    'TP Hồ Chí Minh': 'TP.HCM',
+    'TPHCM': 'TP.HCM',
+    'Sài Gòn': 'TP.HCM',
+}
+# Administrative prefixes dropped from district lookups ("huyện Ba Vì")
+DISTRICT_PREFIXES = ('huyện ', 'thị xã ', 'thành phố ', 'tp ', 'tx ')
+
+# Words that mark the next name as a district in running text ("thị xã Duyên Hải")
+TEXT_PLACE_PREFIXES = DISTRICT_PREFIXES + ('quận ',)
+# Place names that are also ordinary words ("được vinh danh", "các tỉnh
+# duyên hải"): taken from text only right after an administrative prefix
+COMMON_WORD_PLACES = {'Vinh', 'Duyên Hải', 'Đông Hải', 'Tam Nông'}
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+_WORD_RE = re.compile(r'[^\W_]+')
+_TEXT_PREFIXES = tuple({spelling for p in TEXT_PLACE_PREFIXES for spelling in (p, strip_diacritics(p))})
+_END = ''  # trie key holding the entries of a complete name
+
+
+def _key(name: str) -> str:
+    """'Bà Rịa-Vũng Tàu' / 'bà rịa - vũng tàu' -> 'bà rịa vũng tàu'"""
+    return _NON_WORD_RE.sub(' ', normalize(name)).strip()
+
+
+class OfflineGeocoder:
+    """
+    Province and district centroids by name
+
+    Each name is stored under its normalized spelling and without
+    diacritics. A name used in several provinces (e.g. "Phong Điền") is
+    only resolved when the alert's province picks one of them; otherwise
+    the province coordinates are used.
+    """
+
+    def __init__(self, districts_path: Path = GEO_DISTRICTS_PATH):
+        self._root: Dict = {}
+        self._provinces: Dict[str, Dict] = {}
+
+        for name, data in VIETNAM_PROVINCES.items():
+            entry = {'name': name, 'province': name, 'level': 'province', 'lat': data['lat'], 'lng': data['lng']}
+            self._provinces[name] = entry
+            self._insert(name, entry)
+        for alias, name in PROVINCE_ALIASES.items():
+            self._insert(alias, self._provinces[name])
+
+        self.n_districts = 0
+        try:
+            with open(districts_path, encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    if row['province'] not in self._provinces:
+                        continue
+                    self._insert(row['district'], {
+                        'name': row['district'],
+                        'province': row['province'],
+                        'level': 'district',
+                        'lat': float(row['lat']),
+                        'lng': float(row['lng']),
+                    })
+                    self.n_districts += 1
+        except OSError as e:
+            print(f"[Geocoder] District table unavailable, provinces only: {e}")
+
+    def _insert(self, name: str, entry: Dict):
+        key = _key(name)
+        for spelling in {key, strip_diacritics(key)}:
+            node = self._root
+            for char in spelling:
+                node = node.setdefault(char, {})
+            entries = node.setdefault(_END, [])
+            if entry not in entries:
+                entries.append(entry)
+
+    def lookup(self, name: str) -> List[Dict]:
+        """Entries stored under exactly this name"""
+        node = self._root
+        for char in _key(name):
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get(_END, [])
+
+    def province(self, name: str) -> Optional[Dict]:
+        """Province entry for any spelling of a province name"""
+        if not name or name == NATIONWIDE:
+            return None
+        for entry in self.lookup(name):
+            if entry['level'] == 'province':
+                return entry
+        return None
+
+    @staticmethod
+    def _pick(entries: List[Dict], province: Optional[str]) -> Optional[Dict]:
+        """The one district among entries (within `province` when given)"""
+        districts = [e for e in entries if e['level'] == 'district' and (province is None or e['province'] == province)]
+        return districts[0] if len(districts) == 1 else None
+
+    def find_in_text(self, text: str, province: str = None) -> Optional[Dict]:
+        """
+        First place named in the text
+
+        Names are matched leftmost-longest on word boundaries; the first
+        district that resolves (within `province` when given) wins, else
+        the first province mentioned. A name only counts when written as
+        one (every word capitalized, or numbered as in "Quận 1") or right
+        after an administrative prefix ("huyện", "thị xã", "TP", ...);
+        COMMON_WORD_PLACES need the prefix.
+        """
+        words = _WORD_RE.findall(text or '')
+        proper = [word[0].isupper() or word[0].isdigit() for word in words]
+        text = ' '.join(_key(word) for word in words)
+        root, end = self._root, len(text)
+        first_province = None
+        i, w = 0, 0  # current word: char offset and index
+        while i < end:
+            prefixed = any(
+                text.startswith(prefix, i - len(prefix)) and (i == len(prefix) or text[i - len(prefix) - 1] == ' ')
+                for prefix in _TEXT_PREFIXES if len(prefix) <= i
+            )
+            node, j, k, match, match_end = root, i, w, None, i
+            while j < end:
+                node = node.get(text[j])
+                if node is None:
+                    break
+                if text[j] == ' ':
+                    k += 1
+                j += 1
+                if _END in node and (j == end or text[j] == ' '):
+                    entries = node[_END]
+                    if prefixed or (all(proper[w:k + 1]) and any(e['name'] not in COMMON_WORD_PLACES for e in entries)):
+                        match, match_end = entries, j
+            if match is not None:
+                district = self._pick(match, province)
+                if district is not None:
+                    return district
+                if first_province is None:
+                    first_province = next((e for e in match if e['level'] == 'province'), None)
+                w += text.count(' ', i, match_end) + 1
+                i = match_end + 1
+            else:
+                # Next word
+                space = text.find(' ', i)
+                i = end if space < 0 else space + 1
+                w += 1
+        return first_province
+
+    def geocode(self, province: str = None, district: str = None, text: str = None) -> Optional[Dict]:
+        """
+        Best known coordinates for an alert location
+
+        Tries the district name, then places named in `text`, then the
+        province. Returns {'name', 'province', 'level', 'lat', 'lng'} or
+        None when nothing is known (e.g. nationwide alerts).
+        """
+        province_entry = self.province(province)
+        scope = province_entry['province'] if province_entry else None
+
+        if district:
+            key = _key(district)
+            for prefix in DISTRICT_PREFIXES:
+                if key.startswith(prefix):
+                    key = key[len(prefix):]
+                    break
+            entry = self._pick(self.lookup(key), scope)
+            if entry is not None:
+                return entry
+        if text:
+            entry = self.find_in_text(text, scope)
+            if entry is not None and (entry['level'] == 'district' or province_entry is None):
+                return entry
+        return province_entry
+
+    def geocode_alert(self, alert: Dict) -> Dict:
+        """
+        Fill missing lat/lng (and district, when one is found) of an alert dict
+
+        Sets 'geo_precision' to 'district' or 'province'. Alerts that already
+        have coordinates are returned unchanged.
+        """
+        if alert.get('lat') is not None and alert.get('lng') is not None:
+            return alert
+        entry = self.geocode(alert.get('province'), alert.get('district'), alert.get('content'))
+        if entry is None:
+            return alert
+        alert['lat'] = entry['lat']
+        alert['lng'] = entry['lng']
+        alert['geo_precision'] = entry['level']
+        if entry['level'] == 'district' and not alert.get('district'):
+            alert['district'] = entry['name']
+        return alert
+
+
+_geocoder = None
+
+
+def get_geocoder() -> OfflineGeocoder:
+    """Shared geocoder (built on first use)"""
+    global _geocoder
+    if _geocoder is None:
+        _geocoder = OfflineGeocoder()
+    return _geocoder
@@ -7,7 +7,13 @@ import pandas as pd
 import requests
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+from pathlib import Path
 import json
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import HISTORICAL_EVENTS_START_YEAR
+from data_collectors.historical_event_store import HistoricalEventStore
 
 
 class HistoricalDataCollector:
@@ -39,9 +45,29 @@ class HistoricalDataCollector:
         # Add more sample data...
     ]
     
-    def __init__(self):
-        """Initialize historical data collector"""
-        pass
+    def __init__(self, store: HistoricalEventStore = None):
+        """
+        Args:
+            store: Event store backing get_seasonal_patterns (opened on
+                   first use; filled from fetch_historical_disasters if empty)
+        """
+        self._store = store
+        self._store_built = False  # set once a rebuild has run, even if it found no events
+    
+    @property
+    def store(self) -> HistoricalEventStore:
+        if self._store is None:
+            self._store = HistoricalEventStore()
+        if not self._store_built and not self._store.has_patterns:
+            self.rebuild_event_store()
+        return self._store
+    
+    def rebuild_event_store(self, start_year: int = HISTORICAL_EVENTS_START_YEAR):
+        """Load all events since start_year into the store and recompute the seasonal table"""
+        if self._store is None:
+            self._store = HistoricalEventStore()
+        self._store.add_events(self.fetch_historical_disasters(start_year=start_year))
+        self._store_built = True
     
     def fetch_historical_disasters(
         self,
@@ -198,48 +224,11 @@ class HistoricalDataCollector:
                 'avg_severity': 1-5,
                 'sample_size': int
             }
+            
+            Served from the event store's precomputed table; nationwide
+            events count for every province.
         """
-        # Fetch historical data for this province and month
-        historical = self.fetch_historical_disasters(
-            start_year=2000,
-            province=province
-        )
-        
-        # Filter by month
-        month_events = [
-            event for event in historical
-            if datetime.fromisoformat(event['date']).month == month
-        ]
-        
-        if not month_events:
-            return {
-                'flood_probability': 0.1,
-                'storm_probability': 0.1,
-                'drought_probability': 0.05,
-                'avg_severity': 2.0,
-                'sample_size': 0
-            }
-        
-        # Calculate probabilities
-        total_events = len(month_events)
-        flood_count = sum(1 for e in month_events if e['event_type'] == 'flood')
-        storm_count = sum(1 for e in month_events if e['event_type'] == 'weather')
-        drought_count = sum(1 for e in month_events if e['event_type'] == 'drought')
-        
-        # Calculate average severity
-        severity_map = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
-        avg_severity = sum(
-            severity_map.get(e.get('severity', 'medium'), 2)
-            for e in month_events
-        ) / total_events
-        
-        return {
-            'flood_probability': flood_count / max(total_events, 1),
-            'storm_probability': storm_count / max(total_events, 1),
-            'drought_probability': drought_count / max(total_events, 1),
-            'avg_severity': avg_severity,
-            'sample_size': total_events
-        }
+        return self.store.seasonal_pattern(province, month)
     
     def convert_to_training_format(self, historical_event: Dict) -> Dict:
         """
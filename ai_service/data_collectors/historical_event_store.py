@@ -0,0 +1,222 @@
+"""
+Indexed store of historical disaster events with a seasonal pattern table
+
+Events are kept in SQLite with one row per affected province, indexed by
+(province, month). From them a (province, month) -> probabilities and
+average severity table is computed once, stored next to the events and
+held in memory, so a lookup is a dict access.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import HISTORICAL_EVENTS_PATH
+from data_collectors.geocoder import get_geocoder
+from data_collectors.text_matcher import NATIONWIDE
+
+SEVERITY_SCORES = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+# Event types with their own probability column
+PATTERN_EVENT_TYPES = {'flood': 'flood_probability', 'weather': 'storm_probability', 'drought': 'drought_probability'}
+# Returned for (province, month) pairs without any recorded event
+DEFAULT_SEASONAL_PATTERN = {
+    'flood_probability': 0.1,
+    'storm_probability': 0.1,
+    'drought_probability': 0.05,
+    'avg_severity': 2.0,
+    'sample_size': 0
+}
+
+
+def canonical_province(name: str) -> str:
+    """VIETNAM_PROVINCES spelling of a province name ('Hồ Chí Minh' -> 'TP.HCM')"""
+    if not name or name == NATIONWIDE:
+        return NATIONWIDE
+    entry = get_geocoder().province(name)
+    return entry['province'] if entry else name
+
+
+class HistoricalEventStore:
+    """
+    SQLite event store plus the precomputed seasonal pattern table
+
+    Nationwide events ('Toàn quốc') count towards every province. The
+    pattern table is rebuilt whenever events are added and loaded into
+    memory when the store is opened.
+    """
+
+    def __init__(self, db_path: Path = HISTORICAL_EVENTS_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._init_db()
+        self._patterns: Dict[tuple, Dict] = {}
+        self._load_patterns()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS events (
+                    event_id TEXT PRIMARY KEY,
+                    event_type TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    month INTEGER NOT NULL,
+                    severity TEXT,
+                    payload TEXT NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS event_provinces (
+                    event_id TEXT NOT NULL,
+                    province TEXT NOT NULL,
+                    month INTEGER NOT NULL,
+                    PRIMARY KEY (province, month, event_id)
+                ) WITHOUT ROWID
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS seasonal_patterns (
+                    province TEXT NOT NULL,
+                    month INTEGER NOT NULL,
+                    flood_probability REAL NOT NULL,
+                    storm_probability REAL NOT NULL,
+                    drought_probability REAL NOT NULL,
+                    avg_severity REAL NOT NULL,
+                    sample_size INTEGER NOT NULL,
+                    PRIMARY KEY (province, month)
+                ) WITHOUT ROWID
+            ''')
+            self._conn.commit()
+
+    @property
+    def event_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def add_events(self, events: Iterable[Dict]):
+        """Insert or replace events (HistoricalDataCollector records), then rebuild the patterns"""
+        event_rows, province_rows, event_ids = [], [], []
+        for event in events:
+            month = int(event['date'][5:7])
+            event_ids.append((event['event_id'],))
+            event_rows.append((
+                event['event_id'], event['event_type'], event['date'], month,
+                event.get('severity'), json.dumps(event, ensure_ascii=False)
+            ))
+            provinces = {canonical_province(p) for p in event.get('provinces_affected') or [NATIONWIDE]}
+            province_rows.extend((event['event_id'], province, month) for province in provinces)
+
+        with self._lock:
+            self._conn.executemany("DELETE FROM event_provinces WHERE event_id = ?", event_ids)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO events (event_id, event_type, date, month, severity, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)", event_rows
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO event_provinces (event_id, province, month) VALUES (?, ?, ?)", province_rows
+            )
+            self._conn.commit()
+        self.build_patterns()
+
+    def events_for(self, province: str, month: int = None) -> List[Dict]:
+        """Events that affected a province (or the whole country), optionally in one month"""
+        query = '''
+            SELECT e.payload FROM event_provinces p JOIN events e ON e.event_id = p.event_id
+            WHERE p.province IN (?, ?)
+        '''
+        params = [canonical_province(province), NATIONWIDE]
+        if month is not None:
+            query += " AND p.month = ?"
+            params.append(month)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY e.date", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def build_patterns(self):
+        """Recompute and store the (province, month) table from all events"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT p.province, p.month, e.event_type, e.severity, COUNT(*)
+                FROM event_provinces p JOIN events e ON e.event_id = p.event_id
+                GROUP BY p.province, p.month, e.event_type, e.severity
+            ''').fetchall()
+
+            # (province, month) -> [total, severity sum, count per pattern type]
+            counts: Dict[tuple, list] = {}
+            for province, month, event_type, severity, n in rows:
+                acc = counts.setdefault((province, month), [0, 0, {}])
+                acc[0] += n
+                acc[1] += SEVERITY_SCORES.get(severity or 'medium', 2) * n
+                acc[2][event_type] = acc[2].get(event_type, 0) + n
+
+            # Nationwide events apply to every province
+            provinces = {province for province, _ in counts if province != NATIONWIDE}
+            for month in range(1, 13):
+                nationwide = counts.get((NATIONWIDE, month))
+                if nationwide is None:
+                    continue
+                for province in provinces:
+                    acc = counts.setdefault((province, month), [0, 0, {}])
+                    acc[0] += nationwide[0]
+                    acc[1] += nationwide[1]
+                    for event_type, n in nationwide[2].items():
+                        acc[2][event_type] = acc[2].get(event_type, 0) + n
+
+            patterns = {}
+            for key, (total, severity_sum, by_type) in counts.items():
+                pattern = {column: by_type.get(event_type, 0) / total for event_type, column in PATTERN_EVENT_TYPES.items()}
+                pattern['avg_severity'] = severity_sum / total
+                pattern['sample_size'] = total
+                patterns[key] = pattern
+
+            self._conn.execute("DELETE FROM seasonal_patterns")
+            self._conn.executemany('''
+                INSERT INTO seasonal_patterns
+                (province, month, flood_probability, storm_probability, drought_probability, avg_severity, sample_size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (province, month, p['flood_probability'], p['storm_probability'], p['drought_probability'],
+                 p['avg_severity'], p['sample_size'])
+                for (province, month), p in patterns.items()
+            ])
+            self._conn.commit()
+            self._patterns = patterns
+
+    def _load_patterns(self):
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT province, month, flood_probability, storm_probability, drought_probability,
+                       avg_severity, sample_size
+                FROM seasonal_patterns
+            ''').fetchall()
+        self._patterns = {
+            (province, month): {
+                'flood_probability': flood,
+                'storm_probability': storm,
+                'drought_probability': drought,
+                'avg_severity': severity,
+                'sample_size': n
+            }
+            for province, month, flood, storm, drought, severity, n in rows
+        }
+
+    @property
+    def has_patterns(self) -> bool:
+        return bool(self._patterns)
+
+    def seasonal_pattern(self, province: str, month: int) -> Dict:
+        """Probabilities and average severity for (province, month); a copy, safe to modify"""
+        pattern = (
+            self._patterns.get((province, month))
+            or self._patterns.get((canonical_province(province), month))
+            or self._patterns.get((NATIONWIDE, month))
+            or DEFAULT_SEASONAL_PATTERN
+        )
+        return dict(pattern)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
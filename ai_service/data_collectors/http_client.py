@@ -0,0 +1,231 @@
+"""
+Shared outbound HTTP for the alert collectors
+
+One pooled requests.Session for all feeds, conditional GETs against an
+on-disk cache (ETag / Last-Modified) and retries with jittered backoff.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+import sys
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    HTTP_CACHE_DIR, HTTP_TIMEOUT_SECONDS, HTTP_RETRIES, HTTP_BACKOFF_BASE_SECONDS,
+    HTTP_BACKOFF_MAX_SECONDS, HTTP_POOL_MAXSIZE, HTTP_USER_AGENT
+)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpResponse:
+    """
+    Body and headers of a fetch
+
+    `not_modified` is true when the server answered 304; `content` is then
+    the cached body, so callers that keep parsed results can skip parsing.
+    """
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: Dict, not_modified: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.not_modified = not_modified
+
+    @property
+    def text(self) -> str:
+        content_type = self.headers.get('Content-Type', '')
+        charset = 'utf-8'
+        if 'charset=' in content_type:
+            charset = content_type.split('charset=')[-1].split(';')[0].strip() or charset
+        return self.content.decode(charset, errors='replace')
+
+
+class CachedHttpClient:
+    """
+    Pooled HTTP client with an on-disk conditional-request cache
+
+    Responses carrying an ETag or Last-Modified are stored under
+    `cache_dir` (body plus a small JSON sidecar). The next GET of the same
+    URL sends If-None-Match / If-Modified-Since; on 304 the stored body is
+    returned with `not_modified=True` and nothing is downloaded.
+
+    Connection errors, timeouts and 429/5xx are retried up to `retries`
+    times, sleeping a random time in [0, min(max_backoff, base * 2^n)]
+    ("full jitter") so collectors polling the same host do not retry in
+    lockstep. A numeric Retry-After is honoured up to `max_backoff`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = HTTP_CACHE_DIR,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        retries: int = HTTP_RETRIES,
+        backoff_base: float = HTTP_BACKOFF_BASE_SECONDS,
+        max_backoff: float = HTTP_BACKOFF_MAX_SECONDS,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': HTTP_USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.retried = 0
+        self.failures = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    # ----- Disk cache -----
+
+    def _paths(self, url: str):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{digest}.json", self.cache_dir / f"{digest}.body"
+
+    def _load(self, url: str) -> Optional[Dict]:
+        if self.cache_dir is None:
+            return None
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if meta.get('url') != url:
+                return None
+            meta['content'] = body_path.read_bytes()
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, url: str, response: requests.Response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if self.cache_dir is None or not (etag or last_modified):
+            return
+        meta_path, body_path = self._paths(url)
+        meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': response.headers.get('Content-Type', ''),
+            'stored_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            tmp_body = body_path.with_name(body_path.name + suffix)
+            tmp_body.write_bytes(response.content)
+            os.replace(tmp_body, body_path)
+            tmp_meta = meta_path.with_name(meta_path.name + suffix)
+            tmp_meta.write_text(json.dumps(meta), encoding='utf-8')
+            os.replace(tmp_meta, meta_path)
+        except OSError as e:
+            print(f"[HTTP] Could not cache {url}: {e}")
+
+    # ----- Requests -----
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_base * (2 ** attempt)))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.strip().isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+    def get(self, url: str, conditional: bool = True, timeout: float = None) -> HttpResponse:
+        """
+        GET `url`, revalidating a cached copy when there is one
+
+        Raises requests.RequestException when the request still fails after
+        the retries (or immediately for non-retryable 4xx responses).
+        """
+        cached = self._load(url) if conditional else None
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        attempt = 0
+        while True:
+            response = None
+            try:
+                with self._lock:
+                    self.requests += 1
+                response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                error = requests.HTTPError(f"{response.status_code} for {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt >= self.retries:
+                with self._lock:
+                    self.failures += 1
+                raise error
+            time.sleep(self._backoff(attempt, response))
+            attempt += 1
+            with self._lock:
+                self.retried += 1
+
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self.not_modified += 1
+                self.bytes_saved += len(cached['content'])
+            return HttpResponse(
+                url, 304, cached['content'], {'Content-Type': cached.get('content_type', '')}, not_modified=True
+            )
+
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            with self._lock:
+                self.failures += 1
+            raise
+        with self._lock:
+            self.bytes_downloaded += len(response.content)
+        self._store(url, response)
+        return HttpResponse(url, response.status_code, response.content, dict(response.headers))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'not_modified': self.not_modified,
+                'retried': self.retried,
+                'failures': self.failures,
+                'bytes_downloaded': self.bytes_downloaded,
+                'bytes_saved': self.bytes_saved,
+            }
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client() -> CachedHttpClient:
+    """Process-wide client, so every collector shares one connection pool and cache"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = CachedHttpClient()
+        return _shared_client
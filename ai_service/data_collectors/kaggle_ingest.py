@@ -0,0 +1,299 @@
+"""
+Chunked ingestion of downloaded Kaggle disaster datasets
+
+The CSVs fetched by scripts/download_kaggle_datasets.py are read from
+local disk in fixed-size chunks, with only the needed columns and explicit
+dtypes, normalized to the hazard training schema (province, date,
+hazard_type, severity) and appended to a partitioned columnar store:
+
+    HAZARD_EVENTS_DIR/hazard_type=<type>/year=<yyyy>/<source>-<chunk>.parquet
+
+Each chunk is written out before the next one is read, so memory stays
+flat however large the archive. Parquet needs pyarrow; without it the
+parts are written as .npz column arrays in the same layout.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import HAZARD_EVENTS_DIR, KAGGLE_INGEST_CHUNK_ROWS
+from data_collectors.geocoder import get_geocoder
+from data_collectors.historical_event_store import canonical_province
+from data_collectors.text_matcher import NATIONWIDE, get_matcher
+from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Stored columns and their on-disk dtypes; severity is the 1-5 risk level
+EVENT_COLUMNS = {
+    'province': str,
+    'date': 'datetime64[D]',
+    'hazard_type': str,
+    'severity': np.int8,
+    'source': str,
+}
+PART_SUFFIXES = ('.parquet', '.npz')
+
+LANDSLIDE_SIZE_SEVERITY = {'small': 1, 'medium': 2, 'large': 3, 'very_large': 4, 'catastrophic': 5}
+EMDAT_HAZARD_TYPES = {
+    'Flood': 'flood',
+    'Storm': 'storm',
+    'Drought': 'drought',
+    'Landslide': 'landslide',
+    'Mass movement (wet)': 'landslide',
+}
+
+
+def _casualty_severity(deaths: pd.Series) -> np.ndarray:
+    """Lower bound on severity from the death toll (0 when unknown or none)"""
+    deaths = deaths.fillna(0).to_numpy()
+    return np.select([deaths >= 100, deaths >= 10, deaths >= 1], [5, 4, 3], default=0)
+
+
+def _province_names(names: pd.Series) -> pd.Series:
+    """Canonical province per name, resolving each distinct spelling once"""
+    geocoder = get_geocoder()
+    resolved = {}
+    for name in names.dropna().unique():
+        entry = geocoder.province(name)
+        resolved[name] = entry['province'] if entry else None
+    return names.map(resolved)
+
+
+def _nearest_province(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Province whose centroid is closest to each point"""
+    names = list(VIETNAM_PROVINCES)
+    centroids = np.array([[VIETNAM_PROVINCES[n]['lat'], VIETNAM_PROVINCES[n]['lng']] for n in names])
+    d2 = (lat[:, None] - centroids[:, 0]) ** 2 + ((lng[:, None] - centroids[:, 1]) * np.cos(np.radians(lat[:, None]))) ** 2
+    return np.array(names, dtype=object)[d2.argmin(axis=1)]
+
+
+def _normalize_landslides(chunk: pd.DataFrame) -> pd.DataFrame:
+    """NASA Global Landslide Catalog rows in Vietnam"""
+    chunk = chunk[chunk['country_name'].isin(['Vietnam', 'Viet Nam'])]
+    if chunk.empty:
+        return _empty_events()
+
+    province = _province_names(chunk['admin_division_name']).astype(object)
+    missing = province.isna().to_numpy() & chunk['latitude'].notna().to_numpy() & chunk['longitude'].notna().to_numpy()
+    if missing.any():
+        province[missing] = _nearest_province(
+            chunk['latitude'].to_numpy()[missing], chunk['longitude'].to_numpy()[missing]
+        )
+
+    size = chunk['landslide_size'].astype('string').str.lower().map(LANDSLIDE_SIZE_SEVERITY).fillna(2).to_numpy()
+    return pd.DataFrame({
+        'province': province.fillna(NATIONWIDE).to_numpy(),
+        'date': pd.to_datetime(chunk['event_date'], format='mixed', errors='coerce').to_numpy(),
+        'hazard_type': 'landslide',
+        'severity': np.maximum(size, _casualty_severity(chunk['fatality_count'])),
+        'source': 'landslide_nasa',
+    })
+
+
+def _normalize_emdat(chunk: pd.DataFrame) -> pd.DataFrame:
+    """EM-DAT disasters in Vietnam, one row per province named in 'Location'"""
+    chunk = chunk[(chunk['ISO'] == 'VNM') & chunk['Disaster Type'].isin(list(EMDAT_HAZARD_TYPES))]
+    if chunk.empty:
+        return _empty_events()
+
+    matcher = get_matcher()
+    provinces = [
+        [canonical_province(p) for p in matcher.analyze(location)['provinces']] or [NATIONWIDE]
+        for location in chunk['Location'].fillna('')
+    ]
+    date = pd.to_datetime(pd.DataFrame({
+        'year': chunk['Start Year'],
+        'month': chunk['Start Month'].fillna(1),
+        'day': chunk['Start Day'].fillna(1),
+    }), errors='coerce')
+
+    affected = chunk['Total Affected'].fillna(0).to_numpy()
+    severity = np.maximum.reduce([
+        np.full(len(chunk), 2),
+        np.select([affected >= 1_000_000, affected >= 100_000], [4, 3], default=0),
+        _casualty_severity(chunk['Total Deaths']),
+    ])
+    events = pd.DataFrame({
+        'province': provinces,
+        'date': date.to_numpy(),
+        'hazard_type': chunk['Disaster Type'].astype(str).map(EMDAT_HAZARD_TYPES).to_numpy(),
+        'severity': severity,
+        'source': 'emdat_vietnam',
+    })
+    return events.explode('province', ignore_index=True)
+
+
+# Ingestible datasets (keys of DATASETS in download_kaggle_datasets.py):
+# columns read with their dtypes, and the chunk normalizer. The other
+# downloads are imagery or have no location/date, so nothing to ingest.
+INGEST_SOURCES = {
+    'landslide_nasa': {
+        'dtypes': {
+            'event_date': 'string',
+            'country_name': 'category',
+            'admin_division_name': 'string',
+            'landslide_size': 'category',
+            'fatality_count': 'float32',
+            'latitude': 'float64',
+            'longitude': 'float64',
+        },
+        'normalize': _normalize_landslides,
+    },
+    'emdat_vietnam': {
+        'dtypes': {
+            'ISO': 'category',
+            'Disaster Type': 'category',
+            'Location': 'string',
+            'Start Year': 'Int16',
+            'Start Month': 'Int8',
+            'Start Day': 'Int8',
+            'Total Deaths': 'float64',
+            'Total Affected': 'float64',
+        },
+        'normalize': _normalize_emdat,
+    },
+}
+
+
+def _empty_events() -> pd.DataFrame:
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in EVENT_COLUMNS.items()})
+
+
+def find_source_files(directory: Path, columns: Iterable[str]) -> List[Path]:
+    """CSV files under directory whose header has all the given columns"""
+    files = []
+    for path in sorted(Path(directory).rglob('*.csv*')):
+        try:
+            header = pd.read_csv(path, nrows=0, encoding_errors='replace').columns
+        except (ValueError, OSError) as e:
+            print(f"[KaggleIngest] Skipping unreadable {path.name}: {e}")
+            continue
+        if set(columns) <= set(header):
+            files.append(path)
+    return files
+
+
+def _write_part(path: Path, events: pd.DataFrame):
+    """Write one columnar part atomically (readers only see complete files)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {column: events[column].to_numpy(dtype=dtype) for column, dtype in EVENT_COLUMNS.items()}
+    tmp_path = path.with_name(path.name + '.tmp')
+    if path.suffix == '.parquet':
+        pq.write_table(pa.table(arrays), tmp_path)
+    else:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _read_part(path: Path, columns: List[str]) -> pd.DataFrame:
+    if path.suffix == '.parquet':
+        frame = pq.read_table(path, columns=columns).to_pandas()
+    else:
+        with np.load(path, allow_pickle=False) as data:
+            frame = pd.DataFrame({column: data[column] for column in columns})
+    if 'date' in frame:
+        frame['date'] = pd.to_datetime(frame['date'])
+    return frame
+
+
+def _parts(output_dir: Path, pattern: str = '*') -> List[Path]:
+    return [p for p in Path(output_dir).glob(f'hazard_type=*/year=*/{pattern}') if p.suffix in PART_SUFFIXES]
+
+
+def ingest_source(
+    source: str,
+    directory: Path,
+    output_dir: Path = HAZARD_EVENTS_DIR,
+    chunk_rows: int = KAGGLE_INGEST_CHUNK_ROWS
+) -> Dict:
+    """
+    Normalize all CSVs of one dataset into the partitioned store
+
+    Parts previously written for this source are replaced, so ingesting
+    again does not duplicate events.
+
+    Args:
+        source: Key of INGEST_SOURCES
+        directory: Where the dataset was downloaded
+        output_dir: Root of the partitioned store
+        chunk_rows: CSV rows read (and held in memory) at a time
+
+    Returns:
+        {'files', 'rows_read', 'events_written', 'parts'}
+    """
+    spec = INGEST_SOURCES[source]
+    dtypes = spec['dtypes']
+    suffix = '.parquet' if HAS_PYARROW else '.npz'
+    stats = {'files': 0, 'rows_read': 0, 'events_written': 0, 'parts': 0}
+
+    files = find_source_files(directory, dtypes)
+    if not files:
+        print(f"[KaggleIngest] No {source} CSV with columns {list(dtypes)} under {directory}")
+        return stats
+
+    for old_part in _parts(output_dir, f'{source}-*'):
+        old_part.unlink()
+
+    chunk_index = 0
+    for path in files:
+        print(f"[KaggleIngest] {source}: reading {path.name}")
+        stats['files'] += 1
+        reader = pd.read_csv(
+            path, usecols=list(dtypes), dtype=dtypes, chunksize=chunk_rows, encoding_errors='replace'
+        )
+        for chunk in reader:
+            stats['rows_read'] += len(chunk)
+            events = spec['normalize'](chunk)
+            events = events[events['date'].notna()]
+            for (hazard_type, year), group in events.groupby([events['hazard_type'], events['date'].dt.year]):
+                part = output_dir / f'hazard_type={hazard_type}' / f'year={int(year)}' / f'{source}-{chunk_index:05d}{suffix}'
+                _write_part(part, group)
+                stats['parts'] += 1
+                stats['events_written'] += len(group)
+            chunk_index += 1
+
+    print(f"[KaggleIngest] {source}: {stats['rows_read']} rows -> {stats['events_written']} events in {stats['parts']} parts")
+    return stats
+
+
+def read_hazard_events(
+    output_dir: Path = HAZARD_EVENTS_DIR,
+    hazard_types: Iterable[str] = None,
+    years: Iterable[int] = None,
+    columns: List[str] = None
+) -> pd.DataFrame:
+    """
+    Load ingested events, reading only the partitions asked for
+
+    Args:
+        hazard_types: Only these hazard types (default: all)
+        years: Only these years (default: all)
+        columns: Subset of EVENT_COLUMNS (default: all)
+    """
+    columns = list(columns or EVENT_COLUMNS)
+    hazard_types = set(hazard_types) if hazard_types is not None else None
+    years = {int(y) for y in years} if years is not None else None
+
+    frames = []
+    for part in sorted(_parts(output_dir)):
+        hazard_type = part.parent.parent.name.split('=', 1)[1]
+        year = int(part.parent.name.split('=', 1)[1])
+        if (hazard_types is not None and hazard_type not in hazard_types) or (years is not None and year not in years):
+            continue
+        frames.append(_read_part(part, columns))
+
+    if not frames:
+        return _empty_events()[columns]
+    return pd.concat(frames, ignore_index=True)
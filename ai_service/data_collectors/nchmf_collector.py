@@ -5,10 +5,59 @@ Reliability: 1.0 (100%) - Official Government Source
 """
 import requests
 from bs4 import BeautifulSoup
-from datetime import datetime
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+import threading
 import time
 import re
+import sys
+from urllib.parse import urlparse
+
+try:
+    from lxml import etree, html as lxml_html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import NCHMF_ARCHIVE_URL, NCHMF_HISTORY_CONCURRENCY, NCHMF_HISTORY_MAX_PAGES
+from data_collectors.http_client import CachedHttpClient, get_shared_client
+from data_collectors.seen_items import content_hash, item_id
+from data_collectors.text_matcher import get_matcher
+
+
+def _class_xpath(name: str) -> str:
+    """XPath equivalent of the CSS class selector `.name`"""
+    return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+
+# Candidate warning containers as (CSS selector, equivalent XPath), tried in
+# order; the first that matches anything wins
+WARNING_SELECTORS = [
+    ('.warning-item', _class_xpath('warning-item')),
+    ('.alert-item', _class_xpath('alert-item')),
+    ('.news-item', _class_xpath('news-item')),
+    ('div[class*="warning"]', "//div[contains(@class, 'warning')]"),
+    ('div[class*="alert"]', "//div[contains(@class, 'alert')]"),
+    ('article', '//article'),
+    ('.content-item', _class_xpath('content-item')),
+]
+# Fallback when no selector matches: classed divs mentioning one of these
+FALLBACK_KEYWORDS = ['cảnh báo', 'bão', 'lũ', 'mưa lớn', 'thiên tai']
+MAX_WARNING_ELEMENTS = 50
+
+if HAS_LXML:
+    # NCHMF serves UTF-8; comments never count as warning text
+    _LXML_PARSER = lxml_html.HTMLParser(encoding='utf-8', remove_comments=True)
+    _WARNING_XPATHS = [etree.XPath(xpath) for _, xpath in WARNING_SELECTORS]
+    _CLASSED_DIVS_XPATH = etree.XPath('//div[@class]')
+
+
+# Next allowed request start per host, shared by all collector threads
+_host_lock = threading.Lock()
+_host_next_request: Dict[str, float] = {}
 
 
 class NCHMFCollector:
@@ -21,26 +70,32 @@ class NCHMFCollector:
     
     BASE_URL = "http://nchmf.gov.vn"
     MAIN_PAGE = f"{BASE_URL}/KttvsWeb/vi-VN/1/index.html"
+    ARCHIVE_PAGE = NCHMF_ARCHIVE_URL  # format with page=1, 2, ... (1 = newest)
     
-    def __init__(self, delay_seconds: float = 1.0):
+    def __init__(self, delay_seconds: float = 1.0, http_client: CachedHttpClient = None, parser: str = None):
         """
         Initialize collector
         
         Args:
             delay_seconds: Delay between requests to respect rate limits
+            http_client: HTTP client (default: the shared pooled, caching client)
+            parser: 'lxml' (default when installed) or 'html.parser' (BeautifulSoup)
         """
         self.delay_seconds = delay_seconds
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.http = http_client or get_shared_client()
+        self.parser = parser or ('lxml' if HAS_LXML else 'html.parser')
+        self._last_warnings = None  # parsed warnings of the last downloaded page
+        self._last_seen_key = None  # content hash of the newest warning seen
+        self.matcher = get_matcher()
     
-    def fetch_warnings(self, max_warnings: int = 50) -> List[Dict]:
+    def fetch_warnings(self, max_warnings: int = 50, incremental: bool = False) -> List[Dict]:
         """
         Fetch latest weather warnings from NCHMF
         
         Args:
             max_warnings: Maximum number of warnings to fetch
+            incremental: Only return warnings newer than the newest one seen
+                         by the previous call; parsing stops at that warning
             
         Returns:
             List of warning dicts with structure:
@@ -60,32 +115,25 @@ class NCHMFCollector:
                 'confidence': 1.0
             }
         """
-        warnings = []
-        
         try:
             print(f"[NCHMF] Fetching warnings from {self.MAIN_PAGE}...")
-            response = self.session.get(self.MAIN_PAGE, timeout=30)
-            response.raise_for_status()
+            response = self.http.get(self.MAIN_PAGE)
             
-            # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Page unchanged since the last fetch: nothing new, or reuse the
+            # parsed warnings
+            if response.not_modified and incremental and self._last_seen_key is not None:
+                return []
+            if response.not_modified and not incremental and self._last_warnings is not None:
+                print("[NCHMF] Page not modified, reusing parsed warnings")
+                return self._last_warnings[:max_warnings]
             
-            # Find warning sections (adjust selectors based on actual HTML structure)
-            warning_elements = self._find_warning_elements(soup)
-            
-            for element in warning_elements[:max_warnings]:
-                try:
-                    warning = self._parse_warning_element(element)
-                    if warning:
-                        warnings.append(warning)
-                except Exception as e:
-                    print(f"[NCHMF] Error parsing warning element: {e}")
-                    continue
-                
-                # Rate limiting
-                time.sleep(self.delay_seconds)
-            
-            print(f"[NCHMF] Fetched {len(warnings)} warnings")
+            stop_key = self._last_seen_key if incremental else None
+            warnings, newest_key, stopped = self._parse_page(response.content, max_warnings, stop_key)
+            if newest_key is not None:
+                self._last_seen_key = newest_key
+            # An incremental result is only the head of the page
+            self._last_warnings = None if stopped else warnings
+            print(f"[NCHMF] Fetched {len(warnings)} {'new ' if incremental else ''}warnings")
             return warnings
             
         except requests.RequestException as e:
@@ -95,27 +143,68 @@ class NCHMFCollector:
             print(f"[NCHMF] Unexpected error: {e}")
             return []
     
-    def _find_warning_elements(self, soup: BeautifulSoup) -> List:
+    def _parse_page(
+        self, content: bytes, max_warnings: int = MAX_WARNING_ELEMENTS, stop_key: str = None
+    ) -> Tuple[List[Dict], Optional[str], bool]:
+        """
+        Parse the warnings of one page, newest first
+        
+        Parsing stops at the warning whose content hash is `stop_key`, so
+        only elements ahead of it are classified.
+        
+        Returns:
+            (warnings, content hash of the first warning on the page, whether
+            stop_key was reached)
+        """
+        warnings = []
+        newest_key = None
+        if not content or not content.strip():
+            return warnings, newest_key, False
+        for element in self._find_warning_elements(self._parse_document(content))[:max_warnings]:
+            text = self._element_text(element)
+            if not text or len(text) < 20:  # Skip very short texts
+                continue
+            key = content_hash(text)
+            if newest_key is None:
+                newest_key = key
+            if key == stop_key:
+                return warnings, newest_key, True
+            try:
+                warning = self._parse_warning_element(element, text)
+                if warning:
+                    warnings.append(warning)
+            except Exception as e:
+                print(f"[NCHMF] Error parsing warning element: {e}")
+        return warnings, newest_key, False
+    
+    def _parse_document(self, content: bytes):
+        """Parse a page with the configured backend"""
+        if self.parser == 'lxml':
+            document = lxml_html.document_fromstring(content, parser=_LXML_PARSER)
+            # BeautifulSoup's get_text() skips these as well
+            etree.strip_elements(document, 'script', 'style', with_tail=False)
+            return document
+        return BeautifulSoup(content, 'html.parser')
+    
+    def _element_text(self, element) -> str:
+        """Text of an element: stripped fragments joined by spaces, so words in adjacent tags stay apart"""
+        if self.parser == 'lxml':
+            return ' '.join(part for part in (s.strip() for s in element.itertext()) if part)
+        return element.get_text(' ', strip=True)
+    
+    def _find_warning_elements(self, document) -> List:
         """
         Find warning elements in HTML
         
-        Adjust selectors based on actual NCHMF website structure
+        Adjust WARNING_SELECTORS based on actual NCHMF website structure.
+        With lxml the selectors run as precompiled XPath expressions.
         """
         warnings = []
+        lxml_backend = self.parser == 'lxml'
         
         # Try multiple possible selectors
-        selectors = [
-            '.warning-item',
-            '.alert-item',
-            '.news-item',
-            'div[class*="warning"]',
-            'div[class*="alert"]',
-            'article',
-            '.content-item'
-        ]
-        
-        for selector in selectors:
-            elements = soup.select(selector)
+        for index, (selector, _) in enumerate(WARNING_SELECTORS):
+            elements = _WARNING_XPATHS[index](document) if lxml_backend else document.select(selector)
             if elements:
                 warnings.extend(elements)
                 break
@@ -123,37 +212,35 @@ class NCHMFCollector:
         # If no specific selectors found, look for text patterns
         if not warnings:
             # Look for divs containing warning keywords
-            all_divs = soup.find_all('div', class_=True)
+            all_divs = _CLASSED_DIVS_XPATH(document) if lxml_backend else document.find_all('div', class_=True)
             for div in all_divs:
-                text = div.get_text().lower()
-                if any(keyword in text for keyword in ['cảnh báo', 'bão', 'lũ', 'mưa lớn', 'thiên tai']):
+                text = (div.text_content() if lxml_backend else div.get_text()).lower()
+                if any(keyword in text for keyword in FALLBACK_KEYWORDS):
                     warnings.append(div)
         
-        return warnings[:50]  # Limit to 50
+        return warnings[:MAX_WARNING_ELEMENTS]
     
-    def _parse_warning_element(self, element) -> Optional[Dict]:
+    def _parse_warning_element(self, element, text: str = None) -> Optional[Dict]:
         """
         Parse a warning element into structured dict
         """
-        text = element.get_text(strip=True)
+        if text is None:
+            text = self._element_text(element)
         
         if not text or len(text) < 20:  # Skip very short texts
             return None
         
-        # Extract severity from text
-        severity = self._extract_severity(text)
-        
-        # Extract alert type
-        alert_type = self._extract_alert_type(text)
-        
-        # Extract location (province)
-        province = self._extract_province(text)
+        # Extract severity, alert type and province in one scan
+        analysis = self.matcher.analyze(text, profile='nchmf')
+        severity = analysis['severity']
+        alert_type = analysis['alert_type']
+        province = analysis['province']
         
         # Extract date/time
         created_at = self._extract_datetime(element, text)
         
-        # Generate unique ID
-        alert_id = f"NCHMF_{int(created_at.timestamp())}"
+        # Generate unique ID (warnings often carry only a date)
+        alert_id = item_id("NCHMF", created_at, '', text)
         
         return {
             'id': alert_id,
@@ -175,82 +262,18 @@ class NCHMFCollector:
             }
         }
     
-    def _extract_severity(self, text: str) -> str:
-        """Extract severity level from text"""
-        text_lower = text.lower()
-        
-        # Critical keywords
-        if any(kw in text_lower for kw in ['nghiêm trọng', 'cực kỳ', 'rất nguy hiểm', 'cấp độ 4', 'cấp độ 5']):
-            return 'critical'
-        
-        # High keywords
-        if any(kw in text_lower for kw in ['cao', 'nguy hiểm', 'cấp độ 3', 'mạnh']):
-            return 'high'
-        
-        # Medium keywords
-        if any(kw in text_lower for kw in ['trung bình', 'cấp độ 2', 'vừa']):
-            return 'medium'
-        
-        # Default to medium if unclear
-        return 'medium'
-    
-    def _extract_alert_type(self, text: str) -> str:
-        """Extract alert type from text"""
-        text_lower = text.lower()
-        
-        if any(kw in text_lower for kw in ['bão', 'storm', 'typhoon']):
-            return 'weather'
-        elif any(kw in text_lower for kw in ['lũ', 'lụt', 'flood', 'ngập']):
-            return 'disaster'
-        elif any(kw in text_lower for kw in ['sơ tán', 'evacuation']):
-            return 'evacuation'
-        elif any(kw in text_lower for kw in ['mưa', 'rain', 'dông', 'thunder']):
-            return 'weather'
-        else:
-            return 'general'
-    
-    def _extract_province(self, text: str) -> str:
-        """Extract province name from text"""
-        # Common Vietnamese provinces
-        provinces = [
-            'Hà Nội', 'Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ',
-            'An Giang', 'Bà Rịa - Vũng Tàu', 'Bạc Liêu', 'Bắc Giang', 'Bắc Kạn',
-            'Bắc Ninh', 'Bến Tre', 'Bình Định', 'Bình Dương', 'Bình Phước',
-            'Bình Thuận', 'Cà Mau', 'Cao Bằng', 'Đắk Lắk', 'Đắk Nông',
-            'Điện Biên', 'Đồng Nai', 'Đồng Tháp', 'Gia Lai', 'Hà Giang',
-            'Hà Nam', 'Hà Tĩnh', 'Hải Dương', 'Hậu Giang', 'Hòa Bình',
-            'Hưng Yên', 'Khánh Hòa', 'Kiên Giang', 'Kon Tum', 'Lai Châu',
-            'Lâm Đồng', 'Lạng Sơn', 'Lào Cai', 'Long An', 'Nam Định',
-            'Nghệ An', 'Ninh Bình', 'Ninh Thuận', 'Phú Thọ', 'Phú Yên',
-            'Quảng Bình', 'Quảng Nam', 'Quảng Ngãi', 'Quảng Ninh', 'Quảng Trị',
-            'Sóc Trăng', 'Sơn La', 'Tây Ninh', 'Thái Bình', 'Thái Nguyên',
-            'Thanh Hóa', 'Thừa Thiên Huế', 'Tiền Giang', 'Trà Vinh', 'Tuyên Quang',
-            'Vĩnh Long', 'Vĩnh Phúc', 'Yên Bái'
-        ]
-        
-        text_lower = text.lower()
-        for province in provinces:
-            if province.lower() in text_lower:
-                return province
-        
-        # Check for common abbreviations
-        if 'tp.hcm' in text_lower or 'hcm' in text_lower:
-            return 'Hồ Chí Minh'
-        elif 'hà nội' in text_lower or 'hn' in text_lower:
-            return 'Hà Nội'
-        elif 'đà nẵng' in text_lower or 'dn' in text_lower:
-            return 'Đà Nẵng'
-        
-        return 'Toàn quốc'  # Default if not found
-    
     def _extract_datetime(self, element, text: str) -> datetime:
-        """Extract datetime from element or text"""
+        """Extract datetime (naive local time) from element or text"""
         # Try to find date in element attributes
         date_str = element.get('data-date') or element.get('datetime')
         
         if date_str:
             try:
-                return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+                created_at = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+                # "...Z" / "+07:00" stamps: compare with the naive dates parsed from text
+                if created_at.tzinfo is not None:
+                    created_at = created_at.astimezone().replace(tzinfo=None)
+                return created_at
             except:
                 pass
         
@@ -274,20 +297,78 @@ class NCHMFCollector:
         # Default to current time
         return datetime.now()
     
-    def fetch_historical_warnings(self, days_back: int = 30) -> List[Dict]:
+    def fetch_historical_warnings(
+        self,
+        days_back: int = 30,
+        concurrency: int = NCHMF_HISTORY_CONCURRENCY,
+        max_pages: int = NCHMF_HISTORY_MAX_PAGES
+    ) -> List[Dict]:
         """
-        Fetch historical warnings (if archive available)
+        Fetch historical warnings by paging back through the archive
+        
+        Up to `concurrency` archive pages are downloaded and parsed at
+        once, but requests to the host still start `delay_seconds` apart
+        (shared by all workers). Pages are consumed in order and paging stops at the first
+        page that is empty, fails, or reaches past `days_back`.
         
         Args:
             days_back: Number of days to look back
+            concurrency: Pages fetched in parallel
+            max_pages: Upper bound on the pages requested
             
         Returns:
-            List of historical warnings
+            List of historical warnings, newest first
         """
-        # This would require accessing NCHMF archive if available
-        # For now, return empty list
-        print(f"[NCHMF] Historical data fetching not yet implemented")
-        return []
+        cutoff = datetime.now() - timedelta(days=days_back)
+        warnings, seen_ids = [], set()
+        print(f"[NCHMF] Fetching {days_back} days of warnings from the archive...")
+        
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="nchmf-history") as pool:
+            pending = {}
+            next_page = 1
+            for page in range(1, max_pages + 1):
+                while next_page <= max_pages and len(pending) < max(1, concurrency):
+                    pending[next_page] = pool.submit(self._fetch_archive_page, next_page)
+                    next_page += 1
+                page_warnings = pending.pop(page).result()
+                if not page_warnings:
+                    break
+                
+                oldest = None
+                for warning in page_warnings:
+                    created_at = datetime.fromisoformat(warning['created_at'])
+                    oldest = created_at if oldest is None else min(oldest, created_at)
+                    # Items shift between pages while paging; keep each once
+                    if created_at >= cutoff and warning['id'] not in seen_ids:
+                        seen_ids.add(warning['id'])
+                        warnings.append(warning)
+                if oldest < cutoff:
+                    break
+            for future in pending.values():
+                future.cancel()
+        
+        print(f"[NCHMF] Fetched {len(warnings)} historical warnings")
+        return warnings
+    
+    def _wait_for_host(self, url: str):
+        """Rate limiting: start requests to one host at least delay_seconds apart"""
+        host = urlparse(url).netloc
+        with _host_lock:
+            now = time.monotonic()
+            start = max(now, _host_next_request.get(host, 0.0))
+            _host_next_request[host] = start + self.delay_seconds
+        time.sleep(start - now)
+    
+    def _fetch_archive_page(self, page: int) -> List[Dict]:
+        """Warnings on one archive page ([] when the page is missing or fails)"""
+        url = self.ARCHIVE_PAGE.format(page=page)
+        self._wait_for_host(url)
+        try:
+            response = self.http.get(url)
+        except requests.RequestException as e:
+            print(f"[NCHMF] Archive page {page} failed: {e}")
+            return []
+        return self._parse_page(response.content)[0]
 
 
 if __name__ == "__main__":
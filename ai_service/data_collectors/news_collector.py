@@ -6,9 +6,16 @@ Reliability: 0.85-0.90 (with cross-reference)
 import feedparser
 import requests
 from datetime import datetime
+from pathlib import Path
 from typing import List, Dict, Optional
 import time
 import re
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from data_collectors.http_client import CachedHttpClient, get_shared_client
+from data_collectors.seen_items import SEEN_KEYS_FIELD, SeenItemFilter, item_id
+from data_collectors.text_matcher import DISASTER_KEYWORDS, get_matcher
 
 
 class NewsCollector:
@@ -61,22 +68,29 @@ class NewsCollector:
         }
     }
     
-    # Keywords to identify disaster-related news
-    DISASTER_KEYWORDS = [
-        'lũ lụt', 'bão', 'thiên tai', 'sơ tán', 'cứu hộ',
-        'mưa lớn', 'ngập lụt', 'sạt lở', 'động đất', 'hạn hán',
-        'flood', 'storm', 'typhoon', 'disaster', 'evacuation',
-        'cảnh báo', 'khẩn cấp', 'nguy hiểm'
-    ]
+    # Keywords to identify disaster-related news (shared with the text matcher)
+    DISASTER_KEYWORDS = DISASTER_KEYWORDS
     
-    def __init__(self, delay_seconds: float = 1.0):
+    def __init__(
+        self,
+        delay_seconds: float = 1.0,
+        http_client: CachedHttpClient = None,
+        seen_filter: SeenItemFilter = None
+    ):
         """
         Initialize collector
         
         Args:
             delay_seconds: Delay between requests
+            http_client: HTTP client (default: the shared pooled, caching client)
+            seen_filter: If given, entries seen in earlier runs are skipped
+                         before classification and only new items returned
         """
         self.delay_seconds = delay_seconds
+        self.http = http_client or get_shared_client()
+        self.seen_filter = seen_filter
+        self.matcher = get_matcher()
+        self._parsed_feeds = {}  # rss_url -> entries of the last downloaded copy
     
     def fetch_disaster_news(self, hours_back: int = 24, max_news: int = 100) -> List[Dict]:
         """
@@ -104,33 +118,13 @@ class NewsCollector:
             }
         """
         all_news = []
-        cutoff_time = datetime.now().timestamp() - (hours_back * 3600)
         
         for source_name, config in self.TRUSTED_SOURCES.items():
             for rss_url in config['rss_urls']:
                 try:
-                    print(f"[News] Fetching from {source_name}: {rss_url}")
-                    feed = feedparser.parse(rss_url)
-                    
-                    if not feed.entries:
-                        continue
-                    
-                    for entry in feed.entries:
-                        # Check if news is disaster-related
-                        if not self._is_disaster_related(entry):
-                            continue
-                        
-                        # Check if within time window
-                        published_time = self._get_entry_timestamp(entry)
-                        if published_time < cutoff_time:
-                            continue
-                        
-                        news_item = self._parse_news_entry(entry, source_name, config['reliability'])
-                        if news_item:
-                            all_news.append(news_item)
-                        
-                        if len(all_news) >= max_news:
-                            break
+                    all_news.extend(self.fetch_feed(
+                        source_name, rss_url, hours_back=hours_back, max_news=max_news - len(all_news)
+                    ))
                     
                     time.sleep(self.delay_seconds)
                     
@@ -147,13 +141,77 @@ class NewsCollector:
         print(f"[News] Fetched {len(all_news)} disaster-related news items")
         return all_news
     
-    def _is_disaster_related(self, entry) -> bool:
-        """Check if news entry is disaster-related"""
-        title = entry.get('title', '').lower()
-        summary = entry.get('summary', '').lower()
-        content = (title + " " + summary).lower()
+    def fetch_feed(
+        self,
+        source_name: str,
+        rss_url: str,
+        hours_back: int = 24,
+        max_news: int = 100,
+        mark_seen: bool = True
+    ) -> List[Dict]:
+        """
+        Fetch disaster-related news from a single feed of a trusted source
         
-        return any(keyword in content for keyword in self.DISASTER_KEYWORDS)
+        Used by fetch_disaster_news and by the ingestion scheduler, which
+        polls each feed on its own schedule.
+        
+        Args:
+            mark_seen: Mark returned items seen now. With False they carry
+                       their keys (SEEN_KEYS_FIELD) and the consumer marks
+                       them with SeenItemFilter.mark_items once stored;
+                       skipped entries are always marked.
+        """
+        reliability = self.TRUSTED_SOURCES[source_name]['reliability']
+        cutoff_time = datetime.now().timestamp() - (hours_back * 3600)
+        news = []
+        seen_keys = []
+        
+        print(f"[News] Fetching from {source_name}: {rss_url}")
+        for entry in self._feed_entries(rss_url):
+            # Skip entries already processed in an earlier run
+            if self.seen_filter is not None:
+                keys = self.seen_filter.keys(entry.get('link', ''), entry.get('title', ''), entry.get('summary', ''))
+                if self.seen_filter.seen(keys):
+                    continue
+                seen_keys.extend(keys)
+            
+            # One scan for relevance, province, severity and type
+            analysis = self.matcher.analyze(entry.get('title', '') + " " + entry.get('summary', ''))
+            
+            # Check if news is disaster-related
+            if not analysis['disaster_related']:
+                continue
+            
+            # Check if within time window
+            published_time = self._get_entry_timestamp(entry)
+            if published_time < cutoff_time:
+                continue
+            
+            news_item = self._parse_news_entry(entry, source_name, reliability, analysis)
+            if news_item:
+                if self.seen_filter is not None:
+                    del seen_keys[-len(keys):]
+                    news_item[SEEN_KEYS_FIELD] = [key.hex() for key in keys]
+                news.append(news_item)
+            
+            if len(news) >= max_news:
+                break
+        
+        if self.seen_filter is not None:
+            self.seen_filter.mark(seen_keys, source=f'NEWS_{source_name}')
+            if mark_seen:
+                self.seen_filter.mark_items(news)
+        return news
+    
+    def _feed_entries(self, rss_url: str) -> list:
+        """Entries of a feed, re-parsed only when the server sent a new copy"""
+        response = self.http.get(rss_url)
+        if response.not_modified and rss_url in self._parsed_feeds:
+            return self._parsed_feeds[rss_url]
+        
+        entries = feedparser.parse(response.content).entries
+        self._parsed_feeds[rss_url] = entries
+        return entries
     
     def _get_entry_timestamp(self, entry) -> float:
         """Get timestamp from RSS entry"""
@@ -166,8 +224,8 @@ class NewsCollector:
         # Fallback to current time
         return datetime.now().timestamp()
     
-    def _parse_news_entry(self, entry, source_name: str, reliability: float) -> Optional[Dict]:
-        """Parse news entry into structured dict"""
+    def _parse_news_entry(self, entry, source_name: str, reliability: float, analysis: Dict = None) -> Optional[Dict]:
+        """Parse news entry into structured dict (analysis: AlertTextMatcher.analyze of title and summary)"""
         try:
             title = entry.get('title', '')
             summary = entry.get('summary', '')
@@ -178,13 +236,14 @@ class NewsCollector:
             published_time = self._get_entry_timestamp(entry)
             created_at = datetime.fromtimestamp(published_time)
             
-            # Extract severity and type
-            severity = self._extract_severity(title + " " + content)
-            alert_type = self._extract_alert_type(title + " " + content)
-            province = self._extract_province(title + " " + content)
+            # Extract severity, type and province
+            analysis = analysis or self.matcher.analyze(title + " " + content)
+            severity = analysis['severity']
+            alert_type = analysis['alert_type']
+            province = analysis['province']
             
             # Generate ID
-            alert_id = f"NEWS_{source_name}_{int(published_time)}"
+            alert_id = item_id(f"NEWS_{source_name}", created_at, link, title, summary)
             
             return {
                 'id': alert_id,
@@ -212,59 +271,6 @@ class NewsCollector:
         except Exception as e:
             print(f"[News] Error parsing news entry: {e}")
             return None
-    
-    def _extract_severity(self, text: str) -> str:
-        """Extract severity from text"""
-        text_lower = text.lower()
-        
-        if any(kw in text_lower for kw in ['nghiêm trọng', 'cực kỳ', 'khẩn cấp', 'cấp độ 4']):
-            return 'critical'
-        elif any(kw in text_lower for kw in ['cao', 'nguy hiểm', 'cấp độ 3']):
-            return 'high'
-        elif any(kw in text_lower for kw in ['trung bình', 'cấp độ 2']):
-            return 'medium'
-        else:
-            return 'medium'
-    
-    def _extract_alert_type(self, text: str) -> str:
-        """Extract alert type from text"""
-        text_lower = text.lower()
-        
-        if any(kw in text_lower for kw in ['sơ tán', 'evacuation']):
-            return 'evacuation'
-        elif any(kw in text_lower for kw in ['lũ', 'lụt', 'flood', 'ngập']):
-            return 'disaster'
-        elif any(kw in text_lower for kw in ['bão', 'storm', 'typhoon']):
-            return 'weather'
-        elif any(kw in text_lower for kw in ['thiên tai', 'disaster']):
-            return 'disaster'
-        else:
-            return 'general'
-    
-    def _extract_province(self, text: str) -> str:
-        """Extract province from text"""
-        provinces = [
-            'Hà Nội', 'Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ',
-            'An Giang', 'Bà Rịa - Vũng Tàu', 'Bạc Liêu', 'Bắc Giang', 'Bắc Kạn',
-            'Bắc Ninh', 'Bến Tre', 'Bình Định', 'Bình Dương', 'Bình Phước',
-            'Bình Thuận', 'Cà Mau', 'Cao Bằng', 'Đắk Lắk', 'Đắk Nông',
-            'Điện Biên', 'Đồng Nai', 'Đồng Tháp', 'Gia Lai', 'Hà Giang',
-            'Hà Nam', 'Hà Tĩnh', 'Hải Dương', 'Hậu Giang', 'Hòa Bình',
-            'Hưng Yên', 'Khánh Hòa', 'Kiên Giang', 'Kon Tum', 'Lai Châu',
-            'Lâm Đồng', 'Lạng Sơn', 'Lào Cai', 'Long An', 'Nam Định',
-            'Nghệ An', 'Ninh Bình', 'Ninh Thuận', 'Phú Thọ', 'Phú Yên',
-            'Quảng Bình', 'Quảng Nam', 'Quảng Ngãi', 'Quảng Ninh', 'Quảng Trị',
-            'Sóc Trăng', 'Sơn La', 'Tây Ninh', 'Thái Bình', 'Thái Nguyên',
-            'Thanh Hóa', 'Thừa Thiên Huế', 'Tiền Giang', 'Trà Vinh', 'Tuyên Quang',
-            'Vĩnh Long', 'Vĩnh Phúc', 'Yên Bái'
-        ]
-        
-        text_lower = text.lower()
-        for province in provinces:
-            if province.lower() in text_lower:
-                return province
-        
-        return 'Toàn quốc'
 
 
 if __name__ == "__main__":
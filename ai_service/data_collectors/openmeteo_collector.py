@@ -5,7 +5,6 @@ Free, unlimited weather API for historical and real-time data.
 No API key required!
 """
 import requests
-import json
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -15,29 +14,40 @@ sys.path.append(str(Path(__file__).parent.parent))
 from config import (
     OPEN_METEO_FORECAST_URL,
     OPEN_METEO_ARCHIVE_URL,
-    WEATHER_CACHE_DIR,
     WEATHER_API_TIMEOUT
 )
+from data_collectors.weather_archive import WeatherArchive, ARCHIVE_DAILY_VARIABLES
 
 
 class OpenMeteoCollector:
     """Collect weather data from Open-Meteo API (100% free)"""
     
-    def __init__(self, cache_enabled: bool = True):
+    def __init__(self, cache_enabled: bool = True, raise_errors: bool = False, archive: WeatherArchive = None):
+        """
+        Args:
+            cache_enabled: Serve historical weather from the local archive
+            raise_errors: Propagate request errors from current/forecast
+                          calls instead of returning {} (used by
+                          ResilientWeatherCollector to count failures)
+            archive: Archive to use (default: shared WEATHER_ARCHIVE_PATH)
+        """
         self.forecast_url = OPEN_METEO_FORECAST_URL
         self.archive_url = OPEN_METEO_ARCHIVE_URL
         self.cache_enabled = cache_enabled
+        self.raise_errors = raise_errors
+        self.archive = None
         
         if cache_enabled:
-            WEATHER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            self.archive = archive or WeatherArchive()
     
-    def get_current_weather(self, lat: float, lng: float) -> Dict:
+    def get_current_weather(self, lat: float, lng: float, timeout: float = None) -> Dict:
         """
         Get current weather conditions
         
         Args:
             lat: Latitude
             lng: Longitude
+            timeout: Request timeout in seconds (default WEATHER_API_TIMEOUT)
             
         Returns:
             Dict with current weather data
@@ -62,15 +72,17 @@ class OpenMeteoCollector:
             response = requests.get(
                 self.forecast_url,
                 params=params,
-                timeout=WEATHER_API_TIMEOUT
+                timeout=WEATHER_API_TIMEOUT if timeout is None else timeout
             )
             response.raise_for_status()
             return response.json()
         except Exception as e:
+            if self.raise_errors:
+                raise
             print(f"Error fetching current weather: {e}")
             return {}
     
-    def get_forecast(self, lat: float, lng: float, days: int = 7) -> Dict:
+    def get_forecast(self, lat: float, lng: float, days: int = 7, timeout: float = None) -> Dict:
         """
         Get weather forecast
         
@@ -78,6 +90,7 @@ class OpenMeteoCollector:
             lat: Latitude
             lng: Longitude
             days: Number of days to forecast (max 16)
+            timeout: Request timeout in seconds (default WEATHER_API_TIMEOUT)
             
         Returns:
             Dict with forecast data
@@ -101,11 +114,13 @@ class OpenMeteoCollector:
             response = requests.get(
                 self.forecast_url,
                 params=params,
-                timeout=WEATHER_API_TIMEOUT
+                timeout=WEATHER_API_TIMEOUT if timeout is None else timeout
             )
             response.raise_for_status()
             return response.json()
         except Exception as e:
+            if self.raise_errors:
+                raise
             print(f"Error fetching forecast: {e}")
             return {}
     
@@ -119,6 +134,10 @@ class OpenMeteoCollector:
         """
         Get historical weather data
         
+        With caching enabled, days already in the local archive are served
+        from it and only the missing days are fetched. Values are those of
+        the point's archive grid cell.
+        
         Args:
             lat: Latitude
             lng: Longitude
@@ -128,32 +147,25 @@ class OpenMeteoCollector:
         Returns:
             Dict with historical daily weather data
         """
-        # Check cache first
-        if self.cache_enabled:
-            cache_key = f"{lat}_{lng}_{start_date}_{end_date}"
-            cache_file = WEATHER_CACHE_DIR / f"{cache_key}.json"
-            
-            if cache_file.exists():
-                print(f"[Cache] Loading from {cache_file}")
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
+        if self.archive is None:
+            return self._fetch_historical(lat, lng, start_date, end_date)
+        
+        center_lat, center_lng = self.archive.cell_center(lat, lng)
+        for missing_start, missing_end in self.archive.missing_ranges(lat, lng, start_date, end_date):
+            data = self._fetch_historical(center_lat, center_lng, missing_start, missing_end)
+            if data and 'daily' in data:
+                self.archive.store(lat, lng, data['daily'])
         
+        return self.archive.get_range(lat, lng, start_date, end_date)
+    
+    def _fetch_historical(self, lat: float, lng: float, start_date: str, end_date: str) -> Dict:
+        """Fetch daily history from the Open-Meteo archive API"""
         params = {
             "latitude": lat,
             "longitude": lng,
             "start_date": start_date,
             "end_date": end_date,
-            "daily": [
-                "temperature_2m_max",
-                "temperature_2m_min",
-                "temperature_2m_mean",
-                "precipitation_sum",
-                "rain_sum",
-                "wind_speed_10m_max",
-                "wind_gusts_10m_max",
-                "relative_humidity_2m_mean",
-                "pressure_msl_mean"
-            ],
+            "daily": ARCHIVE_DAILY_VARIABLES,
             "timezone": "Asia/Bangkok"
         }
         
@@ -164,14 +176,7 @@ class OpenMeteoCollector:
                 timeout=WEATHER_API_TIMEOUT
             )
             response.raise_for_status()
-            data = response.json()
-            
-            # Cache the result
-            if self.cache_enabled:
-                with open(cache_file, 'w') as f:
-                    json.dump(data, f, indent=2)
-            
-            return data
+            return response.json()
         except Exception as e:
             print(f"Error fetching historical weather: {e}")
             return {}
@@ -0,0 +1,202 @@
+"""
+Resilient wrapper around OpenMeteoCollector
+
+Stale-while-revalidate caching for current weather and forecasts plus a
+circuit breaker, so a slow or failing Open-Meteo does not make every
+hazard prediction wait for the full timeout.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+import sys
+
+import requests
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    WEATHER_FRESH_SECONDS, WEATHER_STALE_SECONDS, WEATHER_SWR_MAX_ENTRIES,
+    WEATHER_BREAKER_FAILURES, WEATHER_BREAKER_COOLDOWN_SECONDS, WEATHER_API_TIMEOUT
+)
+from data_collectors.openmeteo_collector import OpenMeteoCollector
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class ResilientWeatherCollector:
+    """
+    Drop-in replacement for OpenMeteoCollector's live-weather calls
+
+    - Fresh cache hit: returned directly.
+    - Expired but not too old: returned immediately, and one background
+      refresh is started for that location.
+    - Miss: fetched synchronously through the circuit breaker. While the
+      breaker is open the call returns {} at once instead of waiting on a
+      dead upstream.
+
+    Locations are keyed to 2 decimal places (~1 km). Other collector
+    methods (e.g. get_historical_weather) are delegated unchanged.
+
+    A call whose timeout was shortened below WEATHER_API_TIMEOUT by the
+    caller's deadline does not count towards opening the breaker when it
+    times out: impatient clients must not cut off upstream for everyone.
+    """
+
+    def __init__(
+        self,
+        collector: OpenMeteoCollector = None,
+        fresh_seconds: dict = None,
+        stale_seconds: float = WEATHER_STALE_SECONDS,
+        max_entries: int = WEATHER_SWR_MAX_ENTRIES,
+        breaker: CircuitBreaker = None
+    ):
+        self.collector = collector or OpenMeteoCollector(cache_enabled=True, raise_errors=True)
+        self.collector.raise_errors = True
+        self.fresh_seconds = dict(fresh_seconds or WEATHER_FRESH_SECONDS)
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.breaker = breaker or CircuitBreaker(
+            "open-meteo",
+            failure_threshold=WEATHER_BREAKER_FAILURES,
+            cooldown_seconds=WEATHER_BREAKER_COOLDOWN_SECONDS
+        )
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    def __getattr__(self, name):
+        if name == 'collector':
+            raise AttributeError(name)
+        return getattr(self.collector, name)
+
+    def get_current_weather(self, lat: float, lng: float, timeout: float = None) -> Dict:
+        """Current weather (see OpenMeteoCollector.get_current_weather)"""
+        return self._get(
+            ('current', round(lat, 2), round(lng, 2)),
+            self.collector.get_current_weather, lat=lat, lng=lng, timeout=timeout
+        )
+
+    def get_forecast(self, lat: float, lng: float, days: int = 7, timeout: float = None) -> Dict:
+        """Forecast (see OpenMeteoCollector.get_forecast)"""
+        return self._get(
+            ('forecast', round(lat, 2), round(lng, 2), days),
+            self.collector.get_forecast, lat=lat, lng=lng, days=days, timeout=timeout
+        )
+
+    def is_fresh(self, lat: float, lng: float, days: int = 7) -> bool:
+        """Whether current weather and forecast for this point are cached and fresh"""
+        now = time.monotonic()
+        with self._lock:
+            for key in (('current', round(lat, 2), round(lng, 2)),
+                        ('forecast', round(lat, 2), round(lng, 2), days)):
+                entry = self._cache.get(key)
+                if entry is None or now - entry[1] >= self.fresh_seconds[key[0]]:
+                    return False
+        return True
+
+    def refresh(self, lat: float, lng: float, days: int = 7) -> bool:
+        """
+        Fetch current weather and forecast for a point into the cache now
+
+        Used by the pre-warming scheduler. Returns False if upstream failed
+        or the circuit is open.
+        """
+        try:
+            self._fetch(('current', round(lat, 2), round(lng, 2)),
+                        self.collector.get_current_weather, dict(lat=lat, lng=lng))
+            self._fetch(('forecast', round(lat, 2), round(lng, 2), days),
+                        self.collector.get_forecast, dict(lat=lat, lng=lng, days=days))
+            return True
+        except Exception:
+            return False
+
+    def _get(self, key: tuple, fetch, **kwargs) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+
+        if entry is not None:
+            data, fetched_at = entry
+            age = now - fetched_at
+            if age < self.fresh_seconds[key[0]]:
+                self.hits += 1
+                return data
+            if age < self.stale_seconds:
+                self.stale_hits += 1
+                self._refresh_in_background(key, fetch, kwargs)
+                return data
+
+        self.misses += 1
+        try:
+            return self._fetch(key, fetch, kwargs)
+        except CircuitOpenError:
+            return {}
+        except Exception as e:
+            print(f"[Weather] Upstream error: {e}")
+            return {}
+
+    def _fetch(self, key: tuple, fetch, kwargs: dict) -> Dict:
+        """Fetch through the breaker and store the result"""
+        timeout = kwargs.get('timeout')
+        # requests raises ValueError for a zero timeout
+        ignored = (requests.Timeout, ValueError) if timeout is not None and timeout < WEATHER_API_TIMEOUT else ()
+        try:
+            data = self.breaker.call_ignoring(ignored, fetch, **kwargs)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        with self._lock:
+            self._cache[key] = (data, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return data
+
+    def _refresh_in_background(self, key: tuple, fetch, kwargs: dict):
+        """Start at most one refresh per key; skipped while the breaker is open"""
+        if self.breaker.state == CircuitBreaker.OPEN:
+            return
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        # Background refreshes are not bound by the caller's deadline
+        kwargs = dict(kwargs, timeout=None)
+
+        def refresh():
+            try:
+                self._fetch(key, fetch, kwargs)
+                self.refreshes += 1
+            except Exception as e:
+                print(f"[Weather] Background refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
+
+    def get_stats(self) -> dict:
+        """Cache and circuit breaker statistics"""
+        return {
+            'circuit_breaker': self.breaker.get_stats(),
+            'cache_entries': len(self._cache),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'background_refreshes': self.refreshes,
+            'upstream_failures': self.failures,
+        }
@@ -0,0 +1,246 @@
+"""
+Persistent seen-item filter for incremental ingestion
+
+Each item is identified by its canonical link and by a hash of its
+normalized title and text, so a story re-published under a new URL, or
+an URL re-sent with tracking parameters, is still recognised.
+"""
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    SEEN_ITEMS_PATH, SEEN_ITEMS_CAPACITY, SEEN_ITEMS_ERROR_RATE, SEEN_ITEMS_RETENTION_DAYS
+)
+
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'zarsrc', 'zarsource', 'ref')
+# Field carrying an emitted item's keys (hex) until its consumer marks it
+# seen with mark_items(), e.g. the alert pipeline once it is stored
+SEEN_KEYS_FIELD = '_seen_keys'
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def canonical_link(url: str) -> str:
+    """
+    Link with the variations feeds introduce removed
+
+    Scheme, "www.", fragment, trailing slash and tracking parameters are
+    dropped; the remaining query parameters are sorted.
+    """
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit(('', host, parts.path.rstrip('/') or '/', urlencode(query), ''))
+
+
+def content_hash(*texts: str) -> str:
+    """Hash of the texts with markup, case and whitespace normalized"""
+    text = ' '.join(t or '' for t in texts)
+    text = _SPACE_RE.sub(' ', _TAG_RE.sub(' ', text)).strip().casefold()
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def item_id(prefix: str, created_at: datetime, link: str = '', *texts: str) -> str:
+    """
+    Alert id that stays unique for items published in the same second
+
+    `{prefix}_{unix seconds}_{8 hex digits of the link (or content) hash}`
+    """
+    basis = canonical_link(link) if link else content_hash(*texts)
+    digest = hashlib.blake2b(basis.encode('utf-8'), digest_size=4).hexdigest()
+    return f"{prefix}_{int(created_at.timestamp())}_{digest}"
+
+
+class BloomFilter:
+    """
+    Bit-array Bloom filter over 16-byte digests
+
+    Sized for `capacity` keys at `error_rate` false positives; the k bit
+    positions come from double hashing the two 64-bit halves of the digest.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.n_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.n_hashes = max(1, round(self.n_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        for i in range(self.n_hashes):
+            yield (h1 + i * h2) % self.n_bits
+
+    def add(self, digest: bytes):
+        """Set the digest's bits; `count` only grows for keys not already present"""
+        new = False
+        for pos in self._positions(digest):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class SeenItemFilter:
+    """
+    Keys of already-ingested items: Bloom filter backed by SQLite
+
+    `seen()` answers most new items from the Bloom filter alone (a
+    negative is exact); only Bloom positives are confirmed in the store,
+    so false positives never drop a new item. The filter is rebuilt from
+    the store on start-up and after `prune()`, and doubles in size when
+    the store outgrows its capacity.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = SEEN_ITEMS_PATH,
+        capacity: int = SEEN_ITEMS_CAPACITY,
+        error_rate: float = SEEN_ITEMS_ERROR_RATE
+    ):
+        self.db_path = db_path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS seen_items (
+                key BLOB PRIMARY KEY,
+                source TEXT,
+                first_seen REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self._conn.commit()
+
+        self.checks = 0
+        self.bloom_negatives = 0
+        self.false_positives = 0
+        self.marked = 0
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        stored = self._conn.execute("SELECT COUNT(*) FROM seen_items").fetchone()[0]
+        capacity = self.capacity
+        while stored > capacity:
+            capacity *= 2
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        for (key,) in self._conn.execute("SELECT key FROM seen_items"):
+            self.bloom.add(key)
+
+    @staticmethod
+    def keys(link: str = '', *texts: str) -> List[bytes]:
+        """Digests identifying an item: canonical link (if any) and content hash"""
+        keys = []
+        link = canonical_link(link)
+        if link:
+            keys.append(hashlib.blake2b(b'link:' + link.encode('utf-8'), digest_size=16).digest())
+        keys.append(bytes.fromhex(content_hash(*texts)))
+        return keys
+
+    def seen(self, keys: Iterable[bytes]) -> bool:
+        """True if any of the keys was marked before"""
+        with self._lock:
+            self.checks += 1
+            candidates = [key for key in keys if key in self.bloom]
+            if not candidates:
+                self.bloom_negatives += 1
+                return False
+            placeholders = ','.join('?' * len(candidates))
+            found = self._conn.execute(
+                f"SELECT 1 FROM seen_items WHERE key IN ({placeholders}) LIMIT 1", candidates
+            ).fetchone()
+            if found is None:
+                self.false_positives += 1
+            return found is not None
+
+    def mark(self, keys: Iterable[bytes], source: str = None):
+        """Record keys as seen (one transaction)"""
+        now = time.time()
+        with self._lock:
+            rows = [(key, source, now) for key in keys]
+            if not rows:
+                return
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO seen_items (key, source, first_seen) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+            for key, _, _ in rows:
+                self.bloom.add(key)
+            self.marked += max(cursor.rowcount, 0)
+            if self.bloom.count > self.bloom.capacity:
+                self._rebuild()
+
+    def mark_items(self, items: List[Dict], source: str = None):
+        """Mark the keys attached to emitted items (SEEN_KEYS_FIELD, removed from the items)"""
+        by_source = {}
+        for item in items:
+            keys = item.pop(SEEN_KEYS_FIELD, None) or ()
+            by_source.setdefault(source or item.get('source'), []).extend(bytes.fromhex(key) for key in keys)
+        for item_source, keys in by_source.items():
+            self.mark(keys, item_source)
+
+    def filter_new(self, items: List[Dict], source: str = None) -> List[Dict]:
+        """Items (alert dicts) not seen before, marking them seen"""
+        new, pending, batch = [], [], set()
+        for item in items:
+            keys = self.keys(item.get('link', ''), item.get('title', ''), item.get('content', ''))
+            if batch.intersection(keys) or self.seen(keys):
+                continue
+            batch.update(keys)
+            pending.extend(keys)
+            new.append(item)
+        self.mark(pending, source)
+        return new
+
+    def prune(self, older_than_days: float = SEEN_ITEMS_RETENTION_DAYS) -> int:
+        """Forget keys first seen more than `older_than_days` ago"""
+        cutoff = time.time() - older_than_days * 86400
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM seen_items WHERE first_seen < ?", (cutoff,)).rowcount
+            self._conn.commit()
+            if deleted:
+                self._rebuild()
+        return deleted
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM seen_items").fetchone()[0]
+            return {
+                'stored_keys': stored,
+                'bloom_bytes': len(self.bloom.bits),
+                'bloom_hashes': self.bloom.n_hashes,
+                'checks': self.checks,
+                'bloom_negatives': self.bloom_negatives,
+                'false_positives': self.false_positives,
+                'marked': self.marked,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
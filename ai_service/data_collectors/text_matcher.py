@@ -0,0 +1,271 @@
+"""
+Keyword and province extraction shared by the alert collectors
+
+All vocabularies (provinces, severity and hazard keywords, disaster
+relevance keywords) are compiled into one Aho-Corasick automaton over
+syllable tokens, so a text is normalized and scanned once for everything.
+"""
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+# Province names as emitted in alert['province']
+PROVINCES = [
+    'Hà Nội', 'Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ',
+    'An Giang', 'Bà Rịa - Vũng Tàu', 'Bạc Liêu', 'Bắc Giang', 'Bắc Kạn',
+    'Bắc Ninh', 'Bến Tre', 'Bình Định', 'Bình Dương', 'Bình Phước',
+    'Bình Thuận', 'Cà Mau', 'Cao Bằng', 'Đắk Lắk', 'Đắk Nông',
+    'Điện Biên', 'Đồng Nai', 'Đồng Tháp', 'Gia Lai', 'Hà Giang',
+    'Hà Nam', 'Hà Tĩnh', 'Hải Dương', 'Hậu Giang', 'Hòa Bình',
+    'Hưng Yên', 'Khánh Hòa', 'Kiên Giang', 'Kon Tum', 'Lai Châu',
+    'Lâm Đồng', 'Lạng Sơn', 'Lào Cai', 'Long An', 'Nam Định',
+    'Nghệ An', 'Ninh Bình', 'Ninh Thuận', 'Phú Thọ', 'Phú Yên',
+    'Quảng Bình', 'Quảng Nam', 'Quảng Ngãi', 'Quảng Ninh', 'Quảng Trị',
+    'Sóc Trăng', 'Sơn La', 'Tây Ninh', 'Thái Bình', 'Thái Nguyên',
+    'Thanh Hóa', 'Thừa Thiên Huế', 'Tiền Giang', 'Trà Vinh', 'Tuyên Quang',
+    'Vĩnh Long', 'Vĩnh Phúc', 'Yên Bái'
+]
+NATIONWIDE = 'Toàn quốc'
+
+# Abbreviations used in headlines
+PROVINCE_ALIASES = {
+    'tp.hcm': 'Hồ Chí Minh',
+    'tphcm': 'Hồ Chí Minh',
+    'hcm': 'Hồ Chí Minh',
+    'hn': 'Hà Nội',
+    'dn': 'Đà Nẵng',
+}
+
+# Checked in order: the first level with any keyword present wins
+SEVERITY_KEYWORDS = [
+    ('critical', ['nghiêm trọng', 'cực kỳ', 'rất nguy hiểm', 'khẩn cấp', 'cấp độ 4', 'cấp độ 5']),
+    ('high', ['cao', 'nguy hiểm', 'cấp độ 3', 'mạnh']),
+    ('medium', ['trung bình', 'cấp độ 2', 'vừa']),
+]
+DEFAULT_SEVERITY = 'medium'
+
+HAZARD_KEYWORDS = {
+    'evacuation': ['sơ tán', 'evacuation', 'evacuate'],
+    'flood': ['lũ', 'lụt', 'ngập', 'flood', 'floods', 'flooding'],
+    'storm': ['bão', 'storm', 'storms', 'typhoon'],
+    'disaster': ['thiên tai', 'disaster'],
+    'rain': ['mưa', 'rain', 'dông', 'thunder', 'thunderstorm'],
+}
+
+# alert_type per hazard keyword group, in priority order (first match wins).
+# NCHMF publishes weather bulletins, so storms take precedence there.
+ALERT_TYPE_RULES = {
+    'default': [('evacuation', 'evacuation'), ('flood', 'disaster'), ('storm', 'weather'), ('disaster', 'disaster')],
+    'nchmf': [('storm', 'weather'), ('flood', 'disaster'), ('evacuation', 'evacuation'), ('rain', 'weather')],
+}
+DEFAULT_ALERT_TYPE = 'general'
+
+# Keywords that make a news item disaster-related
+DISASTER_KEYWORDS = [
+    'lũ lụt', 'bão', 'thiên tai', 'sơ tán', 'cứu hộ',
+    'mưa lớn', 'ngập lụt', 'sạt lở', 'động đất', 'hạn hán',
+    'flood', 'floods', 'flooding', 'storm', 'typhoon', 'disaster', 'evacuation',
+    'cảnh báo', 'khẩn cấp', 'nguy hiểm'
+]
+
+_TOKEN_RE = re.compile(r'\w+')
+_TONES = '\u0300\u0301\u0309\u0303\u0323'  # grave, acute, hook, tilde, dot below
+
+
+def _tone_placement_map() -> Dict[str, str]:
+    """'oà' -> 'òa', 'uỷ' -> 'ủy', ...: both tone placements map to one spelling"""
+    mapping = {}
+    for first, second in (('o', 'a'), ('o', 'e'), ('u', 'y')):
+        for tone in _TONES:
+            on_second = first + unicodedata.normalize('NFC', second + tone)
+            on_first = unicodedata.normalize('NFC', first + tone) + second
+            mapping[on_second] = on_first
+    return mapping
+
+
+_TONE_MAP = _tone_placement_map()
+_TONE_RE = re.compile('(?:' + '|'.join(_TONE_MAP) + r')(?!\w)')
+_TONE_MAP_REVERSE = {v: k for k, v in _TONE_MAP.items()}
+_TONE_REVERSE_RE = re.compile('(?:' + '|'.join(_TONE_MAP_REVERSE) + r')(?!\w)')
+
+
+def _fold(text: str) -> str:
+    return unicodedata.normalize('NFC', text or '').casefold()
+
+
+def normalize(text: str) -> str:
+    """NFC, case-folded, with one tone-mark placement ('Hoà' and 'Hòa' agree)"""
+    return _TONE_RE.sub(lambda m: _TONE_MAP[m.group()], _fold(text))
+
+
+def spellings(text: str) -> set:
+    """Case-folded text in both tone-mark placements ('hòa bình', 'hoà bình')"""
+    folded = _fold(text)
+    return {
+        folded,
+        _TONE_RE.sub(lambda m: _TONE_MAP[m.group()], folded),
+        _TONE_REVERSE_RE.sub(lambda m: _TONE_MAP_REVERSE[m.group()], folded),
+    }
+
+
+def strip_diacritics(text: str) -> str:
+    """'Quảng Nam' -> 'Quang Nam' (for headlines written without accents)"""
+    decomposed = unicodedata.normalize('NFD', text.replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn')
+
+
+class AlertTextMatcher:
+    """
+    Single-pass extraction of province, severity, alert type and relevance
+
+    Patterns are sequences of syllable tokens and are only matched on token
+    boundaries ('lũ' does not match inside 'lũy'). Each pattern is added in
+    both tone-mark placements and province names also without diacritics,
+    so the text itself is only case-folded and split on whitespace. A keyword
+    inside a matched province name is ignored, so "Cao Bằng" does not
+    count as the severity word "cao".
+    """
+
+    def __init__(self, extra_places: Dict[str, str] = None):
+        """
+        Args:
+            extra_places: Additional place names (e.g. districts) mapped to
+                          the province reported when they are mentioned
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str, str]]] = [[]]
+        self._vocab = set()
+
+        for province in PROVINCES:
+            self._add(province, 'province', province)
+            self._add(strip_diacritics(province), 'province', province)
+        for alias, province in PROVINCE_ALIASES.items():
+            self._add(alias, 'province', province)
+        for place, province in (extra_places or {}).items():
+            self._add(place, 'province', province)
+        for level, keywords in SEVERITY_KEYWORDS:
+            for keyword in keywords:
+                self._add(keyword, 'severity', level)
+        for hazard, keywords in HAZARD_KEYWORDS.items():
+            for keyword in keywords:
+                self._add(keyword, 'hazard', hazard)
+        for keyword in DISASTER_KEYWORDS:
+            self._add(keyword, 'relevance', 'disaster')
+        self._build_failure_links()
+
+    def _add(self, pattern: str, group: str, label: str):
+        for spelling in spellings(pattern):
+            tokens = _TOKEN_RE.findall(spelling)
+            state = 0
+            for token in tokens:
+                self._vocab.add(token)
+                nxt = self._goto[state].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][token] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            entry = (len(tokens), group, label)
+            if entry not in self._out[state]:
+                self._out[state].append(entry)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """All (start token, end token, group, label) matches, in order of their end"""
+        goto, fail, out, vocab = self._goto, self._fail, self._out, self._vocab
+        words = _fold(text).split()
+        matches = []
+        state, previous, position = 0, -2, 0
+        # Plain words outside the vocabulary cannot advance the automaton and
+        # are skipped (sending it back to the root); words with punctuation
+        # attached ("nam," / "rịa-vũng" / "tp.hcm") are split into tokens
+        for i, word in [(i, w) for i, w in enumerate(words) if w in vocab or not w.isalnum()]:
+            if i != previous + 1:
+                state = 0
+                position += 1
+            previous = i
+            for token in ((word,) if word in vocab else _TOKEN_RE.findall(word)):
+                position += 1
+                if token not in vocab:
+                    state = 0
+                    continue
+                while state and token not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(token, 0)
+                for length, group, label in out[state]:
+                    matches.append((position - length, position, group, label))
+        return matches
+
+    def analyze(self, text: str, profile: str = 'default') -> Dict:
+        """
+        Extract everything the collectors need from one scan
+
+        Returns:
+            {'province': first province mentioned (or 'Toàn quốc'),
+             'provinces': all provinces mentioned, in order,
+             'severity': str, 'alert_type': str, 'disaster_related': bool}
+        """
+        provinces, spans, others = [], [], []
+        for match in self.find(text):
+            (spans if match[2] == 'province' else others).append(match)
+
+        # Leftmost-longest province names; keywords inside them are ignored
+        if spans:
+            names = sorted(spans)
+            spans = []
+            for start, end, _, label in names:
+                if spans and start < spans[-1][1]:
+                    if start == spans[-1][0]:  # longer name at the same start
+                        spans[-1] = (start, end)
+                        provinces[-1] = label
+                    continue
+                spans.append((start, end))
+                provinces.append(label)
+            others = [m for m in others if not any(s <= m[0] and m[1] <= e for s, e in spans)]
+        found = {(group, label) for _, _, group, label in others}
+
+        severity = DEFAULT_SEVERITY
+        for level, _ in SEVERITY_KEYWORDS:
+            if ('severity', level) in found:
+                severity = level
+                break
+        alert_type = DEFAULT_ALERT_TYPE
+        for hazard, label in ALERT_TYPE_RULES[profile]:
+            if ('hazard', hazard) in found:
+                alert_type = label
+                break
+        return {
+            'province': provinces[0] if provinces else NATIONWIDE,
+            'provinces': list(dict.fromkeys(provinces)),
+            'severity': severity,
+            'alert_type': alert_type,
+            'disaster_related': ('relevance', 'disaster') in found,
+        }
+
+
+_matcher = None
+
+
+def get_matcher() -> AlertTextMatcher:
+    """Shared compiled matcher (built on first use)"""
+    global _matcher
+    if _matcher is None:
+        _matcher = AlertTextMatcher()
+    return _matcher
@@ -0,0 +1,242 @@
+"""
+Local historical weather archive
+
+Daily Open-Meteo archive values stored once per (grid cell, date) in
+SQLite, so overlapping date ranges share data and arbitrary range
+queries are answered locally.
+"""
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    WEATHER_ARCHIVE_PATH, WEATHER_ARCHIVE_GRID_DEG,
+    WEATHER_ARCHIVE_MAX_ROWS, WEATHER_ARCHIVE_FINAL_AFTER_DAYS
+)
+
+# Daily variables requested from the archive API (column order in the store)
+ARCHIVE_DAILY_VARIABLES = [
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "temperature_2m_mean",
+    "precipitation_sum",
+    "rain_sum",
+    "wind_speed_10m_max",
+    "wind_gusts_10m_max",
+    "relative_humidity_2m_mean",
+    "pressure_msl_mean"
+]
+
+
+def _to_date(value) -> date:
+    return value if isinstance(value, date) else datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class WeatherArchive:
+    """
+    SQLite store of daily weather per grid cell
+
+    - Points are snapped to a `grid_deg` grid; upstream is queried at the
+      cell centre so every point in a cell shares the same series.
+    - `missing_ranges` lists the date runs not yet archived, so callers
+      fetch only those.
+    - Size is bounded by `max_rows`: when exceeded, whole cells are evicted
+      in least-recently-used order.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = WEATHER_ARCHIVE_PATH,
+        grid_deg: float = WEATHER_ARCHIVE_GRID_DEG,
+        max_rows: int = WEATHER_ARCHIVE_MAX_ROWS
+    ):
+        self.db_path = db_path
+        self.grid_deg = grid_deg
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._init_db()
+
+    def _init_db(self):
+        """Create tables (one row per cell/day, plus per-cell bookkeeping)"""
+        columns = ",\n".join(f"{name} REAL" for name in ARCHIVE_DAILY_VARIABLES)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS weather_daily (
+                    cell_lat INTEGER NOT NULL,
+                    cell_lng INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    {columns},
+                    PRIMARY KEY (cell_lat, cell_lng, day)
+                ) WITHOUT ROWID
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS weather_cells (
+                    cell_lat INTEGER NOT NULL,
+                    cell_lng INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL DEFAULT 0,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (cell_lat, cell_lng)
+                )
+            ''')
+            self._conn.commit()
+
+    # ----- Grid -----
+
+    def cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        """Grid cell index for a point"""
+        return round(lat / self.grid_deg), round(lng / self.grid_deg)
+
+    def cell_center(self, lat: float, lng: float) -> Tuple[float, float]:
+        """Coordinates of the centre of the point's grid cell"""
+        cell_lat, cell_lng = self.cell(lat, lng)
+        return round(cell_lat * self.grid_deg, 4), round(cell_lng * self.grid_deg, 4)
+
+    # ----- Queries -----
+
+    def missing_ranges(self, lat: float, lng: float, start_date, end_date, merge_gap_days: int = 7) -> List[Tuple[str, str]]:
+        """
+        Date runs in [start_date, end_date] that are not archived yet
+
+        Runs separated by at most `merge_gap_days` archived days are merged,
+        trading a few re-fetched days for fewer requests.
+        """
+        start, end = _to_date(start_date), _to_date(end_date)
+        cell_lat, cell_lng = self.cell(lat, lng)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day FROM weather_daily WHERE cell_lat=? AND cell_lng=? AND day BETWEEN ? AND ?",
+                (cell_lat, cell_lng, start.isoformat(), end.isoformat())
+            ).fetchall()
+        have = {row[0] for row in rows}
+
+        runs = []
+        day = start
+        while day <= end:
+            if day.isoformat() not in have:
+                if runs and (day - runs[-1][1]).days <= merge_gap_days + 1:
+                    runs[-1][1] = day
+                else:
+                    runs.append([day, day])
+            day += timedelta(days=1)
+
+        return [(s.isoformat(), e.isoformat()) for s, e in runs]
+
+    def get_range(self, lat: float, lng: float, start_date, end_date) -> Dict:
+        """
+        Archived days in [start_date, end_date] in Open-Meteo response shape
+
+        Days with no data are omitted.
+        """
+        start, end = _to_date(start_date), _to_date(end_date)
+        cell_lat, cell_lng = self.cell(lat, lng)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT day, {', '.join(ARCHIVE_DAILY_VARIABLES)} FROM weather_daily "
+                "WHERE cell_lat=? AND cell_lng=? AND day BETWEEN ? AND ? ORDER BY day",
+                (cell_lat, cell_lng, start.isoformat(), end.isoformat())
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE weather_cells SET last_access=? WHERE cell_lat=? AND cell_lng=?",
+                (time.time(), cell_lat, cell_lng)
+            )
+            self._conn.commit()
+
+        rows = [row for row in rows if any(value is not None for value in row[1:])]
+        if not rows:
+            return {}
+
+        center_lat, center_lng = self.cell_center(lat, lng)
+        daily = {'time': [row[0] for row in rows]}
+        for i, name in enumerate(ARCHIVE_DAILY_VARIABLES, start=1):
+            daily[name] = [row[i] for row in rows]
+        return {'latitude': center_lat, 'longitude': center_lng, 'daily': daily}
+
+    # ----- Writes -----
+
+    def store(self, lat: float, lng: float, daily: Dict) -> int:
+        """
+        Archive an Open-Meteo `daily` block for the point's cell
+
+        All-null days newer than WEATHER_ARCHIVE_FINAL_AFTER_DAYS are not
+        stored, so they are fetched again once upstream fills them in.
+
+        Returns:
+            Number of days written
+        """
+        cutoff = (date.today() - timedelta(days=WEATHER_ARCHIVE_FINAL_AFTER_DAYS)).isoformat()
+        cell_lat, cell_lng = self.cell(lat, lng)
+        values = [daily.get(name) or [] for name in ARCHIVE_DAILY_VARIABLES]
+
+        rows = []
+        for i, day in enumerate(daily.get('time', [])):
+            row = [column[i] if i < len(column) else None for column in values]
+            if all(value is None for value in row) and day > cutoff:
+                continue
+            rows.append((cell_lat, cell_lng, day, *row))
+
+        if not rows:
+            return 0
+
+        placeholders = ", ".join("?" * (3 + len(ARCHIVE_DAILY_VARIABLES)))
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO weather_daily VALUES ({placeholders})", rows
+            )
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM weather_daily WHERE cell_lat=? AND cell_lng=?",
+                (cell_lat, cell_lng)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO weather_cells VALUES (?, ?, ?, ?)",
+                (cell_lat, cell_lng, count, time.time())
+            )
+            self._conn.commit()
+
+        self.enforce_retention()
+        return len(rows)
+
+    def enforce_retention(self) -> int:
+        """Evict least-recently-used cells until under max_rows; returns cells evicted"""
+        evicted = 0
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(row_count), 0) FROM weather_cells").fetchone()[0]
+            if total <= self.max_rows:
+                return 0
+            cells = self._conn.execute(
+                "SELECT cell_lat, cell_lng, row_count FROM weather_cells ORDER BY last_access"
+            ).fetchall()
+            for cell_lat, cell_lng, row_count in cells:
+                if total <= self.max_rows:
+                    break
+                self._conn.execute(
+                    "DELETE FROM weather_daily WHERE cell_lat=? AND cell_lng=?", (cell_lat, cell_lng)
+                )
+                self._conn.execute(
+                    "DELETE FROM weather_cells WHERE cell_lat=? AND cell_lng=?", (cell_lat, cell_lng)
+                )
+                total -= row_count
+                evicted += 1
+            self._conn.commit()
+        if evicted:
+            print(f"[WeatherArchive] Evicted {evicted} cells (limit {self.max_rows} rows)")
+        return evicted
+
+    def get_stats(self) -> Dict:
+        """Archive size statistics"""
+        with self._lock:
+            cells, rows = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(row_count), 0) FROM weather_cells"
+            ).fetchone()
+        size = Path(self.db_path).stat().st_size if Path(self.db_path).exists() else 0
+        return {'cells': cells, 'rows': rows, 'max_rows': self.max_rows, 'size_bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -6,23 +6,41 @@ Provides AI-powered:
 - Semantic duplicate detection using Sentence Transformers
 - Intelligent notification timing using Contextual Bandit
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
+import asyncio
 import uvicorn
 
+import config
+
 # Import models and services
 from models.alert_scorer import AlertScoringModel
-from models.duplicate_detector import SemanticDuplicateDetector
+from models.duplicate_detector import SemanticDuplicateDetector, DuplicateDetectorLite
 from models.notification_timing import NotificationTimingModel
 from models.hazard_predictor import HazardZonePredictor
 from models.weather_forecaster import WeatherForecaster  # NEW
-from data_collectors.openmeteo_collector import OpenMeteoCollector
+from data_collectors.resilient_weather import ResilientWeatherCollector
+from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
+from data_collectors.geocoder import OfflineGeocoder
+from data_collectors.seen_items import SeenItemFilter
 from services.data_collector import DataCollector
 from services.model_trainer import ModelRetrainer
+from services.response_cache import ResponseCache
+from services.event_stream import EventBroadcaster
+from services.inference_executor import InferenceExecutor
+from services.admission import AdmissionController, AdmissionRejected, request_priority
+from services.degradation import OverloadMonitor
+from services.prewarm import PrewarmScheduler
+from services.risk_outlook import RiskOutlook
+from services.ingestion_scheduler import IngestionScheduler, build_default_sources
+from services.alert_pipeline import AlertPipeline
 from utils.features import FeatureExtractor
 from utils.metrics import MetricsCalculator
+from utils.deadline import Deadline, DeadlineExceeded, run_within
+from utils.serialization import ORJSONResponse, MsgPackRoute, model_fields_only, negotiated_response
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -30,9 +48,13 @@ app = FastAPI(
     version="1.0.0",
     description="AI-powered alert prioritization and optimization",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
+# Accept application/msgpack request bodies on every route (JSON stays the default)
+app.router.route_class = MsgPackRoute
+
 # CORS middleware for Flutter app
 app.add_middleware(
     CORSMiddleware,
@@ -44,19 +66,113 @@ app.add_middleware(
 
 # Initialize models and services (singleton pattern)
 print("[API] Initializing models...")
+inference_executor = InferenceExecutor()
+score_admission = AdmissionController.from_config('score')
+duplicate_admission = AdmissionController.from_config('duplicate')
 scorer = AlertScoringModel(cold_start=True)
 duplicate_detector = SemanticDuplicateDetector()
+duplicate_detector_lite = DuplicateDetectorLite()  # overload fallback
 timing_model = NotificationTimingModel()
 hazard_predictor = HazardZonePredictor(cold_start=True)
 weather_forecaster = WeatherForecaster()  # NEW
-weather_collector = OpenMeteoCollector(cache_enabled=True)
+weather_forecaster.load()  # trained by scripts/train_all.py; climatology fallback otherwise
+weather_collector = ResilientWeatherCollector()  # Open-Meteo with SWR cache + circuit breaker
 data_collector = DataCollector()
 model_retrainer = ModelRetrainer(data_collector)
 feature_extractor = FeatureExtractor()
+geocoder = OfflineGeocoder()  # centroids for alerts sent without lat/lng
 metrics_calculator = MetricsCalculator()
+overload_monitor = OverloadMonitor(depth_sources=[
+    lambda: score_admission.depth,
+    lambda: duplicate_admission.depth,
+    inference_executor.queue_depth
+])
+prewarm_scheduler = PrewarmScheduler(hazard_predictor, weather_collector)
+risk_outlook = RiskOutlook(hazard_predictor, weather_collector)
+risk_outlook_cache = ResponseCache("risk_outlook")
+risk_outlook.add_listener(lambda changes: risk_outlook_cache.invalidate())
+hazard_zones_cache = ResponseCache("hazard_zones")
+hazard_predictor.add_zone_listener(hazard_zones_cache.invalidate)
+event_broadcaster = EventBroadcaster()
+hazard_predictor.add_zone_listener(
+    lambda: event_broadcaster.publish('zones_updated', {'total': len(hazard_predictor.hazard_zones)})
+)
+
+
+def _publish_if_high_priority(alert: dict):
+    """Push pipeline-scored alerts to SSE subscribers, like /score does"""
+    if alert['priority_score'] >= config.HIGH_PRIORITY_SCORE_THRESHOLD:
+        event_broadcaster.publish_alert(alert, alert['priority_score'])
+
+
+def _ingest(source: str, items: list) -> int:
+    """Scheduler sink: hand polled alerts to the pipeline; returns how many it accepted"""
+    accepted = alert_pipeline.submit(source, items)
+    if accepted:
+        event_broadcaster.publish('alerts_ingested', {'source': source, 'count': accepted})
+    return accepted
+
+
+# Collectors and pipeline share one seen-item filter: items are marked seen once stored
+seen_filter = SeenItemFilter() if config.INGESTION_ENABLED else None
+alert_pipeline = AlertPipeline(
+    scorer, duplicate_detector, feature_extractor, data_collector,
+    sink=_publish_if_high_priority, geocoder=geocoder, seen_filter=seen_filter
+)
+ingestion_scheduler = IngestionScheduler(
+    build_default_sources(seen_filter) if config.INGESTION_ENABLED else [],
+    sink=_ingest
+)
 print("[API] All models initialized successfully")
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    """Load the offline climatology and start pre-warming, the risk outlook and collector ingestion (if enabled)"""
+    await inference_executor.run('weather', weather_forecaster.climatology.load)
+    if config.PREWARM_ENABLED:
+        prewarm_scheduler.start()
+    if config.RISK_OUTLOOK_ENABLED:
+        risk_outlook.start()
+    if config.INGESTION_ENABLED:
+        alert_pipeline.start()
+        ingestion_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """Stop background threads"""
+    prewarm_scheduler.stop()
+    risk_outlook.stop()
+    ingestion_scheduler.stop()
+    alert_pipeline.stop()
+    inference_executor.shutdown(wait=False)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Fast 429 for shed requests, with a Retry-After hint"""
+    return ORJSONResponse(
+        {'detail': 'Service overloaded, retry later', 'reason': exc.reason, 'retry_after': exc.retry_after},
+        status_code=429,
+        headers={'Retry-After': str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """504 when the client's budget ran out before any useful result existed"""
+    return ORJSONResponse(
+        {'detail': 'Request deadline exceeded', 'stage': exc.stage},
+        status_code=504
+    )
+
+
+def _wait_budget_ms(deadline: Optional[Deadline]) -> Optional[float]:
+    """Admission wait budget left by the request deadline (None = endpoint default)"""
+    return None if deadline is None else deadline.remaining() * 1000
+
+
 # ===================== Pydantic Schemas =====================
 
 class AlertScoreRequest(BaseModel):
@@ -97,8 +213,9 @@ class AlertScoreResponse(BaseModel):
     """Response schema for alert scoring"""
     alert_id: str
     priority_score: float = Field(..., description="Priority score (0-100)")
-    confidence: float = Field(..., description="Confidence score (0-1)")
+    confidence: float = Field(..., description="Confidence score (0-1), 0 when degraded")
     explanation: Dict
+    degraded: bool = Field(default=False, description="Served by the cheaper overload path")
 
 
 class DuplicateCheckRequest(BaseModel):
@@ -113,6 +230,8 @@ class DuplicateCheckResponse(BaseModel):
     is_duplicate: bool
     duplicates: List[Dict]
     best_match: Optional[Dict] = None
+    degraded: bool = Field(default=False, description="Jaccard fallback used under overload")
+    partial: bool = Field(default=False, description="Deadline ran out before all alerts were compared")
 
 
 class NotificationTimingRequest(BaseModel):
@@ -158,6 +277,30 @@ class WeatherPredictResponse(BaseModel):
     note: Optional[str] = None
 
 
+class WeatherBatchRequest(BaseModel):
+    """Request for a multi-province, multi-day weather outlook"""
+    start_date: Optional[str] = Field(default=None, description="YYYY-MM-DD, defaults to today")
+    days: int = Field(default=config.WEATHER_OUTLOOK_DAYS, ge=1, le=config.WEATHER_BATCH_MAX_DAYS)
+    province_ids: Optional[List[int]] = Field(default=None, description="Province IDs (0-63), defaults to all")
+
+
+class ProvinceForecast(BaseModel):
+    """Daily forecasts for one province"""
+    province_id: int
+    province: str
+    region_id: int
+    forecasts: List[Dict]
+
+
+class WeatherBatchResponse(BaseModel):
+    """Response for a batch weather outlook"""
+    start_date: str
+    days: int
+    model_version: str = Field(..., description="Trained model version, or 'climatology'")
+    cached: bool
+    provinces: List[ProvinceForecast]
+
+
 # ===================== API Endpoints =====================
 
 @app.get("/")
@@ -174,7 +317,8 @@ async def root():
             "duplicate": "/api/v1/duplicate/check",
             "timing": "/api/v1/timing/recommend",
             "hazard": "/api/v1/hazard/predict",
-            "weather": "/api/v1/weather/predict"  # NEW
+            "weather": "/api/v1/weather/predict",  # NEW
+            "events": "/api/v1/events/stream"
         }
     }
 
@@ -190,21 +334,51 @@ async def health_check():
             "timing_model": "loaded",
             "weather_forecaster": "loaded" if weather_forecaster.is_trained else "not_trained"
         },
-        "database": "connected"
+        "database": "connected",
+        "event_stream": event_broadcaster.get_stats(),
+        "inference": inference_executor.get_stats(),
+        "admission": {
+            "score": score_admission.get_stats(),
+            "duplicate": duplicate_admission.get_stats()
+        },
+        "overload": overload_monitor.get_stats(),
+        "weather_upstream": weather_collector.get_stats(),
+        "prewarm": prewarm_scheduler.get_stats(),
+        "weather_outlook": weather_forecaster.get_outlook_stats(),
+        "risk_outlook": risk_outlook.get_stats(),
+        "ingestion": ingestion_scheduler.get_stats(),
+        "pipeline": alert_pipeline.get_stats()
     }
 
 
 @app.post("/api/v1/score", response_model=AlertScoreResponse)
-async def score_alert(request: AlertScoreRequest):
+async def score_alert(request: AlertScoreRequest, http_request: Request):
     """
     Score alert priority using ML model
+    
+    Accepts and returns JSON or MessagePack (Content-Type / Accept).
     """
     try:
-        # Extract features
-        features = feature_extractor.extract_features(request.dict())
+        # Extract features (alerts without coordinates get their district /
+        # province centroid, so the distance to the user is meaningful)
+        features = feature_extractor.extract_features(geocoder.geocode_alert(request.model_dump()))
         
-        # Predict score
-        score, confidence = scorer.predict_with_confidence(features)
+        # Predict score (priority-queued; sheds low-severity load first).
+        # Under overload, skip the per-tree loop that yields the confidence.
+        deadline = Deadline.from_request(http_request)
+        priority = request_priority(request.severity, request.alert_type)
+        degraded = overload_monitor.is_degraded()
+        async with score_admission.slot(priority, _wait_budget_ms(deadline)):
+            if degraded:
+                score = await run_within(deadline, inference_executor.run(
+                    'scorer', scorer.predict, features
+                ), 'scoring')
+                confidence = 0.0
+                overload_monitor.record('score')
+            else:
+                score, confidence = await run_within(deadline, inference_executor.run(
+                    'scorer', scorer.predict_with_confidence, features
+                ), 'scoring')
         
         # Generate explanation
         explanation = feature_extractor.generate_explanation(features, score)
@@ -216,30 +390,60 @@ async def score_alert(request: AlertScoreRequest):
             predicted_score=score
         )
         
-        return AlertScoreResponse(
-            alert_id=request.alert_id,
-            priority_score=score,
-            confidence=confidence,
-            explanation=explanation
-        )
+        # Push high-priority alerts to SSE subscribers
+        if score >= config.HIGH_PRIORITY_SCORE_THRESHOLD:
+            event_broadcaster.publish_alert(request.model_dump(), score)
+        
+        # Fields are built here from validated inputs; skip response re-validation
+        return negotiated_response({
+            'alert_id': request.alert_id,
+            'priority_score': score,
+            'confidence': confidence,
+            'explanation': explanation,
+            'degraded': degraded
+        }, http_request, response_model=AlertScoreResponse)
     
+    except (HTTPException, AdmissionRejected, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"[API] Error in score_alert: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/v1/duplicate/check", response_model=DuplicateCheckResponse)
-async def check_duplicate(request: DuplicateCheckRequest):
+async def check_duplicate(request: DuplicateCheckRequest, http_request: Request):
     """
     Check if alert is duplicate using semantic similarity
+    
+    Accepts and returns JSON or MessagePack (Content-Type / Accept).
     """
     try:
-        # Find duplicates
-        duplicates = duplicate_detector.find_duplicates(
-            new_alert=request.new_alert,
-            existing_alerts=request.existing_alerts,
-            return_all=True
+        # Find duplicates (priority-queued; sheds low-severity load first)
+        priority = request_priority(
+            request.new_alert.get('severity'),
+            request.new_alert.get('alert_type')
         )
+        # Under overload, fall back to Jaccard similarity (no embeddings).
+        # The semantic path stops encoding when the request deadline passes.
+        deadline = Deadline.from_request(http_request)
+        degraded = overload_monitor.is_degraded()
+        async with duplicate_admission.slot(priority, _wait_budget_ms(deadline)):
+            if degraded:
+                duplicates = await inference_executor.run(
+                    'duplicate', duplicate_detector_lite.find_duplicates,
+                    new_alert=request.new_alert,
+                    existing_alerts=request.existing_alerts
+                )
+                partial = False
+                overload_monitor.record('duplicate')
+            else:
+                duplicates, partial = await inference_executor.run(
+                    'duplicate', duplicate_detector.find_duplicates_within,
+                    new_alert=request.new_alert,
+                    existing_alerts=request.existing_alerts,
+                    deadline=deadline,
+                    return_all=True
+                )
         
         is_duplicate = len(duplicates) > 0
         best_match = duplicates[0] if duplicates else None
@@ -253,12 +457,17 @@ async def check_duplicate(request: DuplicateCheckRequest):
                 similarity=best_match['similarity']
             )
         
-        return DuplicateCheckResponse(
-            is_duplicate=is_duplicate,
-            duplicates=duplicates,
-            best_match=best_match
-        )
+        # Duplicates echo the already-validated alert dicts; serialize them once
+        return negotiated_response({
+            'is_duplicate': is_duplicate,
+            'duplicates': duplicates,
+            'best_match': best_match,
+            'degraded': degraded,
+            'partial': partial
+        }, http_request, response_model=DuplicateCheckResponse)
     
+    except (HTTPException, AdmissionRejected):
+        raise
     except Exception as e:
         print(f"[API] Error in check_duplicate: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -281,20 +490,55 @@ async def predict_weather(request: WeatherPredictRequest):
             'rain': request.current_rain
         }
         
-        result = weather_forecaster.predict(
+        result = await inference_executor.run(
+            'weather', weather_forecaster.predict,
             date=target_date,
             province_id=request.province_id,
             region_id=request.region_id,
             current_weather=current_weather
         )
         
-        return WeatherPredictResponse(**result)
+        result.setdefault('note', None)
+        return ORJSONResponse(model_fields_only(result, WeatherPredictResponse))
     
     except Exception as e:
         print(f"[API] Error in predict_weather: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/weather/predict/batch", response_model=WeatherBatchResponse)
+async def predict_weather_batch(request: WeatherBatchRequest, http_request: Request):
+    """
+    Multi-day weather outlook for many provinces in one call.
+    
+    All provinces are forecast together, one model step per day; the
+    national outlook is cached per model version and start date.
+    Accepts and returns JSON or MessagePack (Content-Type / Accept).
+    """
+    try:
+        from datetime import datetime
+        start = datetime.strptime(request.start_date, "%Y-%m-%d").date() if request.start_date else datetime.now().date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date must be YYYY-MM-DD")
+    
+    province_count = len(VIETNAM_PROVINCES)
+    if request.province_ids and any(not 0 <= pid < province_count for pid in request.province_ids):
+        raise HTTPException(status_code=400, detail=f"province_ids must be in 0-{province_count - 1}")
+    
+    try:
+        result = await inference_executor.run(
+            'weather', weather_forecaster.forecast_batch,
+            start=start,
+            days=request.days,
+            province_ids=request.province_ids
+        )
+        return negotiated_response(result, http_request, response_model=WeatherBatchResponse)
+    
+    except Exception as e:
+        print(f"[API] Error in predict_weather_batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ===================== Hazard Zone Endpoints =====================
 
 class HazardPredictRequest(BaseModel):
@@ -319,6 +563,9 @@ class HazardPredictResponse(BaseModel):
     explanation: str
     current_weather: Optional[Dict] = Field(default=None, description="Current weather conditions")
     forecast: Optional[Dict] = Field(default=None, description="Weather forecast")
+    degraded: bool = Field(default=False, description="Weather enrichment skipped under overload")
+    partial: bool = Field(default=False, description="Base risk only; deadline ran out before weather")
+    climatology: Optional[Dict] = Field(default=None, description="7-day climatological outlook when no live forecast is available")
 
 
 class HazardZone(BaseModel):
@@ -332,8 +579,75 @@ class HazardZone(BaseModel):
     description: str
 
 
+async def _fetch_weather(lat: float, lng: float, deadline: Optional[Deadline]) -> tuple:
+    """
+    Fetch current weather and 7-day forecast concurrently
+    
+    HTTP timeouts come from the remaining request budget (capped by
+    WEATHER_API_TIMEOUT). Raises DeadlineExceeded if the budget runs out.
+    """
+    # gather() schedules both calls at once; don't start them on a spent budget
+    if deadline is not None and deadline.expired:
+        raise DeadlineExceeded('weather enrichment')
+    timeout = max(Deadline.timeout_for(deadline, config.WEATHER_API_TIMEOUT), config.DEADLINE_MIN_TIMEOUT)
+    return await run_within(deadline, asyncio.gather(
+        inference_executor.run(
+            'weather_api', weather_collector.get_current_weather,
+            lat=lat, lng=lng, timeout=timeout
+        ),
+        inference_executor.run(
+            'weather_api', weather_collector.get_forecast,
+            lat=lat, lng=lng, days=7, timeout=timeout
+        )
+    ), 'weather enrichment')
+
+
+def _apply_weather(result: Dict, current_weather_data: Dict, forecast_data: Dict):
+    """
+    Add current weather and 7-day forecast to a hazard prediction in place,
+    raising the risk level when the forecast warrants it.
+    """
+    try:
+        # Format weather for response
+        if current_weather_data and 'current' in current_weather_data:
+            current = current_weather_data['current']
+            result['current_weather'] = {
+                'temperature': current.get('temperature_2m'),
+                'precipitation': current.get('precipitation', 0),
+                'rain': current.get('rain', 0),
+                'wind_speed': current.get('wind_speed_10m'),
+                'wind_gusts': current.get('wind_gusts_10m'),
+                'humidity': current.get('relative_humidity_2m'),
+                'cloud_cover': current.get('cloud_cover'),
+                'pressure': current.get('pressure_msl'),
+            }
+        
+        # Format forecast
+        if forecast_data and 'daily' in forecast_data:
+            daily = forecast_data['daily']
+            result['forecast'] = {
+                'days': len(daily.get('time', [])),
+                'total_precipitation': sum(daily.get('precipitation_sum', [])),
+                'max_temperature': max(daily.get('temperature_2m_max', [20])),
+                'min_temperature': min(daily.get('temperature_2m_min', [15])),
+                'max_wind': max(daily.get('wind_speed_10m_max', [0])),
+            }
+            
+            # Adjust risk based on forecast
+            hazard_predictor.apply_forecast(
+                result,
+                total_precip=result['forecast']['total_precipitation'],
+                max_wind=result['forecast']['max_wind']
+            )
+                
+    except Exception as weather_error:
+        print(f"[API] Warning: Could not apply weather data: {weather_error}")
+        # Continue without weather data
+        pass
+
+
 @app.post("/api/v1/hazard/predict", response_model=HazardPredictResponse)
-async def predict_hazard_risk(request: HazardPredictRequest):
+async def predict_hazard_risk(request: HazardPredictRequest, http_request: Request):
     """
     Predict hazard risk for a specific location.
     
@@ -342,81 +656,70 @@ async def predict_hazard_risk(request: HazardPredictRequest):
     - Historical hazard patterns
     - Seasonal factors
     - Real-time weather data (if requested)
+    
+    Accepts and returns JSON or MessagePack (Content-Type / Accept).
+    
+    Honours the X-Request-Deadline-Ms header: if the budget runs out while
+    fetching weather, the base model risk is returned with partial=true.
     """
     try:
-        # Get base prediction
-        result = hazard_predictor.predict_risk(
+        deadline = Deadline.from_request(http_request)
+        
+        # Get base prediction (pre-warmed for high-risk provinces)
+        result, prediction_warm = await run_within(deadline, inference_executor.run(
+            'hazard', prewarm_scheduler.predict_risk,
             lat=request.lat,
             lng=request.lng,
             month=request.month,
             hazard_type=request.hazard_type
-        )
+        ), 'hazard prediction')
         
-        # Enrich with real-time weather if requested
-        if request.include_weather:
+        # Enrich with real-time weather if requested (blocking HTTP, off the event loop);
+        # skipped under overload, cut short by the request deadline
+        degraded = request.include_weather and overload_monitor.is_degraded()
+        partial = False
+        weather_warm = True
+        if degraded:
+            overload_monitor.record('hazard')
+        elif request.include_weather:
+            weather_warm = weather_collector.is_fresh(request.lat, request.lng)
             try:
-                # Get current weather
-                current_weather_data = weather_collector.get_current_weather(
-                    lat=request.lat,
-                    lng=request.lng
-                )
-                
-                # Get 7-day forecast
-                forecast_data = weather_collector.get_forecast(
-                    lat=request.lat,
-                    lng=request.lng,
-                    days=7
+                current_weather_data, forecast_data = await _fetch_weather(
+                    request.lat, request.lng, deadline
                 )
-                
-                # Format weather for response
-                if current_weather_data and 'current' in current_weather_data:
-                    current = current_weather_data['current']
-                    result['current_weather'] = {
-                        'temperature': current.get('temperature_2m'),
-                        'precipitation': current.get('precipitation', 0),
-                        'rain': current.get('rain', 0),
-                        'wind_speed': current.get('wind_speed_10m'),
-                        'wind_gusts': current.get('wind_gusts_10m'),
-                        'humidity': current.get('relative_humidity_2m'),
-                        'cloud_cover': current.get('cloud_cover'),
-                        'pressure': current.get('pressure_msl'),
-                    }
-                
-                # Format forecast
-                if forecast_data and 'daily' in forecast_data:
-                    daily = forecast_data['daily']
-                    result['forecast'] = {
-                        'days': len(daily.get('time', [])),
-                        'total_precipitation': sum(daily.get('precipitation_sum', [])),
-                        'max_temperature': max(daily.get('temperature_2m_max', [20])),
-                        'min_temperature': min(daily.get('temperature_2m_min', [15])),
-                        'max_wind': max(daily.get('wind_speed_10m_max', [0])),
-                    }
-                    
-                    # Adjust risk based on forecast
-                    total_precip = sum(daily.get('precipitation_sum', []))
-                    max_wind = max(daily.get('wind_speed_10m_max', [0]))
-                    
-                    # Increase risk if heavy rain forecast for flood/landslide
-                    if request.hazard_type in ['flood', 'landslide']:
-                        if total_precip > 200:  # >200mm in 7 days
-                            result['risk_level'] = min(5, result['risk_level'] + 1)
-                            result['explanation'] += f" ⚠️ Dự báo mưa lớn: {total_precip:.0f}mm trong 7 ngày tới!"
-                        elif total_precip > 100:
-                            result['explanation'] += f" Dự báo mưa: {total_precip:.0f}mm trong 7 ngày tới."
-                    
-                    # Increase risk if strong wind forecast for storm
-                    if request.hazard_type == 'storm' and max_wind > 60:
-                        result['risk_level'] = min(5, result['risk_level'] + 1)
-                        result['explanation'] += f" ⚠️ Dự báo gió mạnh: {max_wind:.0f} km/h!"
-                        
-            except Exception as weather_error:
-                print(f"[API] Warning: Could not fetch weather data: {weather_error}")
-                # Continue without weather data
-                pass
+                _apply_weather(result, current_weather_data, forecast_data)
+            except DeadlineExceeded:
+                partial = True
+        weather_applied = request.include_weather and not (degraded or partial)
+        
+        # Offline climatology stands in for a missing live forecast
+        if request.include_weather and not result.get('forecast'):
+            result['climatology'] = weather_forecaster.climatology.outlook(request.lat, request.lng) or None
         
-        return HazardPredictResponse(**result)
+        prewarm_scheduler.record_request(
+            request.lat, request.lng, result['province'], prediction_warm and weather_warm
+        )
+        
+        # Notify SSE subscribers if this area's risk level changed
+        event_broadcaster.record_risk(
+            key=(round(request.lat, 1), round(request.lng, 1), result['month'], weather_applied),
+            province=result['province'],
+            hazard_type=request.hazard_type,
+            risk_level=result['risk_level'],
+            lat=request.lat,
+            lng=request.lng,
+            month=result['month']
+        )
+        
+        result.setdefault('current_weather', None)
+        result.setdefault('forecast', None)
+        result.setdefault('climatology', None)
+        result['degraded'] = degraded
+        result['partial'] = partial
+        return negotiated_response(result, http_request, response_model=HazardPredictResponse)
     
+    except (HTTPException, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"[API] Error in predict_hazard_risk: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -424,6 +727,7 @@ async def predict_hazard_risk(request: HazardPredictRequest):
 
 @app.get("/api/v1/hazard/zones")
 async def get_hazard_zones(
+    request: Request,
     province: Optional[str] = None,
     month: Optional[int] = None,
     hazard_type: Optional[str] = None,
@@ -437,45 +741,216 @@ async def get_hazard_zones(
     - month: Filter by active month (1-12)
     - hazard_type: flood, landslide, or storm
     - min_risk: Minimum risk level (default: 2)
+    
+    Responses are served from a pre-serialized, pre-compressed cache
+    and honour If-None-Match (304 Not Modified).
     """
     try:
-        zones = hazard_predictor.get_hazard_zones(
+        cache_key = ResponseCache.make_key(
             province=province,
             month=month,
             hazard_type=hazard_type,
             min_risk=min_risk
         )
+        entry = hazard_zones_cache.get(cache_key)
         
-        # Format for Flutter map
-        formatted_zones = [
-            {
-                'id': z['id'],
-                'lat': z['center']['lat'],
-                'lng': z['center']['lng'],
-                'radius_km': z['radius_km'],
-                'hazard_type': z['hazard_type'],
-                'risk_level': z['risk_level'],
-                'description': z['description']
-            }
-            for z in zones
-        ]
+        if entry is None:
+            params = dict(cache_key)
+            generation = hazard_zones_cache.generation
+            zones = hazard_predictor.get_hazard_zones(
+                province=params['province'],
+                month=params['month'],
+                hazard_type=params['hazard_type'],
+                min_risk=params['min_risk']
+            )
+            
+            # Format for Flutter map
+            formatted_zones = [
+                {
+                    'id': z['id'],
+                    'lat': z['center']['lat'],
+                    'lng': z['center']['lng'],
+                    'radius_km': z['radius_km'],
+                    'hazard_type': z['hazard_type'],
+                    'risk_level': z['risk_level'],
+                    'description': z['description']
+                }
+                for z in zones
+            ]
+            
+            entry = hazard_zones_cache.put(cache_key, {
+                'total': len(formatted_zones),
+                'month': month,
+                'zones': formatted_zones
+            }, generation=generation)
         
+        status_code, body, headers = hazard_zones_cache.render(
+            entry,
+            if_none_match=request.headers.get('if-none-match'),
+            accept_encoding=request.headers.get('accept-encoding')
+        )
+        return Response(
+            content=body,
+            status_code=status_code,
+            headers=headers,
+            media_type=None if status_code == 304 else "application/json"
+        )
+    
+    except Exception as e:
+        print(f"[API] Error in get_hazard_zones: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/v1/hazard/zones/reload")
+async def reload_hazard_zones():
+    """
+    Reload hazard zones after hazard_zones_data.json is regenerated.
+    
+    Invalidates the cached /api/v1/hazard/zones responses.
+    """
+    try:
+        total = hazard_predictor.reload_hazard_zones()
         return {
-            'total': len(formatted_zones),
-            'month': month,
-            'zones': formatted_zones
+            'status': 'reloaded',
+            'total_zones': total,
+            'cache': hazard_zones_cache.get_stats()
         }
     
     except Exception as e:
-        print(f"[API] Error in get_hazard_zones: {e}")
+        print(f"[API] Error in reload_hazard_zones: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/hazard/outlook")
+async def get_risk_outlook(
+    request: Request,
+    province: Optional[str] = None,
+    hazard_type: Optional[str] = None,
+    date: Optional[str] = None,
+    min_risk: int = 1
+):
+    """
+    Materialized 7-day risk outlook for every province and hazard type.
+    
+    Recomputed in the background every RISK_OUTLOOK_INTERVAL_SECONDS;
+    `generation` increases with each run. Responses are served from the
+    pre-serialized cache and honour If-None-Match.
+    
+    Filters:
+    - province: Province name
+    - hazard_type: flood, landslide, or storm
+    - date: Day (YYYY-MM-DD)
+    - min_risk: Minimum risk level (default: 1)
+    """
+    if risk_outlook.generation == 0:
+        raise HTTPException(status_code=503, detail="Risk outlook not materialized yet",
+                            headers={'Retry-After': '30'})
+    try:
+        # Keyed by generation too, so a response built during a run is never served after it
+        cache_key = ResponseCache.make_key(
+            generation=risk_outlook.generation,
+            province=province,
+            hazard_type=hazard_type,
+            date=date,
+            min_risk=min_risk
+        )
+        entry = risk_outlook_cache.get(cache_key)
+        
+        if entry is None:
+            params = dict(cache_key)
+            generation = risk_outlook_cache.generation
+            entry = risk_outlook_cache.put(cache_key, risk_outlook.get_outlook(
+                province=params['province'],
+                hazard_type=params['hazard_type'],
+                day=params['date'],
+                min_risk=params['min_risk']
+            ), generation=generation)
+        
+        status_code, body, headers = risk_outlook_cache.render(
+            entry,
+            if_none_match=request.headers.get('if-none-match'),
+            accept_encoding=request.headers.get('accept-encoding')
+        )
+        return Response(
+            content=body,
+            status_code=status_code,
+            headers=headers,
+            media_type=None if status_code == 304 else "application/json"
+        )
+    
+    except Exception as e:
+        print(f"[API] Error in get_risk_outlook: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/v1/hazard/outlook/changes")
+async def get_risk_outlook_changes(since: int = 0, limit: int = 500):
+    """
+    Change feed of the risk outlook.
+    
+    Returns risk level changes with seq > since (oldest first). Poll again
+    with since=next_since. If `truncated` is true, changes were dropped
+    from the buffer: re-read /api/v1/hazard/outlook.
+    """
+    return risk_outlook.get_changes(since=since, limit=max(1, min(limit, 5000)))
+
+
+# ===================== Event Stream Endpoints =====================
+
+@app.get("/api/v1/events/stream")
+async def stream_events(
+    request: Request,
+    province: Optional[str] = None,
+    hazard_type: Optional[str] = None,
+    types: Optional[str] = None
+):
+    """
+    Server-sent events stream replacing client polling.
+    
+    Events:
+    - alert: newly scored alert with priority_score >= HIGH_PRIORITY_SCORE_THRESHOLD
+    - risk_change: risk level of an area changed since it was last computed
+    - zones_updated: hazard zones were reloaded (refetch /api/v1/hazard/zones)
+    
+    Filters:
+    - province: Only events for this province
+    - hazard_type: Only risk events for this hazard type
+    - types: Comma-separated event names, e.g. "alert,risk_change"
+    
+    Reconnecting clients resume from the Last-Event-ID header.
+    """
+    event_types = {t.strip() for t in types.split(',') if t.strip()} if types else None
+    
+    last_event_id = request.headers.get('last-event-id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    subscriber = event_broadcaster.subscribe(
+        province=province.strip() if province else None,
+        hazard_type=hazard_type.strip() if hazard_type else None,
+        event_types=event_types,
+        last_event_id=last_event_id
+    )
+    
+    return StreamingResponse(
+        event_broadcaster.stream(
+            subscriber,
+            request,
+            heartbeat_seconds=config.SSE_HEARTBEAT_SECONDS
+        ),
+        media_type="text/event-stream",
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 # ===================== Main =====================
 
 if __name__ == "__main__":
-    import config
-    
     print(f"""
     ============================================================
         Smart Alert AI Service - FastAPI Application
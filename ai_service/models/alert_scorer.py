@@ -11,7 +11,7 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent))
 from config import (
     RF_N_ESTIMATORS, RF_MAX_DEPTH, RF_RANDOM_STATE,
-    MODELS_DIR, SYNTHETIC_SAMPLES, N_FEATURES
+    MODELS_DIR, SYNTHETIC_SAMPLES, N_FEATURES, INFERENCE_N_JOBS
 )
 
 
@@ -55,6 +55,7 @@ class AlertScoringModel:
         X_scaled = self.scaler.fit_transform(X_synthetic)
         self.model.fit(X_scaled, y_synthetic)
         self.is_trained = True
+        self.set_inference_jobs()
         
         print(f"[AlertScorer] Bootstrap complete. Model trained on {SYNTHETIC_SAMPLES} samples.")
         
@@ -137,6 +138,16 @@ class AlertScoringModel:
         
         return scores
     
+    def set_inference_jobs(self, n_jobs: int = INFERENCE_N_JOBS):
+        """
+        Set joblib workers used at prediction time
+        
+        Training uses all cores (n_jobs=-1), but single-alert predictions
+        run inside the inference executor's thread budget, where nested
+        joblib pools would only oversubscribe cores.
+        """
+        self.model.set_params(n_jobs=n_jobs)
+    
     def predict(self, features: dict) -> float:
         """
         Predict priority score for an alert
@@ -156,6 +167,26 @@ class AlertScoringModel:
         
         return float(np.clip(score, 0, 100))
     
+    def predict_batch(self, features_list: list) -> list:
+        """
+        Predict priority scores for several alerts in one model call
+        
+        Args:
+            features_list: Feature dicts, one per alert
+            
+        Returns:
+            Priority scores (0-100), in the same order
+        """
+        if not self.is_trained:
+            raise RuntimeError("Model not trained. Call _bootstrap_from_rules() first.")
+        if not features_list:
+            return []
+        
+        X = np.vstack([self._features_to_array(features) for features in features_list])
+        scores = self.model.predict(self.scaler.transform(X))
+        
+        return [float(score) for score in np.clip(scores, 0, 100)]
+    
     def predict_with_confidence(self, features: dict) -> tuple[float, float]:
         """
         Predict score with confidence interval
@@ -234,6 +265,7 @@ class AlertScoringModel:
             self.model = model_data['model']
             self.scaler = model_data['scaler']
             self.is_trained = model_data['is_trained']
+            self.set_inference_jobs()
             print(f"[AlertScorer] Model loaded from {path}")
             return True
         except Exception as e:
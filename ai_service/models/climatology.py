@@ -0,0 +1,326 @@
+"""
+Offline weather climatology
+
+Per-station day-of-year means and quantiles built from the bundled
+Open-Meteo archive (data/weather/vietnam_weather_2020_2024.json) and
+interpolated to any point by inverse distance weighting. Used when no
+live weather is available and as a cheap feature source.
+"""
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Sequence
+import sys
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    CLIMATOLOGY_SOURCE_PATH, CLIMATOLOGY_CACHE_PATH, CLIMATOLOGY_WINDOW_DAYS,
+    CLIMATOLOGY_QUANTILES, CLIMATOLOGY_IDW_POWER
+)
+
+# Daily variables summarised per station (axis order of the stored arrays)
+CLIMATOLOGY_VARIABLES = [
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "temperature_2m_mean",
+    "precipitation_sum",
+    "wind_speed_10m_max"
+]
+
+# Slots on a 366-day calendar: Feb 29 has its own slot, so the same
+# calendar date maps to the same slot in leap and non-leap years
+DAYS_IN_YEAR = 366
+EARTH_RADIUS_KM = 6371.0
+
+
+def day_slot(day) -> int:
+    """0-based slot of a date on the 366-day calendar"""
+    if isinstance(day, datetime):
+        day = day.date()
+    slot = day.timetuple().tm_yday - 1
+    is_leap = day.year % 4 == 0 and (day.year % 100 != 0 or day.year % 400 == 0)
+    if not is_leap and slot >= 59:
+        slot += 1
+    return slot
+
+
+def _day_slots(days: np.ndarray) -> np.ndarray:
+    """Vectorised day_slot for an array of datetime64[D]"""
+    years = days.astype('datetime64[Y]')
+    slot = (days - years).astype(np.int64)
+    year = years.astype(np.int64) + 1970
+    is_leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return slot + ((~is_leap) & (slot >= 59))
+
+
+class Climatology:
+    """
+    Day-of-year climatology for Vietnamese weather stations
+
+    For each station and calendar slot the values of the surrounding
+    +/- `window_days` days across all years are pooled, giving a smooth
+    mean and quantiles without a separate smoothing pass. The statistics
+    are cached as a compressed .npz (a few hundred KB) and rebuilt when
+    the source file changes.
+
+    Interpolation is inverse distance weighting over all stations; the
+    distance to the nearest station is returned so callers can judge how
+    representative an estimate is (the archive covers 14 provinces).
+    """
+
+    def __init__(
+        self,
+        source_path: Path = CLIMATOLOGY_SOURCE_PATH,
+        cache_path: Path = CLIMATOLOGY_CACHE_PATH,
+        window_days: int = CLIMATOLOGY_WINDOW_DAYS,
+        quantiles: Sequence[float] = CLIMATOLOGY_QUANTILES,
+        power: float = CLIMATOLOGY_IDW_POWER
+    ):
+        self.source_path = Path(source_path)
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        self.window_days = window_days
+        self.quantiles = tuple(quantiles)
+        self.power = power
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._disabled = False  # source has no usable station data
+        self.stations: List[str] = []
+        self.coords = None     # (S, 2) lat, lng
+        self.mean = None       # (S, 366, V)
+        self.quantile = None   # (S, 366, Q, V)
+        self.years = 0
+        self.load_ms = 0.0
+
+    # ----- Loading -----
+
+    @property
+    def is_available(self) -> bool:
+        return self.load()
+
+    def load(self) -> bool:
+        """Load statistics from the cache, building them if stale; False if no data"""
+        if self._loaded:
+            return True
+        if self._disabled:
+            return False
+        with self._lock:
+            if self._loaded:
+                return True
+            if self._disabled or not self.source_path.exists():
+                return False
+            started = time.perf_counter()
+            if not self._load_cache():
+                if not self._build():
+                    self._disabled = True
+                    print(f"[Climatology] No usable station data in {self.source_path}; climatology disabled")
+                    return False
+                self._save_cache()
+            self.load_ms = (time.perf_counter() - started) * 1000
+            self._loaded = True
+            print(f"[Climatology] {len(self.stations)} stations, {self.years} years "
+                  f"loaded in {self.load_ms:.0f}ms")
+            return True
+
+    def _cache_key(self) -> np.ndarray:
+        return np.array(
+            [self.source_path.stat().st_mtime, self.window_days, self.power, *self.quantiles]
+        )
+
+    def _load_cache(self) -> bool:
+        if self.cache_path is None or not self.cache_path.exists():
+            return False
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if not np.array_equal(data['key'], self._cache_key()):
+                    return False
+                self.stations = [str(name) for name in data['stations']]
+                self.coords = data['coords']
+                self.mean = data['mean']
+                self.quantile = data['quantile']
+                self.years = int(data['years'])
+            return True
+        except Exception as e:
+            print(f"[Climatology] Ignoring unreadable cache: {e}")
+            return False
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(
+                self.cache_path,
+                key=self._cache_key(),
+                stations=np.array(self.stations),
+                coords=self.coords,
+                mean=self.mean,
+                quantile=self.quantile,
+                years=np.array(self.years)
+            )
+        except OSError as e:
+            print(f"[Climatology] Could not write cache: {e}")
+
+    def _build(self) -> bool:
+        """Compute per-station statistics from the source archive; False if it has no station data"""
+        with open(self.source_path, 'r', encoding='utf-8') as f:
+            archive = json.load(f)
+
+        entries = [e for e in archive.get('data', []) if e.get('success') and e.get('daily_data')]
+        if not entries:
+            return False
+        first_year = min(int(e['start_date'][:4]) for e in entries)
+        last_year = max(int(e['end_date'][:4]) for e in entries)
+        n_years = last_year - first_year + 1
+
+        # Pooling window: slot offsets wrap around the year end
+        offsets = np.arange(-self.window_days, self.window_days + 1)
+        window = (np.arange(DAYS_IN_YEAR)[:, None] + offsets) % DAYS_IN_YEAR
+
+        stations, coords, means, quantiles = [], [], [], []
+        for entry in entries:
+            daily = entry['daily_data']
+            days = np.array(daily['time'], dtype='datetime64[D]')
+            year_idx = days.astype('datetime64[Y]').astype(np.int64) + 1970 - first_year
+            slots = _day_slots(days)
+
+            # (V, years, 366) grid, NaN where there is no observation
+            grid = np.full((len(CLIMATOLOGY_VARIABLES), n_years, DAYS_IN_YEAR), np.nan)
+            for v, name in enumerate(CLIMATOLOGY_VARIABLES):
+                values = np.array(daily.get(name) or [np.nan] * len(days), dtype=float)
+                grid[v, year_idx, slots] = values
+
+            # (V, 366, years * window) samples pooled around each slot
+            pooled = grid[:, :, window].transpose(0, 2, 1, 3).reshape(
+                len(CLIMATOLOGY_VARIABLES), DAYS_IN_YEAR, -1
+            )
+            means.append(np.nanmean(pooled, axis=2).T)
+            quantiles.append(np.nanquantile(pooled, self.quantiles, axis=2).transpose(2, 0, 1))
+            stations.append(entry.get('province', f"{entry['lat']},{entry['lng']}"))
+            coords.append((entry['lat'], entry['lng']))
+
+        self.stations = stations
+        self.coords = np.array(coords, dtype=float)
+        self.mean = np.stack(means).astype(np.float32)
+        self.quantile = np.stack(quantiles).astype(np.float32)
+        self.years = n_years
+        return True
+
+    # ----- Interpolation -----
+
+    def _weights(self, lats: np.ndarray, lngs: np.ndarray):
+        """IDW weights (N, S) and distance to the nearest station (N,)"""
+        lat1, lng1 = np.radians(lats)[:, None], np.radians(lngs)[:, None]
+        lat2, lng2 = np.radians(self.coords[:, 0]), np.radians(self.coords[:, 1])
+        a = (np.sin((lat2 - lat1) / 2) ** 2
+             + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+        # A point on top of a station takes that station's values
+        weights = 1.0 / np.maximum(distance, 1e-6) ** self.power
+        exact = distance < 1.0
+        weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), weights)
+        weights /= weights.sum(axis=1, keepdims=True)
+        return weights, distance
+
+    def estimate_many(self, lats, lngs, days) -> Dict[str, np.ndarray]:
+        """
+        Vectorised estimates for N (lat, lng, date) triples
+
+        Returns:
+            Dict of arrays of length N: the mean of each variable in
+            CLIMATOLOGY_VARIABLES, `<variable>_p<q>` quantiles,
+            `nearest_km` and `nearest_station` (index into self.stations)
+        """
+        if not self.load():
+            return {}
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lngs = np.atleast_1d(np.asarray(lngs, dtype=float))
+        slots = np.atleast_1d(np.array([day_slot(d) for d in days]
+                                       if not isinstance(days, np.ndarray) else _day_slots(days)))
+
+        weights, distance = self._weights(lats, lngs)
+        mean = np.einsum('ns,snv->nv', weights, self.mean[:, slots, :])
+        quantile = np.einsum('ns,snqv->nqv', weights, self.quantile[:, slots, :, :])
+
+        result = {name: mean[:, v] for v, name in enumerate(CLIMATOLOGY_VARIABLES)}
+        for q, level in enumerate(self.quantiles):
+            for v, name in enumerate(CLIMATOLOGY_VARIABLES):
+                result[f"{name}_p{int(round(level * 100))}"] = quantile[:, q, v]
+        result['nearest_km'] = distance.min(axis=1)
+        result['nearest_station'] = distance.argmin(axis=1)
+        return result
+
+    def estimate(self, lat: float, lng: float, day=None) -> Dict:
+        """
+        Climatological weather for one point and date
+
+        Returns:
+            Dict with mean temperature/precipitation/wind, precipitation
+            quantiles and the nearest station; {} if no data is available
+        """
+        day = day or date.today()
+        values = self.estimate_many([lat], [lng], [day])
+        if not values:
+            return {}
+        v = {name: float(array[0]) for name, array in values.items()}
+        return {
+            'date': day.strftime("%Y-%m-%d"),
+            'temperature': round(v['temperature_2m_mean'], 1),
+            'temperature_max': round(v['temperature_2m_max'], 1),
+            'temperature_min': round(v['temperature_2m_min'], 1),
+            'precipitation': round(v['precipitation_sum'], 1),
+            'precipitation_quantiles': {
+                f"p{int(round(level * 100))}": round(v[f"precipitation_sum_p{int(round(level * 100))}"], 1)
+                for level in self.quantiles
+            },
+            'wind_speed_max': round(v['wind_speed_10m_max'], 1),
+            'nearest_station': self.stations[int(v['nearest_station'])],
+            'nearest_km': round(v['nearest_km'], 1),
+        }
+
+    def outlook(self, lat: float, lng: float, start=None, days: int = 7) -> Dict:
+        """
+        Climatological expectation for the next `days` days, in the same
+        shape as the forecast summary of a hazard prediction
+        """
+        start = start or date.today()
+        dates = [start + timedelta(days=i) for i in range(days)]
+        values = self.estimate_many([lat] * days, [lng] * days, dates)
+        if not values:
+            return {}
+        return {
+            'days': days,
+            'total_precipitation': round(float(values['precipitation_sum'].sum()), 1),
+            'max_temperature': round(float(values['temperature_2m_max'].max()), 1),
+            'min_temperature': round(float(values['temperature_2m_min'].min()), 1),
+            'max_wind': round(float(values['wind_speed_10m_max'].max()), 1),
+            'nearest_station': self.stations[int(values['nearest_station'][0])],
+            'nearest_km': round(float(values['nearest_km'][0]), 1),
+        }
+
+    def features(self, lat: float, lng: float, day=None) -> Dict[str, float]:
+        """Flat climatology features for model inputs (prefixed `clim_`)"""
+        values = self.estimate_many([lat], [lng], [day or date.today()])
+        if not values:
+            return {}
+        return {
+            'clim_temp_mean': float(values['temperature_2m_mean'][0]),
+            'clim_temp_max': float(values['temperature_2m_max'][0]),
+            'clim_temp_min': float(values['temperature_2m_min'][0]),
+            'clim_rain_mean': float(values['precipitation_sum'][0]),
+            'clim_rain_p90': float(values.get('precipitation_sum_p90', values['precipitation_sum'])[0]),
+            'clim_wind_max': float(values['wind_speed_10m_max'][0]),
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            'loaded': self._loaded,
+            'stations': len(self.stations),
+            'years': self.years,
+            'load_ms': round(self.load_ms, 1),
+        }
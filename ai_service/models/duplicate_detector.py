@@ -1,4 +1,6 @@
 """Semantic Duplicate Detection using Sentence Transformers"""
+import threading
+from collections import OrderedDict
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
@@ -34,8 +36,11 @@ class SemanticDuplicateDetector:
         
         self.threshold = threshold or DUPLICATE_SIMILARITY_THRESHOLD
         
-        # Embedding cache for performance
-        self._embedding_cache = {}
+        # LRU embedding cache, shared by the inference pool and the
+        # ingestion pipeline threads (every access under the lock)
+        self._embedding_cache = OrderedDict()
+        self._cache_limit = 1000
+        self._cache_lock = threading.Lock()
         
         print(f"[DuplicateDetector] Model loaded. Threshold: {self.threshold}")
     
@@ -50,22 +55,48 @@ class SemanticDuplicateDetector:
             384-dimensional embedding vector
         """
         # Check cache first
-        if text in self._embedding_cache:
-            return self._embedding_cache[text]
+        cached = self._cached_embeddings([text])
+        if text in cached:
+            return cached[text]
         
-        # Generate embedding
+        # Generate embedding (outside the lock) and cache it
         embedding = self.model.encode(text, convert_to_numpy=True)
-        
-        # Cache it
-        self._embedding_cache[text] = embedding
-        
-        # Limit cache size to 1000 entries
-        if len(self._embedding_cache) > 1000:
-            # Remove oldest entry
-            self._embedding_cache.pop(next(iter(self._embedding_cache)))
-        
+        self._cache_embeddings({text: embedding})
         return embedding
     
+    def _cached_embeddings(self, texts: list) -> dict:
+        """Cached embeddings among texts, marked recently used"""
+        with self._cache_lock:
+            found = {}
+            for text in texts:
+                embedding = self._embedding_cache.get(text)
+                if embedding is not None:
+                    self._embedding_cache.move_to_end(text)
+                    found[text] = embedding
+            return found
+    
+    def _cache_embeddings(self, embeddings: dict):
+        """Store embeddings, evicting the least recently used beyond the limit"""
+        with self._cache_lock:
+            self._embedding_cache.update(embeddings)
+            while len(self._embedding_cache) > self._cache_limit:
+                self._embedding_cache.popitem(last=False)
+    
+    def get_embeddings(self, texts: list) -> np.ndarray:
+        """
+        Embeddings of several texts, encoding the uncached ones in one model call
+        
+        Returns:
+            (len(texts), 384) array, rows in the order of `texts`
+        """
+        embeddings = self._cached_embeddings(list(dict.fromkeys(texts)))
+        missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+        if missing:
+            encoded = dict(zip(missing, self.model.encode(missing, convert_to_numpy=True)))
+            self._cache_embeddings(encoded)
+            embeddings.update(encoded)
+        return np.vstack([embeddings[text] for text in texts])
+    
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """
         Calculate semantic similarity between two texts
@@ -129,7 +160,8 @@ class SemanticDuplicateDetector:
         self,
         new_alert: dict,
         existing_alerts: list,
-        return_all: bool = False
+        return_all: bool = False,
+        deadline=None
     ) -> list:
         """
         Find all duplicate alerts for a new alert
@@ -139,12 +171,32 @@ class SemanticDuplicateDetector:
             existing_alerts: List of existing alerts
             return_all: If True, return all matches above threshold.
                        If False, return only the best match.
+            deadline: Optional utils.deadline.Deadline; once it expires the
+                      remaining alerts are not encoded and the matches found
+                      so far are returned
         
         Returns:
             List of dicts with 'alert' and 'similarity' keys,
             sorted by similarity (highest first)
         """
+        return self.find_duplicates_within(new_alert, existing_alerts, deadline, return_all)[0]
+    
+    def find_duplicates_within(
+        self,
+        new_alert: dict,
+        existing_alerts: list,
+        deadline,
+        return_all: bool = False
+    ) -> tuple:
+        """
+        find_duplicates, also telling whether the deadline cut it short
+        
+        Returns:
+            (duplicates, partial): partial is True only when alerts were
+            left uncompared because the deadline expired
+        """
         duplicates = []
+        partial = False
         
         # Get embedding once for new alert
         new_emb = self.get_embedding(new_alert['content'])
@@ -154,6 +206,10 @@ class SemanticDuplicateDetector:
             if not self._basic_match(new_alert, alert):
                 continue
             
+            if deadline is not None and deadline.expired:
+                partial = True
+                break
+            
             # Calculate semantic similarity
             alert_emb = self.get_embedding(alert['content'])
             similarity = cosine_similarity(
@@ -172,10 +228,9 @@ class SemanticDuplicateDetector:
         duplicates.sort(key=lambda x: x['similarity'], reverse=True)
         
         # Return all or just best match
-        if return_all:
-            return duplicates
-        else:
-            return duplicates[:1] if duplicates else []
+        if not return_all:
+            duplicates = duplicates[:1]
+        return duplicates, partial
     
     def batch_find_duplicates(
         self,
@@ -185,6 +240,9 @@ class SemanticDuplicateDetector:
         """
         Find duplicates for multiple new alerts at once (batch processing)
         
+        All contents are encoded in one model call and compared in a
+        single similarity matrix.
+        
         Args:
             new_alerts: List of new alerts to check
             existing_alerts: List of existing alerts
@@ -192,26 +250,39 @@ class SemanticDuplicateDetector:
         Returns:
             Dict mapping alert IDs to their duplicate lists
         """
-        results = {}
+        results = {new_alert.get('id', 'unknown'): [] for new_alert in new_alerts}
+        if not new_alerts or not existing_alerts:
+            return results
         
-        for new_alert in new_alerts:
-            alert_id = new_alert.get('id', 'unknown')
-            duplicates = self.find_duplicates(new_alert, existing_alerts, return_all=True)
-            results[alert_id] = duplicates
+        embeddings = self.get_embeddings(
+            [alert['content'] for alert in new_alerts] + [alert['content'] for alert in existing_alerts]
+        )
+        similarities = cosine_similarity(embeddings[:len(new_alerts)], embeddings[len(new_alerts):])
+        
+        for i, new_alert in enumerate(new_alerts):
+            duplicates = [
+                {'alert': alert, 'similarity': float(similarities[i, j])}
+                for j, alert in enumerate(existing_alerts)
+                if similarities[i, j] >= self.threshold and self._basic_match(new_alert, alert)
+            ]
+            duplicates.sort(key=lambda x: x['similarity'], reverse=True)
+            results[new_alert.get('id', 'unknown')] = duplicates
         
         return results
     
     def clear_cache(self):
         """Clear embedding cache"""
-        self._embedding_cache.clear()
+        with self._cache_lock:
+            self._embedding_cache.clear()
         print("[DuplicateDetector] Cache cleared")
     
     def get_cache_stats(self) -> dict:
         """Get cache statistics"""
-        return {
-            'cache_size': len(self._embedding_cache),
-            'cache_limit': 1000
-        }
+        with self._cache_lock:
+            return {
+                'cache_size': len(self._embedding_cache),
+                'cache_limit': self._cache_limit
+            }
 
 
 class DuplicateDetectorLite:
@@ -273,4 +344,10 @@ class DuplicateDetectorLite:
         
         duplicates.sort(key=lambda x: x['similarity'], reverse=True)
         return duplicates
-
+    
+    def batch_find_duplicates(self, new_alerts: list, existing_alerts: list) -> dict:
+        """Find duplicates for multiple new alerts (dict of alert ID -> duplicates)"""
+        return {
+            new_alert.get('id', 'unknown'): self.find_duplicates(new_alert, existing_alerts)
+            for new_alert in new_alerts
+        }
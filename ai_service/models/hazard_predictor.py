@@ -48,6 +48,7 @@ class HazardZonePredictor:
         self.is_trained = False
         
         # Load hazard zones data
+        self._zone_listeners = []
         self.hazard_zones = self._load_hazard_zones()
         
         # Try to load existing model
@@ -73,7 +74,23 @@ class HazardZonePredictor:
                 print(f"[HazardPredictor] Error loading zones: {e}")
         
         return []
-    
+
+    def reload_hazard_zones(self) -> int:
+        """
+        Reload hazard zones from disk (after the data file is regenerated).
+
+        Returns:
+            Number of zones loaded
+        """
+        self.hazard_zones = self._load_hazard_zones()
+        for listener in self._zone_listeners:
+            listener()
+        return len(self.hazard_zones)
+
+    def add_zone_listener(self, callback):
+        """Register a callback invoked after hazard zones are reloaded."""
+        self._zone_listeners.append(callback)
+
     def _bootstrap_model(self):
         """Bootstrap model from training data or generate synthetic data."""
         training_file = self.data_dir / "hazard_training_data.json"
@@ -188,6 +205,33 @@ class HazardZonePredictor:
             'explanation': self._generate_explanation(risk_level, hazard_type, province_info)
         }
     
+    def apply_forecast(self, result: Dict, total_precip: float, max_wind: float) -> Dict:
+        """
+        Raise a prediction's risk for forecast weather, in place.
+        
+        Args:
+            result: Output of predict_risk
+            total_precip: Forecast precipitation over the next 7 days (mm)
+            max_wind: Forecast maximum wind speed (km/h)
+        """
+        hazard_type = result['hazard_type']
+        
+        # Increase risk if heavy rain forecast for flood/landslide
+        if hazard_type in ['flood', 'landslide']:
+            if total_precip > 200:  # >200mm in 7 days
+                result['risk_level'] = min(5, result['risk_level'] + 1)
+                result['explanation'] += f" ⚠️ Dự báo mưa lớn: {total_precip:.0f}mm trong 7 ngày tới!"
+            elif total_precip > 100:
+                result['explanation'] += f" Dự báo mưa: {total_precip:.0f}mm trong 7 ngày tới."
+        
+        # Increase risk if strong wind forecast for storm
+        if hazard_type == 'storm' and max_wind > 60:
+            result['risk_level'] = min(5, result['risk_level'] + 1)
+            result['explanation'] += f" ⚠️ Dự báo gió mạnh: {max_wind:.0f} km/h!"
+        
+        result['risk_label'] = self._get_risk_label(result['risk_level'])
+        return result
+    
     def _extract_features(
         self, 
         lat: float, 
@@ -256,6 +300,49 @@ class HazardZonePredictor:
         }
         return multipliers.get(month, {}).get(hazard_type, 0.5)
     
+    def get_high_risk_provinces(self, month: int = None, min_score: float = 3.0, limit: int = None) -> List[Dict]:
+        """
+        Provinces whose seasonal risk is high this month.
+        
+        Score is the province's base risk for a hazard type times the
+        seasonal multiplier, taking the worst hazard type per province
+        (e.g. central coast floods in October score 5.0).
+        
+        Args:
+            month: Month (1-12), defaults to current
+            min_score: Minimum seasonal risk score to include
+            limit: Maximum number of provinces to return
+            
+        Returns:
+            List of dicts with province, lat, lng, hazard_type and score,
+            highest score first
+        """
+        try:
+            from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
+        except ImportError:
+            return []
+        
+        if month is None:
+            month = datetime.now().month
+        
+        ranked = []
+        for province, data in VIETNAM_PROVINCES.items():
+            score, hazard_type = max(
+                (data[f'{h}_risk'] * self._get_seasonal_multiplier(month, h), h)
+                for h in ('flood', 'landslide', 'storm')
+            )
+            if score >= min_score:
+                ranked.append({
+                    'province': province,
+                    'lat': data['lat'],
+                    'lng': data['lng'],
+                    'hazard_type': hazard_type,
+                    'score': round(score, 2)
+                })
+        
+        ranked.sort(key=lambda p: p['score'], reverse=True)
+        return ranked[:limit] if limit else ranked
+    
     def _get_season(self, month: int) -> int:
         """Get season from month."""
         if month in [1, 2, 3, 4]:
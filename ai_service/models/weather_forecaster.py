@@ -2,12 +2,25 @@
 Weather Forecaster Model
 Predicts weather conditions (temperature, humidity, rainfall) based on historical data.
 """
+import json
+import threading
+import time
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
 import joblib
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import date as date_type, datetime, timedelta
 from typing import Dict, List, Tuple, Optional
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    INFERENCE_N_JOBS, CACHE_DIR, WEATHER_TRAINING_CACHE_PATH,
+    WEATHER_OUTLOOK_DAYS, WEATHER_OUTLOOK_CACHE_ENTRIES
+)
+from models.climatology import Climatology
+from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
 
 try:
     from sklearn.ensemble import RandomForestRegressor
@@ -18,6 +31,80 @@ try:
 except ImportError:
     HAS_SKLEARN = False
 
+REGIONS = ['north', 'central', 'highlands', 'south']
+
+# Frame column -> archive daily variable
+ARCHIVE_COLUMNS = {
+    'temperature': 'temperature_2m_mean',
+    'humidity': 'relative_humidity_2m_mean',
+    'rainfall': 'precipitation_sum',
+}
+LAG_COLUMNS = {'temperature': 'prev_temp', 'humidity': 'prev_humid', 'rainfall': 'prev_rain'}
+LAG_COLUMNS_BY_LAG = {lag: column for column, lag in LAG_COLUMNS.items()}
+FEATURE_COLUMNS = ['month', 'day_of_year', 'province_id', 'region_id', 'prev_temp', 'prev_humid', 'prev_rain']
+
+
+def load_weather_frame(data_path: Path, cache_path: Path = WEATHER_TRAINING_CACHE_PATH) -> Tuple[pd.DataFrame, bool]:
+    """
+    Flatten the per-province weather archive into one row per province-day
+    
+    Each province's `daily_data` arrays become columns directly (no per-row
+    dicts); prev_* lag features are the previous day of the same province,
+    computed with one shift over the concatenated arrays. The frame is cached
+    as .npz next to the other caches and rebuilt when the archive changes.
+    Variables missing from the archive (e.g. humidity) are all-NaN columns.
+    
+    Returns:
+        (frame, from_cache)
+    """
+    key = np.array([Path(data_path).stat().st_mtime, Path(data_path).stat().st_size])
+    if cache_path is not None and Path(cache_path).exists():
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                if np.array_equal(cached['__key__'], key):
+                    return pd.DataFrame({name: cached[name] for name in cached.files if name != '__key__'}), True
+        except Exception as e:
+            print(f"[WeatherForecaster] Ignoring unreadable frame cache: {e}")
+    
+    with open(data_path, 'r', encoding='utf-8') as f:
+        archive = json.load(f)
+    
+    provinces = list(VIETNAM_PROVINCES.keys())
+    columns = {name: [] for name in ['date', 'province_id', 'region_id', *ARCHIVE_COLUMNS]}
+    for entry in archive.get('data', []):
+        daily = entry.get('daily_data') or {}
+        if not entry.get('success') or entry.get('province') not in VIETNAM_PROVINCES or not daily.get('time'):
+            continue
+        n = len(daily['time'])
+        province = entry['province']
+        columns['date'].append(np.array(daily['time'], dtype='datetime64[D]'))
+        columns['province_id'].append(np.full(n, provinces.index(province), dtype=np.int16))
+        columns['region_id'].append(np.full(n, REGIONS.index(VIETNAM_PROVINCES[province]['region']), dtype=np.int8))
+        for column, variable in ARCHIVE_COLUMNS.items():
+            values = daily.get(variable)
+            columns[column].append(np.array(values, dtype=float) if values else np.full(n, np.nan))
+    
+    if not columns['date']:
+        return pd.DataFrame(), False
+    
+    df = pd.DataFrame({name: np.concatenate(parts) for name, parts in columns.items()})
+    df['month'] = df['date'].dt.month.astype(np.int8)
+    df['day_of_year'] = df['date'].dt.dayofyear.astype(np.int16)
+    
+    # Previous day of the same province; the first day of each province has no lag
+    first_of_province = df['province_id'].ne(df['province_id'].shift())
+    for column, lag in LAG_COLUMNS.items():
+        df[lag] = df[column].shift().mask(first_of_province)
+    
+    if cache_path is not None:
+        try:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            np.savez(cache_path, __key__=key, **{name: df[name].to_numpy() for name in df.columns})
+        except OSError as e:
+            print(f"[WeatherForecaster] Could not write frame cache: {e}")
+    return df, False
+
+
 class WeatherForecaster:
     """
     Weather Forecasting Model
@@ -36,11 +123,24 @@ class WeatherForecaster:
         self.scaler = None
         self.is_trained = False
         
-        # Features needed for prediction
-        self.feature_columns = ['month', 'day_of_year', 'province_id', 'region_id', 'prev_temp', 'prev_humid', 'prev_rain']
+        # Offline fallback when the model is not trained
+        self.climatology = Climatology(
+            source_path=data_dir / "weather" / "vietnam_weather_2020_2024.json",
+            cache_path=CACHE_DIR / "climatology.npz"
+        )
+        
+        # Features needed for prediction and targets predicted (set by training)
+        self.feature_columns = list(FEATURE_COLUMNS)
+        self.target_columns = ['temperature', 'humidity', 'rainfall']
+        self.model_version = None  # training timestamp, keys the outlook cache
+        
+        self._outlooks = OrderedDict()
+        self._outlook_lock = threading.Lock()
+        self.outlook_hits = 0
+        self.outlook_misses = 0
     
-    def train(self, data_path: Path = None) -> Dict:
-        """Train model using historical weather strings."""
+    def train(self, data_path: Path = None, cache_path: Path = WEATHER_TRAINING_CACHE_PATH) -> Dict:
+        """Train model on the flattened weather archive (see load_weather_frame)."""
         if not HAS_SKLEARN:
             return {"status": "error", "message": "scikit-learn not installed"}
 
@@ -49,27 +149,30 @@ class WeatherForecaster:
             
         print(f"[WeatherForecaster] Loading data from {data_path}...")
         try:
-            # Load JSON data
-            df = pd.read_json(data_path)
-            
-            # Basic preprocessing if needed (assuming structure matches expected)
-            # We need to create lag features for 'prev_day' values if not present
-            # or simply use the data structure if it's already formatted.
-            # For simplicity, assuming the JSON list has records we can process.
-            
-            # Mocking transformation for robustness if raw JSON structure needs generic parsing
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                df['month'] = df['date'].dt.month
-                df['day_of_year'] = df['date'].dt.dayofyear
+            started = time.perf_counter()
+            df, from_cache = load_weather_frame(data_path, cache_path) if Path(data_path).exists() else (pd.DataFrame(), False)
+            load_seconds = time.perf_counter() - started
             
             # Create dummy training data if file is empty/invalid for demo
             if len(df) < 10:
                 print("[WeatherForecaster] Insufficient real data, generating synthetic training data...")
                 df = self._generate_synthetic_weather_data()
+                source = "synthetic"
+            else:
+                source = "archive"
+                print(f"[WeatherForecaster] Loaded {len(df)} province-days in {load_seconds:.2f}s"
+                      f"{' (cached)' if from_cache else ''}")
+            
+            # Only train on targets the data actually has (the archive has no humidity)
+            self.target_columns = [c for c in ARCHIVE_COLUMNS if c in df.columns and df[c].notna().any()]
+            self.feature_columns = [
+                c for c in FEATURE_COLUMNS
+                if c not in LAG_COLUMNS.values() or LAG_COLUMNS_BY_LAG[c] in self.target_columns
+            ]
+            df = df.dropna(subset=self.feature_columns + self.target_columns)
 
             X = df[self.feature_columns]
-            y = df[['temperature', 'humidity', 'rainfall']]
+            y = df[self.target_columns]
             
             # Split
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -81,21 +184,31 @@ class WeatherForecaster:
             
             # Train (Multi-output regressor)
             print("[WeatherForecaster] Training Random Forest...")
-            self.model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+            started = time.perf_counter()
+            self.model = RandomForestRegressor(n_estimators=100, min_samples_leaf=5, random_state=42, n_jobs=-1)
             self.model.fit(X_train_scaled, y_train)
+            train_seconds = time.perf_counter() - started
+            
+            # Single-row predictions run in the inference executor's budget
+            self.model.set_params(n_jobs=INFERENCE_N_JOBS)
             
             # Evaluate
             y_pred = self.model.predict(X_test_scaled)
             mae = mean_absolute_error(y_test, y_pred)
             
             self.is_trained = True
+            self.model_version = datetime.now().isoformat(timespec='seconds')
             
             metrics = {
                 "status": "success",
                 "mae": float(mae),
-                "samples": len(df)
+                "samples": len(df),
+                "source": source,
+                "targets": list(self.target_columns),
+                "load_seconds": round(load_seconds, 3),
+                "train_seconds": round(train_seconds, 3)
             }
-            print(f"[WeatherForecaster] Training complete. MAE: {mae:.2f}")
+            print(f"[WeatherForecaster] Training complete in {train_seconds:.1f}s. MAE: {mae:.2f}")
             self.save()
             return metrics
             
@@ -114,27 +227,180 @@ class WeatherForecaster:
             current_weather: Dict with 'med_temp', 'med_humid', 'med_rain' of previous day/current baseline
         """
         if not self.is_trained:
-            return self._heuristic_predict(date, region_id)
-
-        features = np.array([[
-            date.month,
-            date.timetuple().tm_yday,
-            province_id,
-            region_id,
-            current_weather.get('temp', 30),
-            current_weather.get('humid', 75),
-            current_weather.get('rain', 0)
-        ]])
+            return self._heuristic_predict(date, region_id, province_id)
+
+        values = {
+            'month': date.month,
+            'day_of_year': date.timetuple().tm_yday,
+            'province_id': province_id,
+            'region_id': region_id,
+            'prev_temp': current_weather.get('temp', 30),
+            'prev_humid': current_weather.get('humid', 75),
+            'prev_rain': current_weather.get('rain', 0)
+        }
+        features = pd.DataFrame([[values[c] for c in self.feature_columns]], columns=self.feature_columns)
         
         features_scaled = self.scaler.transform(features)
-        pred = self.model.predict(features_scaled)[0]
+        pred = dict(zip(self.target_columns, self.model.predict(features_scaled)[0]))
         
-        return {
-            "temperature": round(pred[0], 1),
-            "humidity": round(pred[1], 1),
-            "rainfall": round(max(0, pred[2]), 1),
+        result = {
+            "temperature": round(float(pred['temperature']), 1),
+            "humidity": round(float(pred.get('humidity', values['prev_humid'])), 1),
+            "rainfall": round(max(0, float(pred['rainfall'])), 1),
             "date": date.strftime("%Y-%m-%d")
         }
+        if 'humidity' not in pred:
+            result["note"] = "Humidity carried over from input (not in training data)"
+        return result
+
+    # ----- Batch outlook -----
+
+    @property
+    def version(self) -> str:
+        """Identifier of what produces forecasts (model version or fallback)"""
+        return self.model_version if self.is_trained else "climatology"
+
+    def forecast_batch(self, start: date_type, days: int = WEATHER_OUTLOOK_DAYS, province_ids: List[int] = None) -> Dict:
+        """
+        Multi-day forecast for many provinces at once
+        
+        All provinces are rolled forward together: one model call per day,
+        each day's predictions feeding the next day's prev_* features. The
+        national outlook is cached per (model version, start date), so
+        repeated and subset requests on the same day are slices of it.
+        
+        Args:
+            start: First forecast day
+            days: Horizon in days
+            province_ids: Indexes into VIETNAM_PROVINCES (default: all)
+        
+        Returns:
+            Dict with model_version, cached, dates and per-province forecasts
+        """
+        if isinstance(start, datetime):
+            start = start.date()
+        outlook, cached = self._national_outlook(start, days)
+        
+        names = list(VIETNAM_PROVINCES.keys())
+        ids = range(len(names)) if province_ids is None else province_ids
+        dates = [(start + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)]
+        provinces = []
+        for pid in ids:
+            provinces.append({
+                'province_id': pid,
+                'province': names[pid],
+                'region_id': REGIONS.index(VIETNAM_PROVINCES[names[pid]]['region']),
+                'forecasts': [
+                    {
+                        'date': dates[d],
+                        'temperature': round(float(outlook['temperature'][pid, d]), 1),
+                        'humidity': round(float(outlook['humidity'][pid, d]), 1),
+                        'rainfall': round(float(outlook['rainfall'][pid, d]), 1),
+                    }
+                    for d in range(days)
+                ]
+            })
+        return {
+            'start_date': start.strftime("%Y-%m-%d"),
+            'days': days,
+            'model_version': outlook['version'],
+            'cached': cached,
+            'provinces': provinces
+        }
+
+    def _national_outlook(self, start: date_type, days: int) -> Tuple[Dict, bool]:
+        """(P, D) arrays for every province, computed once per version/start date"""
+        version = self.version
+        key = (version, start.isoformat())
+        with self._outlook_lock:
+            entry = self._outlooks.get(key)
+            if entry is not None and entry['temperature'].shape[1] >= days:
+                self._outlooks.move_to_end(key)
+                self.outlook_hits += 1
+                return entry, True
+        
+        self.outlook_misses += 1
+        horizon = max(days, WEATHER_OUTLOOK_DAYS)
+        if self.is_trained:
+            entry = self._rollout(start, horizon)
+        else:
+            entry = self._climatology_outlook(start, horizon)
+        entry['version'] = version
+        
+        with self._outlook_lock:
+            self._outlooks[key] = entry
+            self._outlooks.move_to_end(key)
+            while len(self._outlooks) > WEATHER_OUTLOOK_CACHE_ENTRIES:
+                self._outlooks.popitem(last=False)
+        return entry, False
+
+    def _rollout(self, start: date_type, days: int) -> Dict:
+        """Autoregressive forecast for all provinces, one model call per day"""
+        provinces = list(VIETNAM_PROVINCES.values())
+        n = len(provinces)
+        lats = np.array([p['lat'] for p in provinces])
+        lngs = np.array([p['lng'] for p in provinces])
+        
+        # Day 0 starts from the climatology of the day before
+        prev = self.climatology.estimate_many(lats, lngs, [start - timedelta(days=1)] * n)
+        state = {
+            'prev_temp': prev['temperature_2m_mean'] if prev else np.full(n, 30.0),
+            'prev_humid': np.full(n, 75.0),
+            'prev_rain': prev['precipitation_sum'] if prev else np.zeros(n),
+        }
+        static = {
+            'province_id': np.arange(n),
+            'region_id': np.array([REGIONS.index(p['region']) for p in provinces]),
+        }
+        
+        out = {name: np.empty((n, days)) for name in ('temperature', 'humidity', 'rainfall')}
+        for d in range(days):
+            day = start + timedelta(days=d)
+            columns = dict(static, **state)
+            columns['month'] = np.full(n, day.month)
+            columns['day_of_year'] = np.full(n, day.timetuple().tm_yday)
+            features = pd.DataFrame({c: columns[c] for c in self.feature_columns})
+            pred = self.model.predict(self.scaler.transform(features))
+            pred = dict(zip(self.target_columns, pred.T))
+            
+            out['temperature'][:, d] = pred['temperature']
+            out['rainfall'][:, d] = np.maximum(0, pred['rainfall'])
+            out['humidity'][:, d] = pred.get('humidity', state['prev_humid'])
+            state = {
+                'prev_temp': out['temperature'][:, d],
+                'prev_humid': out['humidity'][:, d],
+                'prev_rain': out['rainfall'][:, d],
+            }
+        return out
+
+    def _climatology_outlook(self, start: date_type, days: int) -> Dict:
+        """Climatological outlook for all provinces (model not trained)"""
+        provinces = list(VIETNAM_PROVINCES.values())
+        n = len(provinces)
+        lats = np.repeat([p['lat'] for p in provinces], days)
+        lngs = np.repeat([p['lng'] for p in provinces], days)
+        dates = [start + timedelta(days=d) for d in range(days)] * n
+        values = self.climatology.estimate_many(lats, lngs, dates)
+        if not values:
+            heuristic = [self._heuristic_predict(datetime.combine(day, datetime.min.time()), 0) for day in dates[:days]]
+            return {
+                'temperature': np.tile([h['temperature'] for h in heuristic], (n, 1)),
+                'humidity': np.full((n, days), 80.0),
+                'rainfall': np.tile([h['rainfall'] for h in heuristic], (n, 1)),
+            }
+        return {
+            'temperature': values['temperature_2m_mean'].reshape(n, days),
+            'humidity': np.full((n, days), 80.0),  # the station archive has no humidity
+            'rainfall': values['precipitation_sum'].reshape(n, days),
+        }
+
+    def get_outlook_stats(self) -> Dict:
+        return {
+            'model_version': self.version,
+            'cached_outlooks': len(self._outlooks),
+            'hits': self.outlook_hits,
+            'misses': self.outlook_misses,
+        }
 
     def _generate_synthetic_weather_data(self, n_samples=1000):
         """Generate synthetic weather data if real data is missing."""
@@ -161,15 +427,30 @@ class WeatherForecaster:
             })
         return pd.DataFrame(data)
 
-    def _heuristic_predict(self, date: datetime, region_id: int) -> Dict:
-        """Fallback prediction if model not trained."""
+    def _heuristic_predict(self, date: datetime, region_id: int, province_id: int = None) -> Dict:
+        """Fallback prediction if model not trained: climatology at the province centroid."""
+        provinces = list(VIETNAM_PROVINCES.values())
+        if province_id is not None and 0 <= province_id < len(provinces):
+            estimate = self.climatology.estimate(
+                provinces[province_id]['lat'], provinces[province_id]['lng'], date
+            )
+            if estimate:
+                return {
+                    "temperature": estimate['temperature'],
+                    "humidity": 80,  # the station archive has no humidity
+                    "rainfall": estimate['precipitation'],
+                    "date": date.strftime("%Y-%m-%d"),
+                    "note": f"Climatology estimate (Model not trained; nearest station "
+                            f"{estimate['nearest_station']}, {estimate['nearest_km']:.0f} km)"
+                }
+        
         month = date.month
         base_temp = 25 + 5 * np.sin((month - 1) * np.pi / 6)
         if region_id == 0: # North - colder winter
             base_temp -= 5 if month in [12, 1, 2] else 0
         
         is_rainy_season = 5 <= month <= 10
-        rainfall = np.random.uniform(10, 50) if is_rainy_season else np.random.uniform(0, 5)
+        rainfall = 30 if is_rainy_season else 2.5
         
         return {
             "temperature": round(base_temp, 1),
@@ -183,7 +464,10 @@ class WeatherForecaster:
         joblib.dump({
             'model': self.model,
             'scaler': self.scaler,
-            'is_trained': self.is_trained
+            'is_trained': self.is_trained,
+            'feature_columns': self.feature_columns,
+            'target_columns': self.target_columns,
+            'model_version': self.model_version
         }, self.models_dir / "weather_forecaster.pkl")
 
     def load(self):
@@ -193,5 +477,11 @@ class WeatherForecaster:
             self.model = data['model']
             self.scaler = data['scaler']
             self.is_trained = data['is_trained']
+            self.feature_columns = data.get('feature_columns', list(FEATURE_COLUMNS))
+            self.target_columns = data.get('target_columns', ['temperature', 'humidity', 'rainfall'])
+            self.model_version = data.get('model_version') or datetime.fromtimestamp(
+                path.stat().st_mtime).isoformat(timespec='seconds')
+            if self.model is not None:
+                self.model.set_params(n_jobs=INFERENCE_N_JOBS)
             return True
         return False
@@ -0,0 +1,142 @@
+"""
+Concurrency Benchmark for AI Service
+Measures p50/p99 latency under N concurrent clients with model calls run
+inline on the event loop versus through the InferenceExecutor.
+
+The service runs in a uvicorn subprocess (INFERENCE_OFFLOAD=0/1) and is
+driven over real HTTP. Each client sends a mix of /api/v1/score requests
+(CPU-bound) and /api/v1/health requests (trivial); health latency shows
+how long the event loop is blocked by inference.
+
+Usage:
+    python scripts/benchmark_concurrency.py
+    python scripts/benchmark_concurrency.py --clients 50 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+
+SCORE_REQUEST = {
+    "alert_id": "bench-1",
+    "severity": "high",
+    "alert_type": "weather",
+    "content": "Mưa lớn trong 3 giờ tới, nguy cơ ngập lụt",
+    "province": "TP.HCM",
+    "lat": 10.762622,
+    "lng": 106.660172,
+    "created_at": "2024-01-15T10:00:00Z",
+    "user_lat": 10.77,
+    "user_lng": 106.67,
+    "user_role": "victim"
+}
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def client_loop(client: httpx.AsyncClient, n_requests: int, latencies: dict):
+    """One simulated client: alternate scoring and health checks"""
+    for i in range(n_requests):
+        if i % 2 == 0:
+            name, start = 'score', time.perf_counter()
+            response = await client.post("/api/v1/score", json=SCORE_REQUEST)
+        else:
+            name, start = 'health', time.perf_counter()
+            response = await client.get("/api/v1/health")
+        response.raise_for_status()
+        latencies[name].append((time.perf_counter() - start) * 1000)
+
+
+async def run_scenario(base_url: str, n_clients: int, n_requests: int) -> dict:
+    """Run all clients concurrently against the running service"""
+    latencies = {'score': [], 'health': []}
+    limits = httpx.Limits(max_connections=n_clients, max_keepalive_connections=n_clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        # Warm up connections and models
+        await client.post("/api/v1/score", json=SCORE_REQUEST)
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            client_loop(client, n_requests, latencies) for _ in range(n_clients)
+        ])
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        'throughput': total / elapsed,
+        **{
+            f'{name}_{stat}': percentile(samples, pct)
+            for name, samples in latencies.items()
+            for stat, pct in (('p50', 50), ('p99', 99))
+        }
+    }
+
+
+def start_service(port: int, offload: bool) -> subprocess.Popen:
+    """Start uvicorn in a subprocess and wait until /health answers"""
+    env = dict(os.environ, INFERENCE_OFFLOAD="1" if offload else "0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=str(Path(__file__).parent.parent),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/v1/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(1)
+    process.kill()
+    raise RuntimeError("Service did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark latency under concurrent clients")
+    parser.add_argument('--clients', type=int, default=50, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=20, help="Requests per client")
+    parser.add_argument('--port', type=int, default=8765, help="Port for the benchmarked service")
+    args = parser.parse_args()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print("\n" + "=" * 78)
+    print(f"Latency under {args.clients} concurrent clients x {args.requests} requests (ms)")
+    print("=" * 78)
+    print(f"  {'mode':<10}{'req/s':>8}{'score p50':>12}{'score p99':>12}{'health p50':>13}{'health p99':>13}")
+
+    for mode, offload in (('inline', False), ('executor', True)):
+        process = start_service(args.port, offload)
+        try:
+            result = asyncio.run(run_scenario(base_url, args.clients, args.requests))
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"  {mode:<10}{result['throughput']:>8.0f}"
+              f"{result['score_p50']:>12.1f}{result['score_p99']:>12.1f}"
+              f"{result['health_p50']:>13.1f}{result['health_p99']:>13.1f}")
+
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
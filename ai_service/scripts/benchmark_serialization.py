@@ -0,0 +1,210 @@
+"""
+Serialization Benchmark for AI Service
+Compares the Pydantic response_model path with the ORJSONResponse fast path
+at realistic payload sizes (e.g. duplicate check against 1,000 alerts), and
+JSON with MessagePack as wire formats for request and response bodies.
+
+Usage:
+    python scripts/benchmark_serialization.py
+    python scripts/benchmark_serialization.py --alerts 1000 --repeat 200
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from utils.serialization import ORJSONResponse, MsgPackResponse, HAS_ORJSON, HAS_MSGPACK
+
+
+PROVINCES = ["Quảng Nam", "Đà Nẵng", "Thừa Thiên Huế", "Quảng Ngãi", "Hà Tĩnh"]
+
+
+def make_alert(i: int) -> dict:
+    """Build an alert dict shaped like the ones the backend sends"""
+    return {
+        'id': f'alert-{i:05d}',
+        'content': f"Bão số {i % 13} gây mưa lớn, nguy cơ lũ quét và sạt lở đất tại {PROVINCES[i % 5]}. "
+                   "Người dân vùng trũng thấp cần di dời đến nơi an toàn.",
+        'alert_type': 'disaster',
+        'severity': 'critical',
+        'province': PROVINCES[i % 5],
+        'district': f'Huyện {i % 17}',
+        'lat': 15.5 + (i % 100) * 0.01,
+        'lng': 108.0 + (i % 100) * 0.01,
+        'created_at': '2024-10-15T10:00:00Z',
+        'source': 'nchmf',
+    }
+
+
+def build_payloads(n_alerts: int) -> dict:
+    """Response payloads for each endpoint"""
+    duplicates = [
+        {'alert': make_alert(i), 'similarity': 0.99 - i * 1e-5}
+        for i in range(n_alerts)
+    ]
+    return {
+        'score': {
+            'alert_id': 'alert-123',
+            'priority_score': 87.25,
+            'confidence': 0.93,
+            'explanation': {
+                'score': 87.25,
+                'factors': [
+                    {'factor': 'severity', 'impact': 'high', 'description': 'Mức độ nghiêm trọng cao'},
+                    {'factor': 'distance', 'impact': 'high', 'description': 'Rất gần vị trí của bạn'},
+                ],
+            },
+        },
+        'duplicate': {
+            'is_duplicate': True,
+            'duplicates': duplicates,
+            'best_match': duplicates[0],
+        },
+        'hazard': {
+            'lat': 16.0544, 'lng': 108.2022, 'risk_level': 4, 'risk_label': 'high',
+            'confidence': 0.87, 'hazard_type': 'flood', 'month': 10, 'province': 'Đà Nẵng',
+            'explanation': 'Nguy cơ ngập lụt mức Cao tại Đà Nẵng ⚠️ Dự báo mưa lớn: 250mm trong 7 ngày tới!',
+            'current_weather': {'temperature': 26.1, 'precipitation': 12.3, 'rain': 12.3,
+                                'wind_speed': 35.0, 'wind_gusts': 60.2, 'humidity': 94,
+                                'cloud_cover': 100, 'pressure': 1002.1},
+            'forecast': {'days': 7, 'total_precipitation': 250.4, 'max_temperature': 29.0,
+                         'min_temperature': 23.5, 'max_wind': 55.0},
+        },
+        'weather': {'date': '2024-10-16', 'temperature': 27.4, 'humidity': 88.0,
+                    'rainfall': 35.2, 'note': None},
+    }
+
+
+def build_requests(n_alerts: int) -> dict:
+    """Request bodies for each endpoint"""
+    return {
+        'score': {
+            'alert_id': 'alert-123', 'severity': 'high', 'alert_type': 'weather',
+            'content': 'Mưa lớn trong 3 giờ tới, nguy cơ ngập lụt', 'province': 'TP.HCM',
+            'district': 'Quận 1', 'lat': 10.762622, 'lng': 106.660172,
+            'created_at': '2024-01-15T10:00:00Z', 'user_lat': 10.762622,
+            'user_lng': 106.660172, 'user_role': 'victim',
+        },
+        'duplicate': {
+            'new_alert': make_alert(n_alerts),
+            'existing_alerts': [make_alert(i) for i in range(n_alerts)],
+            'threshold': 0.85,
+        },
+        'hazard': {'lat': 16.0544, 'lng': 108.2022, 'month': 10,
+                   'hazard_type': 'flood', 'include_weather': True},
+    }
+
+
+def pydantic_path(model_cls, payload: dict) -> bytes:
+    """
+    Mirror FastAPI's response_model handling: build the model in the endpoint,
+    dump it, re-validate against the response field, serialize, json.dumps.
+    """
+    adapter = TypeAdapter(model_cls)
+    instance = model_cls(**payload)
+    validated = adapter.validate_python(instance.model_dump())
+    content = adapter.dump_python(validated, mode='json')
+    return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(payload: dict) -> bytes:
+    """ORJSONResponse returned directly from the endpoint"""
+    return ORJSONResponse(payload).body
+
+
+def json_roundtrip(payload: dict):
+    """Encode as the server would and decode as the client would"""
+    return json_loads(ORJSONResponse(payload).body)
+
+
+def msgpack_roundtrip(payload: dict):
+    """Same round trip with MessagePack bodies"""
+    return msgpack.unpackb(MsgPackResponse(payload).body, raw=False)
+
+
+def timeit(fn, repeat: int) -> float:
+    """Median wall time of fn in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument('--alerts', type=int, default=1000, help="Existing alerts echoed by duplicate check")
+    parser.add_argument('--repeat', type=int, default=100, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    from main import (
+        AlertScoreResponse, DuplicateCheckResponse,
+        HazardPredictResponse, WeatherPredictResponse
+    )
+    models = {
+        'score': AlertScoreResponse,
+        'duplicate': DuplicateCheckResponse,
+        'hazard': HazardPredictResponse,
+        'weather': WeatherPredictResponse,
+    }
+    payloads = build_payloads(args.alerts)
+
+    print("\n" + "=" * 72)
+    print(f"Response serialization (median of {args.repeat}, orjson={'yes' if HAS_ORJSON else 'no'})")
+    print("=" * 72)
+    print(f"  {'endpoint':<12}{'size (KB)':>12}{'pydantic (ms)':>16}{'fast (ms)':>12}{'speedup':>10}")
+
+    for name, payload in payloads.items():
+        model_cls = models[name]
+        before = timeit(lambda: pydantic_path(model_cls, payload), args.repeat)
+        after = timeit(lambda: fast_path(payload), args.repeat)
+        size_kb = len(fast_path(payload)) / 1024
+        print(f"  {name:<12}{size_kb:>12.1f}{before:>16.3f}{after:>12.3f}{before / after:>9.1f}x")
+
+    print("=" * 72)
+
+    if not HAS_MSGPACK:
+        print("msgpack not installed; skipping wire format comparison")
+        return
+
+    requests_ = build_requests(args.alerts)
+    print(f"\nWire format round trip, encode + decode (median of {args.repeat})")
+    print("=" * 72)
+    print(f"  {'body':<20}{'JSON KB':>9}{'msgpack KB':>12}{'JSON ops/s':>13}{'msgpack ops/s':>16}")
+
+    for direction, bodies in (('request', requests_), ('response', payloads)):
+        for name in ('score', 'duplicate', 'hazard'):
+            body = bodies[name]
+            json_kb = len(ORJSONResponse(body).body) / 1024
+            msgpack_kb = len(MsgPackResponse(body).body) / 1024
+            json_ms = timeit(lambda: json_roundtrip(body), args.repeat)
+            msgpack_ms = timeit(lambda: msgpack_roundtrip(body), args.repeat)
+            label = f"{name} {direction}"
+            print(f"  {label:<20}{json_kb:>9.1f}{msgpack_kb:>12.1f}"
+                  f"{1000 / json_ms:>13.0f}{1000 / msgpack_ms:>16.0f}")
+
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Text Matching Benchmark for the alert collectors
+Compares the previous per-collector keyword loops (lowercase the text, then
+`keyword in text` for every province and keyword list) with the shared
+AlertTextMatcher, which extracts province, severity, alert type and
+disaster relevance in one scan.
+
+The default corpus is data/feeds/sample_feed_corpus.jsonl (one
+{"source", "title", "summary"} object per line). Record a fresh corpus from
+the live news feeds with --record (requires feedparser).
+
+Usage:
+    python scripts/benchmark_text_matching.py
+    python scripts/benchmark_text_matching.py --corpus my_feeds.jsonl --repeat 200
+    python scripts/benchmark_text_matching.py --record data/feeds/recorded.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data_collectors.text_matcher import PROVINCES, AlertTextMatcher
+
+DEFAULT_CORPUS = Path(__file__).parent.parent / "data" / "feeds" / "sample_feed_corpus.jsonl"
+
+# Keyword lists of the previous NewsCollector implementation
+LEGACY_DISASTER_KEYWORDS = [
+    'lũ lụt', 'bão', 'thiên tai', 'sơ tán', 'cứu hộ',
+    'mưa lớn', 'ngập lụt', 'sạt lở', 'động đất', 'hạn hán',
+    'flood', 'storm', 'typhoon', 'disaster', 'evacuation',
+    'cảnh báo', 'khẩn cấp', 'nguy hiểm'
+]
+
+
+def legacy_analyze(title: str, summary: str, places: list = PROVINCES) -> dict:
+    """The previous NewsCollector path: _is_disaster_related + three _extract_* calls"""
+    content = (title + " " + summary).lower()
+    related = any(keyword in content for keyword in LEGACY_DISASTER_KEYWORDS)
+
+    text_lower = (title + " " + (summary or title)).lower()
+    if any(kw in text_lower for kw in ['nghiêm trọng', 'cực kỳ', 'khẩn cấp', 'cấp độ 4']):
+        severity = 'critical'
+    elif any(kw in text_lower for kw in ['cao', 'nguy hiểm', 'cấp độ 3']):
+        severity = 'high'
+    else:
+        severity = 'medium'
+
+    text_lower = (title + " " + (summary or title)).lower()
+    if any(kw in text_lower for kw in ['sơ tán', 'evacuation']):
+        alert_type = 'evacuation'
+    elif any(kw in text_lower for kw in ['lũ', 'lụt', 'flood', 'ngập']):
+        alert_type = 'disaster'
+    elif any(kw in text_lower for kw in ['bão', 'storm', 'typhoon']):
+        alert_type = 'weather'
+    elif any(kw in text_lower for kw in ['thiên tai', 'disaster']):
+        alert_type = 'disaster'
+    else:
+        alert_type = 'general'
+
+    text_lower = (title + " " + (summary or title)).lower()
+    province = 'Toàn quốc'
+    for name in places:
+        if name.lower() in text_lower:
+            province = name
+            break
+
+    return {'province': province, 'severity': severity, 'alert_type': alert_type, 'disaster_related': related}
+
+
+def synthetic_places(n: int) -> dict:
+    """n made-up two-syllable place names, a stand-in for a district gazetteer"""
+    syllables = ['An', 'Bình', 'Cẩm', 'Diên', 'Gia', 'Hòa', 'Krông', 'Lạc', 'Mỹ', 'Ngọc',
+                 'Phước', 'Quế', 'Sơn', 'Tân', 'Thạch', 'Vạn', 'Xuân', 'Yên', 'Đức', 'Ea',
+                 'Hướng', 'Kỳ', 'Lục', 'Mường', 'Nghĩa', 'Phù', 'Quỳnh', 'Tiên', 'Vĩnh', 'Lộc']
+    names = [f"{a} {b}" for a in syllables for b in syllables if a != b]
+    return {name: PROVINCES[i % len(PROVINCES)] for i, name in enumerate(names[:n])}
+
+
+def load_corpus(path: Path) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record_corpus(path: Path):
+    """Save title/summary of every entry currently in the live news feeds"""
+    from data_collectors.news_collector import NewsCollector
+
+    collector = NewsCollector(delay_seconds=0)
+    rows = []
+    for source_name, config in NewsCollector.TRUSTED_SOURCES.items():
+        for rss_url in config['rss_urls']:
+            try:
+                for entry in collector._feed_entries(rss_url):
+                    rows.append({
+                        'source': source_name,
+                        'title': entry.get('title', ''),
+                        'summary': entry.get('summary', ''),
+                    })
+            except Exception as e:
+                print(f"  skipped {rss_url}: {e}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    print(f"Recorded {len(rows)} entries to {path}")
+
+
+def bench(fn, items, repeat: int, rounds: int = 5) -> float:
+    """Microseconds per item (best of `rounds`, each over the corpus x repeat)"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for item in items:
+                fn(item)
+        best = min(best, (time.perf_counter() - started) / (repeat * len(items)) * 1e6)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark collector text matching")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--extra-places", type=int, default=700,
+                        help="place names added for the vocabulary-size comparison (~ number of districts)")
+    parser.add_argument("--record", type=Path, help="record the live news feeds to this file and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        record_corpus(args.record)
+        return
+
+    items = load_corpus(args.corpus)
+    started = time.perf_counter()
+    matcher = AlertTextMatcher()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    print("=" * 70)
+    print(f"Text matching: {len(items)} entries from {args.corpus.name}, x{args.repeat}")
+    print(f"Matcher build: {build_ms:.1f} ms ({len(matcher._goto)} automaton states)")
+    print("=" * 70)
+
+    legacy_us = bench(lambda item: legacy_analyze(item['title'], item['summary']), items, args.repeat)
+    matcher_us = bench(lambda item: matcher.analyze(item['title'] + " " + item['summary']), items, args.repeat)
+    print(f"{'legacy keyword loops':<28}{legacy_us:>10.1f} us/entry")
+    print(f"{'AlertTextMatcher':<28}{matcher_us:>10.1f} us/entry   ({legacy_us / matcher_us:.1f}x)")
+
+    # The keyword loops scan the text once per name; the automaton does not
+    # depend on vocabulary size
+    extra = synthetic_places(args.extra_places)
+    places = PROVINCES + list(extra)
+    big_matcher = AlertTextMatcher(extra_places=extra)
+    legacy_big_us = bench(lambda item: legacy_analyze(item['title'], item['summary'], places), items, args.repeat)
+    matcher_big_us = bench(lambda item: big_matcher.analyze(item['title'] + " " + item['summary']), items, args.repeat)
+    print(f"\nWith {len(extra)} more place names:")
+    print(f"{'legacy keyword loops':<28}{legacy_big_us:>10.1f} us/entry")
+    print(f"{'AlertTextMatcher':<28}{matcher_big_us:>10.1f} us/entry   ({legacy_big_us / matcher_big_us:.1f}x)")
+
+    print("\nDifferences (legacy -> matcher):")
+    for field in ('province', 'severity', 'alert_type', 'disaster_related'):
+        changed = []
+        for item in items:
+            old = legacy_analyze(item['title'], item['summary'])[field]
+            new = matcher.analyze(item['title'] + " " + item['summary'])[field]
+            if old != new:
+                changed.append((item['title'], old, new))
+        print(f"  {field}: {len(changed)}/{len(items)}")
+        for title, old, new in changed[:5]:
+            print(f"    {title[:50]:<50} {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -305,3 +305,4 @@ if __name__ == "__main__":
     # Download datasets
     datasets = args.datasets if 'all' not in args.datasets else None
     download_all(datasets, force=args.force)
+    print("\n💡 Next: python scripts/ingest_kaggle_datasets.py (CSV -> columnar hazard events)")
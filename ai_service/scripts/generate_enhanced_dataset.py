@@ -8,11 +8,16 @@ This script creates a training dataset by:
 4. Creating labeled samples for training
 
 This will replace the synthetic data with real weather patterns.
+
+Weather is fetched once per weather point (province centroid or archive
+grid cell) as one multi-year daily series; every sample's 30-day summary
+is then read from windowed prefix sums over those arrays.
 """
 import sys
 from pathlib import Path
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from datetime import datetime, timedelta
 import time
 import random
@@ -27,12 +32,15 @@ from config import DATA_DIR
 ENHANCED_DATA_DIR = DATA_DIR / "enhanced"
 ENHANCED_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+LOOKBACK_DAYS = 30
+
 
 def generate_enhanced_samples(
     num_samples: int = 5000,
     start_date: str = "2020-01-01",
     end_date: str = "2024-01-01",
-    with_weather: bool = True
+    with_weather: bool = True,
+    snap: str = "province"
 ):
     """
     Generate training samples with real historical weather
@@ -42,6 +50,8 @@ def generate_enhanced_samples(
         start_date: Start date for historical data
         end_date: End date for historical data
         with_weather: Whether to fetch real weather data (slower)
+        snap: Weather point per sample: 'province' (centroid) or 'grid'
+              (archive grid cell of the jittered position)
     """
     print("=" * 70)
     print("  🌟 ENHANCED DATASET GENERATOR WITH REAL WEATHER DATA")
@@ -49,7 +59,7 @@ def generate_enhanced_samples(
     print(f"\n📊 Configuration:")
     print(f"  Samples: {num_samples}")
     print(f"  Date range: {start_date} to {end_date}")
-    print(f"  Real weather: {'Yes (using Open-Meteo)' if with_weather else 'No'}")
+    print(f"  Real weather: {'Yes (using Open-Meteo, snapped to ' + snap + ')' if with_weather else 'No'}")
     print(f"  Provinces: {len(VIETNAM_PROVINCES)}")
     
     collector = OpenMeteoCollector(cache_enabled=True) if with_weather else None
@@ -113,51 +123,19 @@ def generate_enhanced_samples(
             'base_storm_risk': base_storm_risk,
         }
         
-        # Fetch REAL weather data if requested
-        if with_weather and collector:
-            try:
-                # Get weather 30 days before the sample date
-                lookback_start = sample_date - timedelta(days=30)
-                
-                weather_summary = collector.get_weather_for_disaster_event(
-                    lat, lng,
-                    sample_date.strftime('%Y-%m-%d'),
-                    lookback_days=30
-                )
-                
-                if weather_summary:
-                    # Add weather features
-                    sample.update({
-                        'weather_avg_temp': round(weather_summary.get('avg_temperature', 25), 2),
-                        'weather_max_temp': round(weather_summary.get('max_temperature', 30), 2),
-                        'weather_min_temp': round(weather_summary.get('min_temperature', 20), 2),
-                        'weather_total_precip_30d': round(weather_summary.get('total_precipitation', 0), 2),
-                        'weather_max_daily_precip': round(weather_summary.get('max_daily_precipitation', 0), 2),
-                        'weather_avg_wind': round(weather_summary.get('avg_wind_speed', 10), 2),
-                        'weather_max_wind': round(weather_summary.get('max_wind_speed', 20), 2),
-                        'weather_days_with_rain': int(weather_summary.get('days_with_rain', 0)),
-                        'weather_days_heavy_rain': int(weather_summary.get('days_with_heavy_rain', 0)),
-                    })
-                else:
-                    # Use defaults if weather fetch fails
-                    sample.update(get_default_weather_features())
-                
-                # Small delay to avoid rate limiting
-                if (i + 1) % 10 == 0:
-                    time.sleep(0.1)
-                    
-            except Exception as e:
-                print(f"  ⚠️ Weather fetch failed for sample {i+1}: {e}")
-                sample.update(get_default_weather_features())
-        else:
-            # Use default weather features
-            sample.update(get_default_weather_features())
-        
-        # Calculate risk level based on features
-        sample['risk_level'] = calculate_risk_level(sample, province_data)
-        
         samples.append(sample)
     
+    # Attach weather: one series per weather point, windows from prefix sums
+    if with_weather and collector:
+        attach_weather_features(samples, collector, start, end, snap)
+    else:
+        for sample in samples:
+            sample.update(get_default_weather_features())
+    
+    # Calculate risk level based on features
+    for sample in samples:
+        sample['risk_level'] = calculate_risk_level(sample, VIETNAM_PROVINCES[sample['province']])
+    
     print(f"\n✅ Generated {len(samples)} samples")
     
     # Convert to DataFrame
@@ -220,6 +198,159 @@ def get_default_weather_features() -> dict:
     }
 
 
+# Daily variables used for the 30-day summaries
+SERIES_VARIABLES = [
+    'temperature_2m_mean',
+    'temperature_2m_max',
+    'temperature_2m_min',
+    'precipitation_sum',
+    'wind_speed_10m_max',
+]
+
+
+def weather_point(sample: dict, snap: str, collector: OpenMeteoCollector) -> tuple:
+    """Point whose weather series a sample reads from"""
+    if snap == 'grid':
+        return collector.archive.cell_center(sample['lat'], sample['lng'])
+    province_data = VIETNAM_PROVINCES[sample['province']]
+    return (province_data['lat'], province_data['lng'])
+
+
+def fetch_point_series(collector: OpenMeteoCollector, lat: float, lng: float,
+                       series_start: datetime, series_end: datetime) -> dict:
+    """
+    One multi-year daily series for a weather point
+    
+    Returns:
+        Dict of float arrays indexed by day offset from series_start
+        (NaN where upstream has no value)
+    """
+    n_days = (series_end - series_start).days + 1
+    series = {name: np.full(n_days, np.nan) for name in SERIES_VARIABLES}
+    
+    data = collector.get_historical_weather(
+        lat, lng,
+        series_start.strftime('%Y-%m-%d'),
+        series_end.strftime('%Y-%m-%d')
+    )
+    daily = data.get('daily') if data else None
+    if not daily:
+        return series
+    
+    offsets = (pd.to_datetime(daily['time']) - series_start).days.to_numpy()
+    in_range = (offsets >= 0) & (offsets < n_days)
+    for name in SERIES_VARIABLES:
+        values = np.array(daily.get(name, [None] * len(offsets)), dtype=float)
+        series[name][offsets[in_range]] = values[in_range]
+    
+    return series
+
+
+def window_summaries(series: dict, lookback_days: int = LOOKBACK_DAYS) -> dict:
+    """
+    Weather summary for the window ending on every day of the series
+    
+    Same statistics as OpenMeteoCollector.get_weather_for_disaster_event
+    (lookback_days + 1 days, inclusive), computed for all end days at once:
+    sums and counts from prefix sums, extremes from sliding windows.
+    Entries are NaN where the window has no data.
+    """
+    window = lookback_days + 1
+    
+    def rolling_sum(values):
+        prefix = np.concatenate([[0.0], np.cumsum(np.nan_to_num(values))])
+        sums = prefix[window:] - prefix[:-window]
+        return np.concatenate([np.full(window - 1, np.nan), sums])
+    
+    def rolling_extreme(values, reducer, fill):
+        filled = np.where(np.isnan(values), fill, values)
+        extremes = reducer(sliding_window_view(filled, window), axis=1)
+        extremes = np.where(np.isinf(extremes), np.nan, extremes)
+        return np.concatenate([np.full(window - 1, np.nan), extremes])
+    
+    def rolling_mean(values):
+        counts = rolling_sum(~np.isnan(values))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, rolling_sum(values) / counts, np.nan)
+    
+    precip = series['precipitation_sum']
+    has_precip = rolling_sum(~np.isnan(precip)) > 0
+    
+    def precip_stat(values):
+        return np.where(has_precip, values, np.nan)
+    
+    return {
+        'avg_temperature': rolling_mean(series['temperature_2m_mean']),
+        'max_temperature': rolling_extreme(series['temperature_2m_max'], np.max, -np.inf),
+        'min_temperature': rolling_extreme(series['temperature_2m_min'], np.min, np.inf),
+        'total_precipitation': precip_stat(rolling_sum(precip)),
+        'max_daily_precipitation': rolling_extreme(precip, np.max, -np.inf),
+        'avg_wind_speed': rolling_mean(series['wind_speed_10m_max']),
+        'max_wind_speed': rolling_extreme(series['wind_speed_10m_max'], np.max, -np.inf),
+        'days_with_rain': precip_stat(rolling_sum(precip > 0)),
+        'days_with_heavy_rain': precip_stat(rolling_sum(precip > 50)),  # >50mm
+    }
+
+
+def attach_weather_features(samples: list, collector: OpenMeteoCollector,
+                            start: datetime, end: datetime, snap: str = 'province'):
+    """
+    Add 30-day weather features to every sample in place
+    
+    Planning stage groups samples by weather point; each point costs one
+    multi-year series fetch (served from the local archive after the first
+    run) instead of one HTTP call per sample.
+    """
+    series_start = start - timedelta(days=LOOKBACK_DAYS)
+    
+    plan = {}
+    for idx, sample in enumerate(samples):
+        plan.setdefault(weather_point(sample, snap, collector), []).append(idx)
+    print(f"\n🌦️  Weather plan: {len(samples)} samples -> {len(plan)} weather points ({snap})")
+    
+    fetch_seconds = 0.0
+    summary_seconds = 0.0
+    defaults = get_default_weather_features()
+    missing = 0
+    
+    for n, ((lat, lng), indices) in enumerate(plan.items(), start=1):
+        started = time.perf_counter()
+        series = fetch_point_series(collector, lat, lng, series_start, end)
+        fetch_seconds += time.perf_counter() - started
+        
+        started = time.perf_counter()
+        summaries = window_summaries(series)
+        offsets = np.array([
+            (datetime.strptime(samples[i]['date'], '%Y-%m-%d') - series_start).days for i in indices
+        ])
+        values = {name: column[offsets] for name, column in summaries.items()}
+        
+        for row, i in enumerate(indices):
+            if np.isnan(values['total_precipitation'][row]):
+                samples[i].update(defaults)
+                missing += 1
+                continue
+            samples[i].update({
+                'weather_avg_temp': round(float(values['avg_temperature'][row]), 2),
+                'weather_max_temp': round(float(values['max_temperature'][row]), 2),
+                'weather_min_temp': round(float(values['min_temperature'][row]), 2),
+                'weather_total_precip_30d': round(float(values['total_precipitation'][row]), 2),
+                'weather_max_daily_precip': round(float(values['max_daily_precipitation'][row]), 2),
+                'weather_avg_wind': round(float(values['avg_wind_speed'][row]), 2),
+                'weather_max_wind': round(float(values['max_wind_speed'][row]), 2),
+                'weather_days_with_rain': int(values['days_with_rain'][row]),
+                'weather_days_heavy_rain': int(values['days_with_heavy_rain'][row]),
+            })
+        summary_seconds += time.perf_counter() - started
+        
+        if n % 10 == 0 or n == len(plan):
+            print(f"  Weather points: {n}/{len(plan)}")
+    
+    print(f"  ⏱️  Fetch: {fetch_seconds:.1f}s, summaries: {summary_seconds:.2f}s")
+    if missing:
+        print(f"  ⚠️ {missing} samples had no weather data, using defaults")
+
+
 def calculate_risk_level(sample: dict, province_data: dict) -> int:
     """
     Calculate risk level based on features
@@ -288,6 +419,12 @@ if __name__ == "__main__":
         action='store_true',
         help='Skip fetching real weather data (faster, but less accurate)'
     )
+    parser.add_argument(
+        '--snap',
+        choices=['province', 'grid'],
+        default='province',
+        help='Weather point per sample: province centroid or 0.1° grid cell (default: province)'
+    )
     parser.add_argument(
         '--start-date',
         type=str,
@@ -307,7 +444,8 @@ if __name__ == "__main__":
         num_samples=args.samples,
         start_date=args.start_date,
         end_date=args.end_date,
-        with_weather=not args.no_weather
+        with_weather=not args.no_weather,
+        snap=args.snap
     )
     
     print(f"\n✅ Dataset ready for training!")
@@ -0,0 +1,83 @@
+"""
+Ingest downloaded Kaggle datasets into the hazard event store
+
+Run after download_kaggle_datasets.py. Reads the raw CSVs in chunks,
+normalizes them to (province, date, hazard_type, severity) and writes
+columnar parts partitioned by hazard type and year (see
+data_collectors/kaggle_ingest.py). Re-running replaces a dataset's parts.
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+from config import DATA_DIR, HAZARD_EVENTS_DIR, KAGGLE_INGEST_CHUNK_ROWS
+from data_collectors.kaggle_ingest import HAS_PYARROW, INGEST_SOURCES, ingest_source
+from scripts.download_kaggle_datasets import DATASETS
+
+
+def ingest_all(sources: list = None, output_dir: Path = HAZARD_EVENTS_DIR, chunk_rows: int = KAGGLE_INGEST_CHUNK_ROWS):
+    """
+    Ingest all or selected downloaded datasets
+
+    Args:
+        sources: Dataset keys to ingest (None = all ingestible)
+        output_dir: Root of the partitioned store
+        chunk_rows: CSV rows read at a time
+    """
+    if sources is None:
+        sources = list(INGEST_SOURCES.keys())
+
+    print("\n" + "=" * 70)
+    print("📥 KAGGLE DATASETS INGESTION")
+    print(f"   Output: {output_dir} ({'parquet' if HAS_PYARROW else 'npz'} parts)")
+    print("=" * 70)
+
+    results = {}
+    for key in sources:
+        directory = DATA_DIR / DATASETS[key]['output_dir']
+        if not directory.exists():
+            print(f"\n⏭️  {key}: not downloaded ({directory})")
+            continue
+        print(f"\n🔄 {key}: {DATASETS[key]['description']}")
+        results[key] = ingest_source(key, directory, output_dir=output_dir, chunk_rows=chunk_rows)
+
+    print("\n" + "=" * 70)
+    print("📊 INGESTION SUMMARY")
+    print("=" * 70)
+    for key, stats in results.items():
+        status = "✅" if stats['events_written'] else "⚠️ "
+        print(f"{status} {key}: {stats['rows_read']} rows -> {stats['events_written']} events "
+              f"({stats['files']} files, {stats['parts']} parts)")
+    print("=" * 70)
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Ingest downloaded Kaggle datasets into columnar hazard events')
+    parser.add_argument(
+        '--datasets',
+        nargs='+',
+        choices=list(INGEST_SOURCES.keys()) + ['all'],
+        default=['all'],
+        help='Datasets to ingest (default: all)'
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        default=HAZARD_EVENTS_DIR,
+        help=f'Output directory (default: {HAZARD_EVENTS_DIR})'
+    )
+    parser.add_argument(
+        '--chunk-rows',
+        type=int,
+        default=KAGGLE_INGEST_CHUNK_ROWS,
+        help=f'CSV rows per chunk (default: {KAGGLE_INGEST_CHUNK_ROWS})'
+    )
+
+    args = parser.parse_args()
+    sources = args.datasets if 'all' not in args.datasets else None
+    ingest_all(sources, output_dir=args.output, chunk_rows=args.chunk_rows)
@@ -0,0 +1,234 @@
+"""Admission control and load shedding with severity-aware priority queues"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import ADMISSION_LIMITS
+
+# Lower value = served first
+PRIORITY_CRITICAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_CRITICAL: 'critical',
+    PRIORITY_HIGH: 'high',
+    PRIORITY_NORMAL: 'normal',
+    PRIORITY_LOW: 'low',
+}
+
+SEVERITY_PRIORITY = {
+    'critical': PRIORITY_CRITICAL,
+    'high': PRIORITY_HIGH,
+    'medium': PRIORITY_NORMAL,
+    'low': PRIORITY_LOW,
+}
+
+ALERT_TYPE_PRIORITY = {
+    'evacuation': PRIORITY_CRITICAL,
+    'disaster': PRIORITY_HIGH,
+    'weather': PRIORITY_NORMAL,
+    'general': PRIORITY_LOW,
+}
+
+
+def request_priority(severity: str = None, alert_type: str = None) -> int:
+    """
+    Priority of a request from its alert severity and type
+
+    The more urgent of the two wins, so an evacuation order is treated as
+    critical even when its severity is only "medium".
+    """
+    return min(
+        SEVERITY_PRIORITY.get((severity or '').lower(), PRIORITY_NORMAL),
+        ALERT_TYPE_PRIORITY.get((alert_type or '').lower(), PRIORITY_NORMAL)
+    )
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; maps to 429 with Retry-After"""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        super().__init__(f"{endpoint}: {reason}")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded, priority-ordered work queue for one endpoint
+
+    At most `concurrency` requests run at once; the rest wait in a heap
+    ordered by (priority, arrival). A request is rejected immediately with
+    a Retry-After hint when its estimated wait exceeds `max_wait_ms`, or
+    when the queue is full and nothing of lower priority can be shed to
+    make room. Critical/evacuation traffic therefore never queues behind
+    "general" requests, and displaces them under overload.
+
+    Usage:
+        async with controller.slot(request_priority(severity, alert_type)):
+            ... handle request ...
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, max_wait_ms: float):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.max_wait_ms = max_wait_ms
+
+        self._active = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._queued = {p: 0 for p in PRIORITY_NAMES}
+
+        # Service time estimate (EWMA, ms) used to predict queueing delay
+        self._service_ms = 50.0
+        self._alpha = 0.2
+
+        self.admitted = 0
+        self.rejected = 0
+        self.shed = 0
+        self._wait_total_ms = {p: 0.0 for p in PRIORITY_NAMES}
+        self._wait_count = {p: 0 for p in PRIORITY_NAMES}
+        self._wait_max_ms = {p: 0.0 for p in PRIORITY_NAMES}
+
+    @classmethod
+    def from_config(cls, name: str) -> 'AdmissionController':
+        """Create a controller from ADMISSION_LIMITS[name]"""
+        limits = ADMISSION_LIMITS[name]
+        return cls(name, limits['concurrency'], limits['max_queue'], limits['max_wait_ms'])
+
+    @property
+    def depth(self) -> int:
+        """Requests currently waiting"""
+        return sum(self._queued.values())
+
+    def estimate_wait_ms(self, priority: int) -> float:
+        """Expected queueing delay for a new request of this priority"""
+        if self._active < self.concurrency and self.depth == 0:
+            return 0.0
+        ahead = sum(n for p, n in self._queued.items() if p <= priority)
+        return (ahead + 1) / self.concurrency * self._service_ms
+
+    def _retry_after(self, wait_ms: float) -> int:
+        return max(1, math.ceil(wait_ms / 1000))
+
+    async def acquire(self, priority: int, max_wait_ms: float = None):
+        """
+        Wait for a slot, or raise AdmissionRejected
+
+        Args:
+            priority: PRIORITY_* value (lower is served first)
+            max_wait_ms: Caller's own wait budget (e.g. what is left of the
+                         request deadline); the tighter of this and the
+                         endpoint budget applies
+        """
+        if self._active < self.concurrency and self.depth == 0:
+            self._active += 1
+            self._record_wait(priority, 0.0)
+            return
+
+        budget = self.max_wait_ms if max_wait_ms is None else min(self.max_wait_ms, max_wait_ms)
+        estimate = self.estimate_wait_ms(priority)
+        if estimate > budget:
+            self.rejected += 1
+            raise AdmissionRejected(self.name, "estimated wait exceeds budget", self._retry_after(estimate))
+
+        if self.depth >= self.max_queue and not self._shed_lower_than(priority):
+            self.rejected += 1
+            raise AdmissionRejected(self.name, "queue full", self._retry_after(estimate))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), future)
+        heapq.heappush(self._heap, entry)
+        self._queued[priority] += 1
+        enqueued = time.perf_counter()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # Cancelled while queued (client gone, deadline); release() skips the entry
+                self._queued[priority] -= 1
+            elif future.exception() is None:
+                # Slot was granted just before the client went away
+                self.release()
+            raise
+
+        self._record_wait(priority, (time.perf_counter() - enqueued) * 1000)
+
+    def _shed_lower_than(self, priority: int) -> bool:
+        """Reject the newest waiter of the lowest priority below `priority`"""
+        victims = [e for e in self._heap if not e[2].done() and e[0] > priority]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda e: (e[0], e[1]))
+        self._queued[victim[0]] -= 1
+        self.shed += 1
+        victim[2].set_exception(AdmissionRejected(
+            self.name, "shed for higher-priority request",
+            self._retry_after(self.estimate_wait_ms(victim[0]))
+        ))
+        return True
+
+    def release(self, service_ms: float = None):
+        """Free a slot and hand it to the highest-priority waiter"""
+        if service_ms is not None:
+            self._service_ms += self._alpha * (service_ms - self._service_ms)
+
+        self._active -= 1
+        while self._heap:
+            priority, _, future = heapq.heappop(self._heap)
+            if future.done():
+                # Cancelled or shed; already taken off _queued
+                continue
+            self._queued[priority] -= 1
+            self._active += 1
+            future.set_result(None)
+            break
+
+    @asynccontextmanager
+    async def slot(self, priority: int, max_wait_ms: float = None):
+        """Hold a slot for the duration of the block"""
+        await self.acquire(priority, max_wait_ms)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release((time.perf_counter() - started) * 1000)
+
+    def _record_wait(self, priority: int, wait_ms: float):
+        self.admitted += 1
+        self._wait_total_ms[priority] += wait_ms
+        self._wait_count[priority] += 1
+        self._wait_max_ms[priority] = max(self._wait_max_ms[priority], wait_ms)
+
+    def get_stats(self) -> dict:
+        """Queue depth and wait-time metrics"""
+        return {
+            'active': self._active,
+            'concurrency': self.concurrency,
+            'queue_depth': self.depth,
+            'queue_depth_by_priority': {
+                PRIORITY_NAMES[p]: n for p, n in self._queued.items()
+            },
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'shed': self.shed,
+            'est_service_ms': round(self._service_ms, 2),
+            'wait_ms_by_priority': {
+                PRIORITY_NAMES[p]: {
+                    'avg': round(self._wait_total_ms[p] / self._wait_count[p], 2) if self._wait_count[p] else 0.0,
+                    'max': round(self._wait_max_ms[p], 2),
+                }
+                for p in PRIORITY_NAMES
+            },
+        }
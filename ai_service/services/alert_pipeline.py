@@ -0,0 +1,420 @@
+"""Streaming pipeline from collector alerts to scored, deduplicated, stored alerts"""
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_SIZE, PIPELINE_BATCH_WAIT_SECONDS,
+    PIPELINE_SUBMIT_TIMEOUT_SECONDS, PIPELINE_DEDUPE_WINDOW, PIPELINE_DEDUPE_HOURS,
+    PIPELINE_STAGE_RETRIES, PIPELINE_RETRY_BACKOFF_SECONDS
+)
+from data_collectors.geocoder import get_geocoder
+from data_collectors.seen_items import item_id
+
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+ALERT_TYPES = ('general', 'weather', 'evacuation', 'disaster')
+NATIONWIDE = 'Toàn quốc'
+
+
+def normalize_alert(item: Dict, source: str) -> Optional[Dict]:
+    """
+    Collector alert dict in the shape the scorer and /score expect
+
+    Fills alert_id, clamps severity / alert_type to the known values and
+    makes created_at a naive local ISO timestamp. Returns None for items
+    without any text.
+    """
+    content = (item.get('content') or item.get('title') or '').strip()
+    if not content:
+        return None
+
+    try:
+        created_at = datetime.fromisoformat(str(item.get('created_at')).replace('Z', '+00:00'))
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone().replace(tzinfo=None)
+    except ValueError:
+        created_at = datetime.now()
+
+    alert_id = item.get('alert_id') or item.get('id') or item_id(source, created_at, item.get('link', ''), content)
+    severity = str(item.get('severity', '')).lower()
+    alert_type = str(item.get('alert_type', '')).lower()
+    try:
+        reliability = float(item.get('source_reliability', 1.0))
+    except (TypeError, ValueError):
+        reliability = 1.0
+
+    return {
+        **item,
+        'id': alert_id,
+        'alert_id': alert_id,
+        'source': item.get('source') or source,
+        'content': content,
+        'severity': severity if severity in SEVERITIES else 'medium',
+        'alert_type': alert_type if alert_type in ALERT_TYPES else 'general',
+        'province': item.get('province') or NATIONWIDE,
+        'created_at': created_at.isoformat(),
+        'source_reliability': reliability,
+    }
+
+
+class PipelineStage:
+    """Throughput counters of one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.received = 0
+        self.emitted = 0
+        self.dropped = 0  # filtered out (invalid, duplicate) or rejected on a full queue
+        self.errors = 0  # items in failed attempts (retried)
+        self.dead_lettered = 0
+        self.batches = 0
+        self.busy_s = 0.0
+        self.last_error = None
+
+    def get_stats(self, uptime_s: float, queue_depth: Optional[int]) -> dict:
+        return {
+            'received': self.received,
+            'emitted': self.emitted,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'dead_lettered': self.dead_lettered,
+            'batches': self.batches,
+            'avg_batch': round(self.received / self.batches, 1) if self.batches else 0.0,
+            'per_second': round(self.emitted / uptime_s, 3) if uptime_s > 0 else 0.0,
+            'busy_ms_per_item': round(self.busy_s * 1000 / self.received, 2) if self.received else 0.0,
+            'queue_depth': queue_depth,
+            'last_error': self.last_error,
+        }
+
+
+class AlertPipeline:
+    """
+    Collector alerts -> normalize -> dedupe -> score -> persist
+
+    Normalizing also places alerts without coordinates at their district
+    or province centroid (offline gazetteer).
+
+    `submit()` (the ingestion scheduler's sink) is the fetch stage. Each
+    later stage is one thread reading a bounded queue: when a stage falls
+    behind, its queue fills, the stage before it blocks on put, and in the
+    end the collector workers block in `submit()` (for at most
+    `submit_timeout`; the items not taken are left to the scheduler's
+    next poll).
+
+    No alert is lost once taken: a batch whose stage fails is retried
+    `retries` times and then stored as dead letters, which are queued
+    again on the next start. Collector items are marked in `seen_filter`
+    only once stored (or discarded as invalid or duplicate).
+
+    The dedupe and score stages take up to `batch_size` alerts at a time
+    (waiting at most `batch_wait` to fill a batch), so the embedding model
+    and the scorer each run once per batch. New alerts are compared
+    with each other and with a window of recently accepted alerts, which
+    is reloaded from the database on start.
+
+    On stop, stages finish what is queued before exiting.
+    """
+
+    def __init__(
+        self,
+        scorer,
+        duplicate_detector,
+        feature_extractor,
+        data_collector,
+        sink: Callable[[Dict], None] = None,
+        geocoder=None,
+        seen_filter=None,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        batch_size: int = PIPELINE_BATCH_SIZE,
+        batch_wait: float = PIPELINE_BATCH_WAIT_SECONDS,
+        submit_timeout: float = PIPELINE_SUBMIT_TIMEOUT_SECONDS,
+        dedupe_window: int = PIPELINE_DEDUPE_WINDOW,
+        dedupe_hours: float = PIPELINE_DEDUPE_HOURS,
+        retries: int = PIPELINE_STAGE_RETRIES,
+        retry_backoff: float = PIPELINE_RETRY_BACKOFF_SECONDS
+    ):
+        """
+        Args:
+            scorer: Model with predict_batch(features_list) -> scores
+            duplicate_detector: Detector with batch_find_duplicates(new, existing)
+            feature_extractor: FeatureExtractor (extract_features(alert))
+            data_collector: DataCollector the alerts, predictions and checks are stored in
+            sink: Called with every persisted alert (e.g. SSE publishing)
+            geocoder: OfflineGeocoder filling missing coordinates (default: shared one)
+            seen_filter: SeenItemFilter the collectors' emitted items are marked in once handled
+        """
+        self.scorer = scorer
+        self.duplicate_detector = duplicate_detector
+        self.feature_extractor = feature_extractor
+        self.data_collector = data_collector
+        self.sink = sink
+        self.geocoder = geocoder or get_geocoder()
+        self.seen_filter = seen_filter
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.submit_timeout = submit_timeout
+        self.dedupe_hours = dedupe_hours
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+        self.stages = {name: PipelineStage(name) for name in ('fetch', 'normalize', 'dedupe', 'score', 'persist')}
+        self._queues = {name: queue.Queue(maxsize=queue_size) for name in ('normalize', 'dedupe', 'score', 'persist')}
+        self._recent = deque(maxlen=dedupe_window)  # (created_at, alert) of accepted alerts
+        self._submit_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.started_at = None
+
+    # ----- Lifecycle -----
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        self._load_recent()
+        self._requeue_dead_letters()
+        self.started_at = time.monotonic()
+        upstream = None
+        for name, handler, outbox, batch_size in (
+            ('normalize', self._normalize, 'dedupe', self.batch_size),
+            ('dedupe', self._dedupe, 'score', self.batch_size),
+            ('score', self._score, 'persist', self.batch_size),
+            ('persist', self._persist, None, self.batch_size),
+        ):
+            thread = threading.Thread(
+                target=self._run_stage, args=(name, handler, outbox, upstream, batch_size),
+                name=f"pipeline-{name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+            upstream = thread
+        print(f"[Pipeline] Started ({len(self._recent)} recent alerts in the dedupe window)")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop accepting alerts and let the stages drain their queues"""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def _load_recent(self):
+        try:
+            alerts = self.data_collector.get_recent_ingested_alerts(hours=self.dedupe_hours, limit=self._recent.maxlen)
+        except Exception as e:
+            print(f"[Pipeline] Could not load recent alerts: {e}")
+            return
+        self._recent.clear()
+        for alert in reversed(alerts):
+            try:
+                self._recent.append((datetime.fromisoformat(alert['created_at']), alert))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def _requeue_dead_letters(self):
+        """Queue alerts dead-lettered in an earlier run for another pass"""
+        inbox = self._queues['normalize']
+        try:
+            items = self.data_collector.take_dead_letters(limit=max(inbox.maxsize // 2, 1))
+        except Exception as e:
+            print(f"[Pipeline] Could not load dead letters: {e}")
+            return
+        for item in items:
+            inbox.put(item)
+        if items:
+            print(f"[Pipeline] Re-queued {len(items)} dead-lettered alerts")
+
+    # ----- Fetch -----
+
+    def submit(self, source: str, items: List[Dict]) -> int:
+        """
+        Feed collector alerts into the pipeline (thread-safe)
+
+        Blocks while the pipeline is full. Returns the number accepted:
+        always the first ones, in order; the rest were not taken and
+        should be offered again.
+        """
+        stage = self.stages['fetch']
+        inbox = self._queues['normalize']
+        accepted = 0
+        for item in items:
+            if self._stop.is_set():
+                break
+            try:
+                inbox.put((source, item), timeout=self.submit_timeout)
+            except queue.Full:
+                break
+            accepted += 1
+        with self._submit_lock:
+            stage.received += len(items)
+            stage.emitted += accepted
+            stage.dropped += len(items) - accepted
+        if accepted < len(items):
+            print(f"[Pipeline] Rejected {len(items) - accepted} alerts from {source} (pipeline full or stopped)")
+        return accepted
+
+    # ----- Stages -----
+
+    def _take_batch(self, inbox: queue.Queue, batch_size: int) -> list:
+        """Up to batch_size items: waits briefly for the first, then up to batch_wait for the rest"""
+        try:
+            batch = [inbox.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(inbox.get(timeout=remaining) if remaining > 0 else inbox.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_stage(self, name: str, handler, outbox: Optional[str], upstream: Optional[threading.Thread], batch_size: int):
+        stage = self.stages[name]
+        inbox = self._queues[name]
+        while True:
+            batch = self._take_batch(inbox, batch_size)
+            if not batch:
+                # Exit once stopping, the upstream stage has exited and nothing is left
+                if self._stop.is_set() and (upstream is None or not upstream.is_alive()) and inbox.empty():
+                    return
+                continue
+
+            started = time.perf_counter()
+            results = None
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(self.retry_backoff * attempt)
+                try:
+                    results = handler(batch)
+                    break
+                except Exception as e:
+                    stage.errors += len(batch)
+                    stage.last_error = f"{type(e).__name__}: {e}"[:200]
+                    print(f"[Pipeline] {name} failed on {len(batch)} alerts (attempt {attempt + 1}): {stage.last_error}")
+            stage.busy_s += time.perf_counter() - started
+            stage.received += len(batch)
+            stage.batches += 1
+            if results is None:
+                self._dead_letter(name, batch, stage)
+                continue
+            stage.emitted += len(results)
+            stage.dropped += len(batch) - len(results)
+            if outbox is not None:
+                for result in results:
+                    self._queues[outbox].put(result)
+
+    def _dead_letter(self, name: str, batch: list, stage: PipelineStage):
+        """Store a batch that kept failing so the next start processes it again"""
+        if name == 'normalize':
+            items = batch
+        else:
+            alerts = [entry[0] for entry in batch] if name == 'persist' else batch
+            items = [(alert.get('source'), alert) for alert in alerts]
+        if self.data_collector.log_dead_letters(name, items, stage.last_error):
+            stage.dead_lettered += len(items)
+            print(f"[Pipeline] Dead-lettered {len(items)} alerts from {name}")
+        else:
+            print(f"[Pipeline] Lost {len(items)} alerts from {name}: could not store dead letters")
+
+    def _mark_seen(self, alerts: list):
+        """Record collector items as handled so they are not fetched again"""
+        if self.seen_filter is None:
+            return
+        try:
+            self.seen_filter.mark_items(alerts)
+        except Exception as e:
+            # Not fatal: a re-fetched item is caught by dedupe (same alert_id)
+            print(f"[Pipeline] Could not mark {len(alerts)} alerts seen: {e}")
+
+    def _normalize(self, batch: list) -> list:
+        normalized, invalid = [], []
+        for source, item in batch:
+            alert = normalize_alert(item, source)
+            if alert is None:
+                invalid.append(item)
+            else:
+                normalized.append(self.geocoder.geocode_alert(alert))
+        self._mark_seen(invalid)
+        return normalized
+
+    def _dedupe(self, batch: list) -> list:
+        """Drop alerts duplicating a recent alert or an earlier one in the batch"""
+        cutoff = datetime.now() - timedelta(hours=self.dedupe_hours)
+        while self._recent and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+        recent = [alert for created_at, alert in self._recent if created_at >= cutoff]
+        recent_ids = {alert['alert_id'] for alert in recent}
+
+        # One model call for the whole batch, against recent alerts and the batch itself
+        matches = self.duplicate_detector.batch_find_duplicates(batch, recent + batch)
+
+        unique, duplicates, accepted_ids, checks = [], [], set(), []
+        for alert in batch:
+            if alert['alert_id'] in recent_ids or alert['alert_id'] in accepted_ids:
+                checks.append((alert['alert_id'], True, alert['alert_id'], 1.0))
+                duplicates.append(alert)
+                continue
+            earlier = [
+                match for match in matches.get(alert['id'], [])
+                if match['alert']['alert_id'] != alert['alert_id']
+                and (match['alert']['alert_id'] in recent_ids or match['alert']['alert_id'] in accepted_ids)
+            ]
+            if earlier:
+                checks.append((alert['alert_id'], True, earlier[0]['alert']['alert_id'], earlier[0]['similarity']))
+                duplicates.append(alert)
+                continue
+            checks.append((alert['alert_id'], False, None, None))
+            accepted_ids.add(alert['alert_id'])
+            unique.append(alert)
+
+        # Only now update state, so a failed attempt can be retried as is
+        self._recent.extend((datetime.fromisoformat(alert['created_at']), alert) for alert in unique)
+        self.data_collector.log_duplicate_checks(checks)
+        self._mark_seen(duplicates)
+        return unique
+
+    def _score(self, batch: list) -> list:
+        features = [self.feature_extractor.extract_features(alert) for alert in batch]
+        scores = self.scorer.predict_batch(features)
+        for alert, score in zip(batch, scores):
+            alert['priority_score'] = score
+        return list(zip(batch, features))
+
+    def _persist(self, batch: list) -> list:
+        alerts = [alert for alert, _ in batch]
+        if not self.data_collector.log_ingested_alerts(alerts):
+            raise RuntimeError("could not store ingested alerts")
+        self.data_collector.log_predictions(
+            [(alert['alert_id'], features, alert['priority_score']) for alert, features in batch]
+        )
+        self._mark_seen(alerts)
+        if self.sink is not None:
+            for alert in alerts:
+                try:
+                    self.sink(alert)
+                except Exception as e:
+                    print(f"[Pipeline] Sink failed for {alert['alert_id']}: {e}")
+        return alerts
+
+    # ----- Stats -----
+
+    def get_stats(self) -> dict:
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        depths = {name: q.qsize() for name, q in self._queues.items()}
+        return {
+            'running': any(thread.is_alive() for thread in self._threads),
+            'uptime_s': round(uptime, 1),
+            'dedupe_window': len(self._recent),
+            'stages': {
+                name: stage.get_stats(uptime, depths.get(name))
+                for name, stage in self.stages.items()
+            },
+        }
@@ -79,12 +79,40 @@ class DataCollector:
             )
         ''')
         
+        # Ingested alerts table - collector alerts that passed the ingestion pipeline
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingested_alerts (
+                alert_id TEXT PRIMARY KEY,
+                source TEXT,
+                province TEXT,
+                alert_type TEXT,
+                severity TEXT,
+                priority_score REAL,
+                created_at TEXT,
+                payload TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Dead letters - pipeline batches that kept failing, re-queued on start
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pipeline_dead_letters (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stage TEXT,
+                source TEXT,
+                error TEXT,
+                payload TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         # Create indexes for faster queries
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_predictions_alert ON predictions(alert_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_engagement_alert ON engagement(alert_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_engagement_user ON engagement(user_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions(timestamp)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_engagement_timestamp ON engagement(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ingested_timestamp ON ingested_alerts(timestamp)')
         
         conn.commit()
         conn.close()
@@ -127,6 +155,33 @@ class DataCollector:
         finally:
             conn.close()
     
+    def log_predictions(self, predictions: list, model_version: str = 'v1'):
+        """
+        Log several predictions in one transaction
+        
+        Args:
+            predictions: (alert_id, features, predicted_score) tuples
+            model_version: Model version string
+        """
+        if not predictions:
+            return
+        conn = sqlite3.connect(self.db_path)
+        
+        try:
+            conn.executemany('''
+                INSERT OR IGNORE INTO predictions 
+                (alert_id, features, predicted_score, model_version)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (alert_id, json.dumps(features), predicted_score, model_version)
+                for alert_id, features, predicted_score in predictions
+            ])
+            conn.commit()
+        except Exception as e:
+            print(f"[DataCollector] Error logging predictions: {e}")
+        finally:
+            conn.close()
+    
     def log_engagement(
         self,
         alert_id: str,
@@ -189,6 +244,128 @@ class DataCollector:
         finally:
             conn.close()
     
+    def log_duplicate_checks(self, checks: list):
+        """
+        Log several duplicate detection results in one transaction
+        
+        Args:
+            checks: (alert_id, is_duplicate, best_match_id, similarity) tuples
+        """
+        if not checks:
+            return
+        conn = sqlite3.connect(self.db_path)
+        
+        try:
+            conn.executemany('''
+                INSERT INTO duplicate_checks 
+                (alert_id, is_duplicate, best_match_id, similarity)
+                VALUES (?, ?, ?, ?)
+            ''', checks)
+            conn.commit()
+        except Exception as e:
+            print(f"[DataCollector] Error logging duplicate checks: {e}")
+        finally:
+            conn.close()
+    
+    def log_ingested_alerts(self, alerts: list):
+        """
+        Store scored collector alerts (one transaction)
+        
+        Args:
+            alerts: Alert dicts with 'alert_id' and 'priority_score'
+                    (fields starting with '_' are not stored)
+            
+        Returns:
+            Whether the alerts were stored
+        """
+        if not alerts:
+            return True
+        conn = sqlite3.connect(self.db_path)
+        
+        try:
+            conn.executemany('''
+                INSERT OR REPLACE INTO ingested_alerts 
+                (alert_id, source, province, alert_type, severity, priority_score, created_at, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    alert['alert_id'], alert.get('source'), alert.get('province'),
+                    alert.get('alert_type'), alert.get('severity'), alert.get('priority_score'),
+                    alert.get('created_at'), json.dumps(
+                        {k: v for k, v in alert.items() if not k.startswith('_')}, ensure_ascii=False, default=str
+                    )
+                )
+                for alert in alerts
+            ])
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"[DataCollector] Error logging ingested alerts: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    def get_recent_ingested_alerts(self, hours: float = 48, limit: int = 500) -> list:
+        """Ingested alerts stored in the last `hours`, newest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT payload FROM ingested_alerts
+            WHERE timestamp >= datetime('now', '-' || ? || ' hours')
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (hours, limit))
+        
+        results = cursor.fetchall()
+        conn.close()
+        
+        return [json.loads(row[0]) for row in results]
+    
+    def log_dead_letters(self, stage: str, items: list, error: str) -> bool:
+        """
+        Store pipeline items that could not be processed
+        
+        Args:
+            stage: Pipeline stage that failed
+            items: (source, alert dict) pairs
+            error: Last error message
+        """
+        if not items:
+            return True
+        conn = sqlite3.connect(self.db_path)
+        
+        try:
+            conn.executemany('''
+                INSERT INTO pipeline_dead_letters (stage, source, error, payload)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (stage, source, error, json.dumps(item, ensure_ascii=False, default=str))
+                for source, item in items
+            ])
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"[DataCollector] Error logging dead letters: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    def take_dead_letters(self, limit: int = 1000) -> list:
+        """Remove and return up to `limit` dead letters, oldest first, as (source, alert dict) pairs"""
+        conn = sqlite3.connect(self.db_path)
+        
+        try:
+            rows = conn.execute('''
+                SELECT id, source, payload FROM pipeline_dead_letters ORDER BY id LIMIT ?
+            ''', (limit,)).fetchall()
+            conn.executemany("DELETE FROM pipeline_dead_letters WHERE id = ?", [(row[0],) for row in rows])
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return [(source, json.loads(payload)) for _, source, payload in rows]
+    
     def log_model_performance(
         self,
         model_name: str,
@@ -345,7 +522,7 @@ class DataCollector:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        tables = ['predictions', 'engagement', 'duplicate_checks']
+        tables = ['predictions', 'engagement', 'duplicate_checks', 'ingested_alerts', 'pipeline_dead_letters']
         
         for table in tables:
             cursor.execute(f'''
@@ -0,0 +1,161 @@
+"""Overload detection with hysteresis for automatic quality degradation"""
+import os
+import threading
+import time
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    DEGRADE_ENABLED, DEGRADE_CPU_HIGH, DEGRADE_CPU_LOW,
+    DEGRADE_QUEUE_HIGH, DEGRADE_QUEUE_LOW,
+    DEGRADE_RECOVER_SECONDS, DEGRADE_CHECK_INTERVAL
+)
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+
+def sample_cpu_percent():
+    """
+    System CPU utilisation in percent, or None if it cannot be measured
+
+    Uses psutil when installed, otherwise the 1-minute load average
+    normalised by core count (Unix only).
+    """
+    if HAS_PSUTIL:
+        return psutil.cpu_percent(interval=None)
+    try:
+        return min(100.0, os.getloadavg()[0] / (os.cpu_count() or 1) * 100)
+    except (AttributeError, OSError):
+        return None
+
+
+class OverloadMonitor:
+    """
+    Decides when the service should trade accuracy for latency
+
+    Enters degraded mode as soon as CPU or total queue depth reaches its
+    high watermark. Leaves it only after both have stayed below their low
+    watermarks for `recover_seconds`, so the service does not flap between
+    modes while load hovers around a single threshold.
+
+    Load is sampled lazily, at most once per `check_interval`, from the
+    request path; there is no background thread.
+
+    Usage:
+        if overload_monitor.is_degraded():
+            ... cheap path ...
+    """
+
+    def __init__(
+        self,
+        depth_sources: list = None,
+        enabled: bool = DEGRADE_ENABLED,
+        cpu_high: float = DEGRADE_CPU_HIGH,
+        cpu_low: float = DEGRADE_CPU_LOW,
+        queue_high: int = DEGRADE_QUEUE_HIGH,
+        queue_low: int = DEGRADE_QUEUE_LOW,
+        recover_seconds: float = DEGRADE_RECOVER_SECONDS,
+        check_interval: float = DEGRADE_CHECK_INTERVAL,
+        cpu_sampler=sample_cpu_percent
+    ):
+        """
+        Args:
+            depth_sources: Callables returning current queue depths
+            cpu_sampler: Callable returning CPU percent (or None)
+        """
+        self.depth_sources = list(depth_sources or [])
+        self.enabled = enabled
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.recover_seconds = recover_seconds
+        self.check_interval = check_interval
+        self.cpu_sampler = cpu_sampler
+
+        self._lock = threading.Lock()
+        self._degraded = False
+        self._last_check = 0.0
+        self._calm_since = None
+        self._degraded_since = None
+        self._cpu = None
+        self._depth = 0
+
+        self.transitions = 0
+        self.degraded_responses = {}
+
+    def _queue_depth(self) -> int:
+        return sum(source() for source in self.depth_sources)
+
+    def is_degraded(self) -> bool:
+        """Current mode, re-evaluated if the last sample is stale"""
+        if not self.enabled:
+            return False
+
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return self._degraded
+
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return self._degraded
+            self._last_check = now
+            self._cpu = self.cpu_sampler()
+            self._depth = self._queue_depth()
+            self._update(now, self._cpu, self._depth)
+            return self._degraded
+
+    def _update(self, now: float, cpu, depth: int):
+        """Apply the hysteresis rule to one load sample"""
+        cpu_value = cpu if cpu is not None else 0.0
+
+        if not self._degraded:
+            if cpu_value >= self.cpu_high or depth >= self.queue_high:
+                self._degraded = True
+                self._degraded_since = now
+                self._calm_since = None
+                self.transitions += 1
+                print(f"[Overload] Degraded mode ON (cpu={cpu}, queue_depth={depth})")
+            return
+
+        if cpu_value < self.cpu_low and depth < self.queue_low:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recover_seconds:
+                self._degraded = False
+                self._degraded_since = None
+                self._calm_since = None
+                self.transitions += 1
+                print(f"[Overload] Degraded mode OFF (cpu={cpu}, queue_depth={depth})")
+        else:
+            self._calm_since = None
+
+    def record(self, endpoint: str):
+        """Count a response served in degraded mode"""
+        with self._lock:
+            self.degraded_responses[endpoint] = self.degraded_responses.get(endpoint, 0) + 1
+
+    def get_stats(self) -> dict:
+        """Current mode, last load sample and degraded-response counts"""
+        return {
+            'enabled': self.enabled,
+            'degraded': self._degraded,
+            'degraded_for_s': (
+                round(time.monotonic() - self._degraded_since, 1)
+                if self._degraded_since is not None else 0.0
+            ),
+            'cpu_percent': self._cpu,
+            'queue_depth': self._depth,
+            'thresholds': {
+                'cpu': [self.cpu_low, self.cpu_high],
+                'queue': [self.queue_low, self.queue_high],
+                'recover_seconds': self.recover_seconds,
+            },
+            'transitions': self.transitions,
+            'degraded_responses': dict(self.degraded_responses),
+        }
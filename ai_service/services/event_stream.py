@@ -0,0 +1,229 @@
+"""Server-sent events broadcaster for high-priority alerts and risk changes"""
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import SSE_QUEUE_SIZE, SSE_REPLAY_BUFFER
+from utils.serialization import dumps
+
+
+class _Subscriber:
+    """One connected client: its filters, queue and owning event loop"""
+
+    def __init__(self, loop, province: Optional[str], hazard_type: Optional[str], event_types: Optional[set]):
+        self.loop = loop
+        self.province = province
+        self.hazard_type = hazard_type
+        self.event_types = event_types
+        self.queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.replay = []  # missed frames to send before the queue (Last-Event-ID)
+        self.closed = False
+
+    def matches(self, event_type: str, data: dict) -> bool:
+        """
+        Check the event against this subscriber's filters
+
+        A filter only applies when the event carries that field, so
+        alert events (no hazard_type) still reach hazard-filtered clients.
+        """
+        if self.event_types and event_type not in self.event_types:
+            return False
+        if self.province and data.get('province') not in (None, self.province):
+            return False
+        if self.hazard_type and data.get('hazard_type') not in (None, self.hazard_type):
+            return False
+        return True
+
+
+class EventBroadcaster:
+    """
+    Fan-out of server-side events to SSE clients
+
+    Each event is serialized once into an SSE frame and pushed to the
+    queue of every matching subscriber, so N clients cost one
+    computation plus N queue puts. Recent frames are kept in a replay
+    buffer so reconnecting clients can resume with Last-Event-ID.
+
+    A subscriber whose queue overflows is disconnected rather than
+    silently losing events; it reconnects and replays what it missed.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._replay = deque(maxlen=SSE_REPLAY_BUFFER)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._risk_levels = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+
+    def subscribe(
+        self,
+        province: str = None,
+        hazard_type: str = None,
+        event_types: set = None,
+        last_event_id: int = None
+    ) -> _Subscriber:
+        """
+        Register a subscriber (must be called from the event loop)
+
+        With last_event_id, the frames it missed are captured in the same
+        critical section as the registration: every event is then either
+        in subscriber.replay or delivered to the queue, never both.
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop(), province, hazard_type, event_types)
+        with self._lock:
+            if last_event_id is not None:
+                subscriber.replay = self._replay_frames(last_event_id, subscriber)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        """Remove a subscriber"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        subscriber.closed = True
+
+    def _replay_frames(self, last_event_id: int, subscriber: _Subscriber) -> list:
+        return [
+            frame for event_id, event_type, data, frame in self._replay
+            if event_id > last_event_id and subscriber.matches(event_type, data)
+        ]
+
+    def replay_since(self, last_event_id: int, subscriber: _Subscriber) -> list:
+        """Frames after last_event_id that match the subscriber's filters"""
+        with self._lock:
+            return self._replay_frames(last_event_id, subscriber)
+
+    def publish(self, event_type: str, data: dict) -> int:
+        """
+        Publish an event to all matching subscribers (thread-safe)
+
+        Args:
+            event_type: SSE event name, e.g. 'alert' or 'risk_change'
+            data: JSON-serializable event payload
+
+        Returns:
+            Event id
+        """
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            frame = (
+                f"id: {event_id}\nevent: {event_type}\ndata: ".encode('utf-8')
+                + dumps(data) + b"\n\n"
+            )
+            self._replay.append((event_id, event_type, data, frame))
+            targets = [s for s in self._subscribers if s.matches(event_type, data)]
+            self.published += 1
+
+        for subscriber in targets:
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is subscriber.loop:
+                self._deliver(subscriber, frame)
+            else:
+                subscriber.loop.call_soon_threadsafe(self._deliver, subscriber, frame)
+
+        return event_id
+
+    def _deliver(self, subscriber: _Subscriber, frame: bytes):
+        """Queue a frame for one subscriber, disconnecting it on overflow"""
+        if subscriber.closed:
+            return
+        try:
+            subscriber.queue.put_nowait(frame)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            subscriber.closed = True
+            self.dropped_subscribers += 1
+            print("[EventStream] Slow subscriber disconnected (queue full)")
+
+    def publish_alert(self, alert: dict, priority_score: float):
+        """Publish a newly scored high-priority alert"""
+        return self.publish('alert', {
+            'alert_id': alert.get('alert_id'),
+            'priority_score': round(priority_score, 2),
+            'severity': alert.get('severity'),
+            'alert_type': alert.get('alert_type'),
+            'province': alert.get('province'),
+            'district': alert.get('district'),
+            'lat': alert.get('lat'),
+            'lng': alert.get('lng'),
+            'content': alert.get('content'),
+            'created_at': alert.get('created_at'),
+        })
+
+    def record_risk(self, key: tuple, province: str, hazard_type: str, risk_level: int, **extra) -> bool:
+        """
+        Track a computed risk level and publish when it changes
+
+        Args:
+            key: Identity of the area, e.g. a rounded (lat, lng) cell
+            province: Province name (for subscriber filtering)
+            hazard_type: flood, landslide or storm
+            risk_level: Newly computed risk level (1-5)
+            **extra: Additional fields for the event payload
+
+        Returns:
+            True if a risk_change event was published
+        """
+        key = (key, hazard_type)
+        with self._lock:
+            previous = self._risk_levels.get(key)
+            self._risk_levels[key] = risk_level
+        if previous is None or previous == risk_level:
+            return False
+
+        self.publish('risk_change', {
+            'province': province,
+            'hazard_type': hazard_type,
+            'previous_risk_level': previous,
+            'risk_level': risk_level,
+            'changed_at': datetime.now().isoformat(),
+            **extra
+        })
+        return True
+
+    async def stream(self, subscriber: _Subscriber, request, heartbeat_seconds: float):
+        """
+        Async generator of SSE frames for one client
+
+        Sends the frames replayed at subscribe() first (if Last-Event-ID
+        was given), then live frames, with comment heartbeats to keep
+        proxies from timing out.
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            for frame in subscriber.replay:
+                yield frame
+            subscriber.replay = []
+
+            while not subscriber.closed:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat_seconds)
+                    yield frame
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": heartbeat\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def get_stats(self) -> dict:
+        """Get broadcaster statistics"""
+        return {
+            'subscribers': len(self._subscribers),
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped_subscribers': self.dropped_subscribers,
+            'tracked_risk_areas': len(self._risk_levels),
+        }
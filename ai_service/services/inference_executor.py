@@ -0,0 +1,155 @@
+"""Inference Executor: per-model thread budgets for CPU-bound calls"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    INFERENCE_OFFLOAD, INFERENCE_THREADS,
+    INFERENCE_BLAS_THREADS, TORCH_NUM_THREADS
+)
+
+try:
+    from threadpoolctl import threadpool_limits
+    HAS_THREADPOOLCTL = True
+except ImportError:
+    HAS_THREADPOOLCTL = False
+
+
+class InferenceExecutor:
+    """
+    Central executor for model inference inside async handlers
+
+    Each model gets its own bounded thread pool, so a burst of duplicate
+    checks cannot starve scoring, and the event loop is never blocked by
+    sklearn or torch. Native thread pools (BLAS/OpenMP, torch intra-op)
+    are capped so that pool workers do not each spawn one thread per core.
+
+    Usage:
+        score = await executor.run('scorer', scorer.predict, features)
+    """
+
+    def __init__(self, budgets: dict = None, offload: bool = None):
+        self.budgets = dict(budgets or INFERENCE_THREADS)
+        self.offload = INFERENCE_OFFLOAD if offload is None else offload
+        self._pools = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._native_limits = None
+
+        self.configure_native_threads()
+        print(f"[InferenceExecutor] Budgets: {self.budgets} (offload={'on' if self.offload else 'off'})")
+
+    def configure_native_threads(self):
+        """Cap BLAS/OpenMP and torch threads process-wide"""
+        if HAS_THREADPOOLCTL:
+            self._native_limits = threadpool_limits(limits=INFERENCE_BLAS_THREADS)
+
+        try:
+            import torch
+            torch.set_num_threads(TORCH_NUM_THREADS)
+        except ImportError:
+            pass
+
+    @staticmethod
+    def _init_worker():
+        """OpenMP thread count is per calling thread, so set it in each worker"""
+        if HAS_THREADPOOLCTL:
+            threadpool_limits(limits=INFERENCE_BLAS_THREADS, user_api='openmp')
+
+    def _get_pool(self, model_name: str) -> ThreadPoolExecutor:
+        """Get (or lazily create) the thread pool for a model"""
+        pool = self._pools.get(model_name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(model_name)
+                if pool is None:
+                    workers = max(1, self.budgets.get(model_name, 1))
+                    pool = ThreadPoolExecutor(
+                        max_workers=workers,
+                        thread_name_prefix=f"inference-{model_name}",
+                        initializer=self._init_worker
+                    )
+                    self._pools[model_name] = pool
+                    self._stats[model_name] = {
+                        'workers': workers,
+                        'queued': 0,
+                        'running': 0,
+                        'completed': 0,
+                        'errors': 0,
+                        'total_wait_ms': 0.0,
+                        'total_run_ms': 0.0,
+                    }
+        return pool
+
+    async def run(self, model_name: str, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the model's thread pool
+
+        Args:
+            model_name: Budget key, e.g. 'scorer', 'duplicate', 'hazard'
+            fn: Blocking callable
+
+        Returns:
+            Result of fn
+        """
+        if not self.offload:
+            return fn(*args, **kwargs)
+
+        pool = self._get_pool(model_name)
+        stats = self._stats[model_name]
+        submitted = time.perf_counter()
+
+        def timed_call():
+            started = time.perf_counter()
+            with self._lock:
+                stats['queued'] -= 1
+                stats['running'] += 1
+                stats['total_wait_ms'] += (started - submitted) * 1000
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    stats['errors'] += 1
+                raise
+            finally:
+                with self._lock:
+                    stats['running'] -= 1
+                    stats['completed'] += 1
+                    stats['total_run_ms'] += (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            stats['queued'] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, timed_call)
+
+    def queue_depth(self) -> int:
+        """Calls waiting for a worker, across all models"""
+        with self._lock:
+            return sum(stats['queued'] for stats in self._stats.values())
+
+    def get_stats(self) -> dict:
+        """Per-model queue depth and average wait/run times"""
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                completed = stats['completed'] or 1
+                result[name] = {
+                    'workers': stats['workers'],
+                    'queued': stats['queued'],
+                    'running': stats['running'],
+                    'completed': stats['completed'],
+                    'errors': stats['errors'],
+                    'avg_wait_ms': round(stats['total_wait_ms'] / completed, 2),
+                    'avg_run_ms': round(stats['total_run_ms'] / completed, 2),
+                }
+            return result
+
+    def shutdown(self, wait: bool = True):
+        """Shut down all pools"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+        self._pools.clear()
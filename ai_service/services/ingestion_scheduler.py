@@ -0,0 +1,366 @@
+"""Concurrent polling scheduler for the alert collectors"""
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    INGESTION_WORKERS, INGESTION_HOST_CONCURRENCY, INGESTION_HOST_MIN_GAP_SECONDS,
+    INGESTION_BASE_INTERVAL_SECONDS, INGESTION_MIN_INTERVAL_SECONDS,
+    INGESTION_MAX_INTERVAL_SECONDS, INGESTION_SPEEDUP, INGESTION_SLOWDOWN
+)
+
+THROUGHPUT_WINDOW_SECONDS = 600
+
+
+class PollSource:
+    """
+    One pollable feed: a fetch callable returning alert dicts, the host it
+    talks to, and its adaptive interval and metrics
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[], List[Dict]],
+        host: str,
+        base_interval: float = INGESTION_BASE_INTERVAL_SECONDS,
+        min_interval: float = INGESTION_MIN_INTERVAL_SECONDS,
+        max_interval: float = INGESTION_MAX_INTERVAL_SECONDS,
+        remember: int = 2000
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.host = host
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(base_interval, min_interval), max_interval)
+        self.remember = remember
+
+        self.recent_keys = OrderedDict()  # items already seen from this source
+        self.new_item_times = deque()     # (monotonic time, count) for throughput
+        self.polls = 0
+        self.errors = 0
+        self.items = 0
+        self.new_items = 0
+        self.last_poll_at = None
+        self.last_new_item_at = None
+        self.last_error = None
+        self.last_poll_ms = 0.0
+        self.schedule_lag_ms = 0.0
+        self.ingest_lag_s = None  # EWMA of fetch time - item created_at
+
+    @staticmethod
+    def item_key(item: Dict) -> str:
+        return item.get('link') or item.get('id') or str(hash(item.get('content', '')))
+
+    def adapt(self, new_count: int, failed: bool = False):
+        """Shorten the interval while new items arrive, lengthen it when quiet or failing"""
+        factor = INGESTION_SLOWDOWN if failed or new_count == 0 else INGESTION_SPEEDUP
+        self.interval = min(max(self.interval * factor, self.min_interval), self.max_interval)
+
+    def throughput_per_minute(self, now: float) -> float:
+        while self.new_item_times and now - self.new_item_times[0][0] > THROUGHPUT_WINDOW_SECONDS:
+            self.new_item_times.popleft()
+        return sum(count for _, count in self.new_item_times) * 60.0 / THROUGHPUT_WINDOW_SECONDS
+
+    def get_stats(self, now: float) -> dict:
+        return {
+            'host': self.host,
+            'interval_s': round(self.interval, 1),
+            'polls': self.polls,
+            'errors': self.errors,
+            'items': self.items,
+            'new_items': self.new_items,
+            'new_per_minute': round(self.throughput_per_minute(now), 2),
+            'ingest_lag_s': round(self.ingest_lag_s, 1) if self.ingest_lag_s is not None else None,
+            'schedule_lag_ms': round(self.schedule_lag_ms, 1),
+            'last_poll_ms': round(self.last_poll_ms, 1),
+            'last_poll_at': self.last_poll_at,
+            'last_new_item_at': self.last_new_item_at,
+            'last_error': self.last_error,
+        }
+
+
+class HostLimiter:
+    """
+    Per-host politeness: at most `concurrency` polls in flight per host and
+    `min_gap` seconds between the end of one poll and the start of the next
+    """
+
+    def __init__(self, concurrency: int = INGESTION_HOST_CONCURRENCY, min_gap: float = INGESTION_HOST_MIN_GAP_SECONDS):
+        self.concurrency = concurrency
+        self.min_gap = min_gap
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._ready_at = {}
+
+    def try_acquire(self, host: str, now: float) -> bool:
+        with self._lock:
+            if self._in_flight.get(host, 0) >= self.concurrency or now < self._ready_at.get(host, 0.0):
+                return False
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            return True
+
+    def release(self, host: str, now: float):
+        with self._lock:
+            self._in_flight[host] = max(0, self._in_flight.get(host, 0) - 1)
+            self._ready_at[host] = now + self.min_gap
+
+    def ready_at(self, host: str) -> float:
+        with self._lock:
+            return self._ready_at.get(host, 0.0)
+
+
+class IngestionScheduler:
+    """
+    Long-running poller for all collector feeds
+
+    Each source has its own next-due time in a heap. A dispatcher thread
+    hands due sources to a worker pool when their host is free (see
+    HostLimiter); otherwise the source is re-queued for when the host
+    becomes ready, so a slow host never holds up the others.
+
+    After each poll the source's interval adapts (PollSource.adapt):
+    multiplied by INGESTION_SPEEDUP when new items appeared, by
+    INGESTION_SLOWDOWN when nothing new came or the poll failed, within
+    [min_interval, max_interval]. New items are passed to `sink(source
+    name, items)`, which may return how many of them (in order) it
+    accepted; items it did not accept are offered again on the next poll.
+    """
+
+    def __init__(
+        self,
+        sources: List[PollSource],
+        sink: Optional[Callable[[str, List[Dict]], None]] = None,
+        workers: int = INGESTION_WORKERS,
+        limiter: HostLimiter = None
+    ):
+        self.sources = {source.name: source for source in sources}
+        self.sink = sink
+        self.workers = workers
+        self.limiter = limiter or HostLimiter()
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._pool = None
+        self._thread = None
+        self.started_at = None
+
+    # ----- Polling -----
+
+    def poll(self, source: PollSource) -> List[Dict]:
+        """Fetch one source, record metrics and adapt its interval; returns new items"""
+        started = time.perf_counter()
+        fetched_at = datetime.now()
+        try:
+            items = source.fetch() or []
+        except Exception as e:
+            source.polls += 1
+            source.errors += 1
+            source.last_error = f"{type(e).__name__}: {e}"[:200]
+            source.last_poll_at = fetched_at.isoformat(timespec='seconds')
+            source.adapt(0, failed=True)
+            print(f"[Ingestion] {source.name} failed: {source.last_error}")
+            return []
+
+        new, keys = [], set()
+        for item in items:
+            key = source.item_key(item)
+            if key in source.recent_keys or key in keys:
+                continue
+            keys.add(key)
+            new.append(item)
+
+        for item in new:
+            try:
+                lag = (fetched_at - datetime.fromisoformat(item['created_at'])).total_seconds()
+            except (KeyError, TypeError, ValueError):
+                continue
+            lag = max(lag, 0.0)
+            source.ingest_lag_s = lag if source.ingest_lag_s is None else 0.8 * source.ingest_lag_s + 0.2 * lag
+
+        source.polls += 1
+        source.items += len(items)
+        source.new_items += len(new)
+        source.last_poll_at = fetched_at.isoformat(timespec='seconds')
+        source.last_poll_ms = (time.perf_counter() - started) * 1000
+        if new:
+            source.last_new_item_at = source.last_poll_at
+            source.new_item_times.append((time.monotonic(), len(new)))
+        source.adapt(len(new))
+
+        accepted = new
+        if new and self.sink is not None:
+            try:
+                count = self.sink(source.name, new)
+                if count is not None:
+                    accepted = new[:count]
+            except Exception as e:
+                print(f"[Ingestion] Sink failed for {source.name}: {e}")
+                accepted = []
+
+        # Only items the sink took are remembered; the rest come again next poll
+        for item in accepted:
+            source.recent_keys[source.item_key(item)] = True
+        while len(source.recent_keys) > source.remember:
+            source.recent_keys.popitem(last=False)
+        return new
+
+    def _run(self, source: PollSource):
+        try:
+            self.poll(source)
+        finally:
+            now = time.monotonic()
+            self.limiter.release(source.host, now)
+            self._schedule(source, now + source.interval)
+
+    # ----- Scheduling -----
+
+    def _schedule(self, source: PollSource, due: float):
+        with self._cond:
+            heapq.heappush(self._heap, (due, next(self._counter), source.name))
+            self._cond.notify()
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap))
+                if not due:
+                    timeout = self._heap[0][0] - now if self._heap else 1.0
+                    self._cond.wait(timeout=min(timeout, 1.0))
+                    continue
+
+            for due_at, _, name in due:
+                source = self.sources[name]
+                now = time.monotonic()
+                if self.limiter.try_acquire(source.host, now):
+                    source.schedule_lag_ms = (now - due_at) * 1000
+                    self._pool.submit(self._run, source)
+                else:
+                    # Host busy or cooling down: retry once it is ready
+                    with self._cond:
+                        heapq.heappush(self._heap, (
+                            max(self.limiter.ready_at(source.host), now + 0.05),
+                            next(self._counter), name
+                        ))
+
+    def start(self):
+        """Start polling every source (all due immediately)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingestion")
+        now = time.monotonic()
+        for source in self.sources.values():
+            self._schedule(source, now)
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._thread = threading.Thread(target=self._dispatch_loop, name="ingestion-scheduler", daemon=True)
+        self._thread.start()
+        print(f"[Ingestion] Started {len(self.sources)} sources on {self.workers} workers")
+
+    def stop(self):
+        """Stop dispatching and wait briefly for in-flight polls"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+            self._heap.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def get_stats(self) -> dict:
+        """Per-source lag, throughput and interval"""
+        now = time.monotonic()
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'started_at': self.started_at,
+            'sources': {name: source.get_stats(now) for name, source in self.sources.items()},
+        }
+
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc
+
+
+def build_default_sources(seen_filter=None) -> List[PollSource]:
+    """
+    One source per news feed plus DDMFC and NCHMF
+
+    News and DDMFC share a persistent SeenItemFilter, so entries ingested
+    before a restart are not classified or emitted again. The items they
+    emit carry their keys and are only marked seen by the consumer (pass
+    the same filter to AlertPipeline), so items it never stored are
+    fetched again. Collectors whose parsing dependencies (feedparser,
+    beautifulsoup4) are not installed are skipped with a warning.
+    """
+    if seen_filter is None:
+        from data_collectors.seen_items import SeenItemFilter
+        seen_filter = SeenItemFilter()
+    seen_filter.prune()
+
+    sources = []
+    try:
+        from data_collectors.news_collector import NewsCollector
+        news = NewsCollector(delay_seconds=0, seen_filter=seen_filter)
+        for source_name, feed_config in NewsCollector.TRUSTED_SOURCES.items():
+            for rss_url in feed_config['rss_urls']:
+                sources.append(PollSource(
+                    f"news:{rss_url}",
+                    lambda s=source_name, u=rss_url: news.fetch_feed(s, u, mark_seen=False),
+                    host=_host(rss_url)
+                ))
+    except ImportError as e:
+        print(f"[Ingestion] News feeds disabled: {e}")
+
+    try:
+        from data_collectors.ddmfc_collector import DDMFCCollector
+        ddmfc = DDMFCCollector(delay_seconds=INGESTION_HOST_MIN_GAP_SECONDS, seen_filter=seen_filter)
+        sources.append(PollSource(
+            "ddmfc", lambda: ddmfc.fetch_alerts(mark_seen=False), host=_host(DDMFCCollector.BASE_URL)
+        ))
+    except ImportError as e:
+        print(f"[Ingestion] DDMFC disabled: {e}")
+
+    try:
+        from data_collectors.nchmf_collector import NCHMFCollector
+        nchmf = NCHMFCollector(delay_seconds=0)
+        sources.append(PollSource(
+            "nchmf", lambda: nchmf.fetch_warnings(incremental=True), host=_host(NCHMFCollector.BASE_URL)
+        ))
+    except ImportError as e:
+        print(f"[Ingestion] NCHMF disabled: {e}")
+
+    return sources
+
+
+if __name__ == "__main__":
+    scheduler = IngestionScheduler(
+        build_default_sources(),
+        sink=lambda name, items: print(f"[Ingestion] {name}: {len(items)} new")
+    )
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(60)
+            for name, stats in scheduler.get_stats()['sources'].items():
+                print(f"  {name}: interval={stats['interval_s']}s new/min={stats['new_per_minute']} "
+                      f"lag={stats['ingest_lag_s']}s errors={stats['errors']}")
+    except KeyboardInterrupt:
+        scheduler.stop()
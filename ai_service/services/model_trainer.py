@@ -96,9 +96,11 @@ class ModelRetrainer:
         # Create new model (no cold start)
         scorer = AlertScoringModel(cold_start=False)
         
-        # Train
+        # Train (all cores), then restore the inference thread budget
         X_train_scaled = scorer.scaler.fit_transform(X_train)
+        scorer.set_inference_jobs(-1)
         scorer.model.fit(X_train_scaled, y_train)
+        scorer.set_inference_jobs()
         scorer.is_trained = True
         
         # Evaluate
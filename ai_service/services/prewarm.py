@@ -0,0 +1,219 @@
+"""Predictive cache pre-warming for provinces expected to see traffic"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    PREWARM_INTERVAL_SECONDS, PREWARM_PROVINCES, PREWARM_MAX_PROVINCES,
+    PREWARM_MIN_SEASONAL_RISK, PREWARM_POINTS_PER_PROVINCE, PREWARM_DEMAND_TTL_SECONDS
+)
+from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
+
+HAZARD_TYPES = ('flood', 'landslide', 'storm')
+
+
+class PrewarmScheduler:
+    """
+    Keeps weather and hazard predictions warm for high-traffic provinces
+
+    Target provinces come from PREWARM_PROVINCES if configured, otherwise
+    from the seasonal high-risk ranking (HazardZonePredictor
+    .get_high_risk_provinces), so the central coast is warmed in October
+    without anyone listing it. For each target the scheduler refreshes
+    the province centroid plus the points users recently asked about in
+    that province, every `interval` seconds, on a background thread.
+
+    Hazard predictions are served through `predict_risk`, which caches
+    results per point/month/hazard type; weather goes into the
+    ResilientWeatherCollector cache via `refresh`.
+    """
+
+    def __init__(
+        self,
+        hazard_predictor,
+        weather_collector,
+        provinces: List[str] = None,
+        interval: float = PREWARM_INTERVAL_SECONDS,
+        max_provinces: int = PREWARM_MAX_PROVINCES,
+        min_risk: float = PREWARM_MIN_SEASONAL_RISK,
+        points_per_province: int = PREWARM_POINTS_PER_PROVINCE,
+        demand_ttl: float = PREWARM_DEMAND_TTL_SECONDS,
+        max_predictions: int = 4096
+    ):
+        self.hazard_predictor = hazard_predictor
+        self.weather_collector = weather_collector
+        self.provinces = list(PREWARM_PROVINCES if provinces is None else provinces)
+        self.interval = interval
+        self.max_provinces = max_provinces
+        self.min_risk = min_risk
+        self.points_per_province = points_per_province
+        self.demand_ttl = demand_ttl
+        self.prediction_ttl = 2 * interval
+        self.max_predictions = max_predictions
+
+        self._lock = threading.Lock()
+        self._demand = {}
+        self._predictions = OrderedDict()
+        self._targets = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.cycles = 0
+        self.last_cycle_ms = 0.0
+        self.points_warmed = 0
+        self.weather_failures = 0
+        self.target_requests = 0
+        self.warm_hits = 0
+
+    # ----- Targets -----
+
+    def target_provinces(self, month: int = None) -> List[Dict]:
+        """Provinces to keep warm, each with province, lat and lng"""
+        if self.provinces:
+            return [
+                {'province': name, 'lat': VIETNAM_PROVINCES[name]['lat'], 'lng': VIETNAM_PROVINCES[name]['lng']}
+                for name in self.provinces if name in VIETNAM_PROVINCES
+            ]
+        return self.hazard_predictor.get_high_risk_provinces(
+            month=month, min_score=self.min_risk, limit=self.max_provinces
+        )
+
+    def _warm_points(self, targets: List[Dict]) -> List[Tuple[float, float]]:
+        """Centroid plus recently requested points for each target province"""
+        cutoff = time.monotonic() - self.demand_ttl
+        points = []
+        with self._lock:
+            for target in targets:
+                points.append((target['lat'], target['lng']))
+                demand = self._demand.get(target['province'], {})
+                points.extend(point for point, seen in demand.items() if seen >= cutoff)
+        return list(dict.fromkeys(points))
+
+    # ----- Prediction cache -----
+
+    @staticmethod
+    def _point(lat: float, lng: float) -> Tuple[float, float]:
+        """Quantized point shared by demand tracking and the prediction cache"""
+        return (round(lat, 4), round(lng, 4))
+
+    def _key(self, lat: float, lng: float, month: int, hazard_type: str) -> tuple:
+        return (*self._point(lat, lng), month, hazard_type)
+
+    def _store(self, key: tuple, result: Dict):
+        with self._lock:
+            self._predictions[key] = (result, time.monotonic())
+            self._predictions.move_to_end(key)
+            while len(self._predictions) > self.max_predictions:
+                self._predictions.popitem(last=False)
+
+    def predict_risk(self, lat: float, lng: float, month: int = None, hazard_type: str = 'flood') -> Tuple[Dict, bool]:
+        """
+        Hazard prediction through the warm cache
+
+        Returns:
+            (result, hit): a copy of the prediction (safe to enrich in
+            place) and whether it was served from cache
+        """
+        if month is None:
+            month = datetime.now().month
+        key = self._key(lat, lng, month, hazard_type)
+
+        with self._lock:
+            entry = self._predictions.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.prediction_ttl:
+            return dict(entry[0]), True
+
+        result = self.hazard_predictor.predict_risk(lat=lat, lng=lng, month=month, hazard_type=hazard_type)
+        self._store(key, result)
+        return dict(result), False
+
+    # ----- Demand and hit tracking -----
+
+    def record_request(self, lat: float, lng: float, province: str, warm: bool):
+        """Remember a requested point and count warm hits for target provinces"""
+        point = self._point(lat, lng)
+        with self._lock:
+            demand = self._demand.setdefault(province, OrderedDict())
+            demand[point] = time.monotonic()
+            demand.move_to_end(point)
+            while len(demand) > self.points_per_province:
+                demand.popitem(last=False)
+
+            if province in self._targets:
+                self.target_requests += 1
+                if warm:
+                    self.warm_hits += 1
+
+    # ----- Scheduling -----
+
+    def run_once(self) -> int:
+        """Warm all target points once; returns the number of points warmed"""
+        started = time.perf_counter()
+        month = datetime.now().month
+        targets = self.target_provinces(month)
+        with self._lock:
+            self._targets = {t['province'] for t in targets}
+
+        points = self._warm_points(targets)
+        for lat, lng in points:
+            if not self.weather_collector.refresh(lat, lng):
+                self.weather_failures += 1
+            for hazard_type in HAZARD_TYPES:
+                key = self._key(lat, lng, month, hazard_type)
+                self._store(key, self.hazard_predictor.predict_risk(
+                    lat=lat, lng=lng, month=month, hazard_type=hazard_type
+                ))
+
+        self.cycles += 1
+        self.points_warmed += len(points)
+        self.last_cycle_ms = (time.perf_counter() - started) * 1000
+        return len(points)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[Prewarm] Cycle failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background warming thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="prewarm", daemon=True)
+        self._thread.start()
+        print(f"[Prewarm] Started (interval={self.interval}s, "
+              f"provinces={self.provinces or 'seasonal high-risk'})")
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self) -> dict:
+        """Warm-hit ratio and cycle statistics"""
+        with self._lock:
+            targets = sorted(self._targets)
+            cached = len(self._predictions)
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'interval_s': self.interval,
+            'target_provinces': targets,
+            'cycles': self.cycles,
+            'last_cycle_ms': round(self.last_cycle_ms, 1),
+            'points_warmed': self.points_warmed,
+            'weather_failures': self.weather_failures,
+            'cached_predictions': cached,
+            'target_requests': self.target_requests,
+            'warm_hits': self.warm_hits,
+            'warm_hit_ratio': round(self.warm_hits / self.target_requests, 3) if self.target_requests else None,
+        }
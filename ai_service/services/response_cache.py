@@ -0,0 +1,190 @@
+"""Pre-serialized, pre-compressed response cache for read-mostly endpoints"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_GZIP_LEVEL
+from utils.serialization import dumps
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+
+class ResponseCache:
+    """
+    Cache of fully rendered JSON response bodies
+
+    Each entry holds the serialized body plus its gzip (and brotli, when
+    available) variants and an ETag, so a repeat request is served
+    with a dict lookup and no filtering, serialization or compression.
+
+    Entries are keyed by normalized query parameters and bounded with
+    LRU eviction. Call invalidate() whenever the underlying data changes;
+    pass put() the `generation` read before computing the payload so a
+    response rendered from data older than the last invalidation is not
+    stored.
+    """
+
+    def __init__(self, name: str, max_entries: int = None):
+        self.name = name
+        self.max_entries = max_entries or RESPONSE_CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.generation = 0
+
+    @staticmethod
+    def make_key(**params) -> tuple:
+        """
+        Build a cache key from query parameters
+
+        Strings are stripped and empty strings become None, so callers
+        should query with the same normalized values they cache under.
+        """
+        normalized = []
+        for name in sorted(params):
+            value = params[name]
+            if isinstance(value, str):
+                value = value.strip() or None
+            normalized.append((name, value))
+        return tuple(normalized)
+
+    def get(self, key: tuple):
+        """Return the cached entry for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, payload, generation: int = None) -> dict:
+        """
+        Serialize, compress and store a payload
+
+        Args:
+            key: Key from make_key()
+            payload: JSON-serializable response content
+            generation: self.generation read before the payload was
+                        computed; if invalidate() ran since, the entry is
+                        returned but not stored
+
+        Returns:
+            The entry dict
+        """
+        body = dumps(payload)
+        entry = {
+            'body': body,
+            'gzip': gzip.compress(body, compresslevel=RESPONSE_CACHE_GZIP_LEVEL, mtime=0),
+            'br': brotli.compress(body) if HAS_BROTLI else None,
+            # Weak validator: the same ETag covers every content-coding
+            'etag': 'W/"' + hashlib.sha1(body).hexdigest() + '"',
+        }
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def invalidate(self):
+        """Drop all entries (call after the source data reloads)"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+        print(f"[ResponseCache] {self.name}: invalidated (generation {self.generation})")
+
+    def render(self, entry: dict, if_none_match: str = None, accept_encoding: str = None) -> tuple:
+        """
+        Pick the representation to send for a cached entry
+
+        Args:
+            entry: Entry from get()/put()
+            if_none_match: Value of the If-None-Match request header
+            accept_encoding: Value of the Accept-Encoding request header
+
+        Returns:
+            (status_code, body, headers)
+        """
+        headers = {'ETag': entry['etag'], 'Vary': 'Accept-Encoding'}
+
+        if if_none_match and self._etag_matches(entry['etag'], if_none_match):
+            self.not_modified += 1
+            return 304, b'', headers
+
+        encoding = self._choose_encoding(accept_encoding or '', has_br=entry['br'] is not None)
+        if encoding == 'identity':
+            return 200, entry['body'], headers
+
+        headers['Content-Encoding'] = encoding
+        return 200, entry[encoding], headers
+
+    @staticmethod
+    def _etag_matches(etag: str, if_none_match: str) -> bool:
+        """Weak comparison as required for If-None-Match (RFC 9110)"""
+        if if_none_match.strip() == '*':
+            return True
+        opaque = etag[2:] if etag.startswith('W/') else etag
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag == opaque:
+                return True
+        return False
+
+    @staticmethod
+    def _choose_encoding(accept_encoding: str, has_br: bool) -> str:
+        """Choose br > gzip > identity among codings the client accepts"""
+        accepted = {}
+        for part in accept_encoding.lower().split(','):
+            coding, _, params = part.strip().partition(';')
+            if not coding:
+                continue
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[coding.strip()] = q
+
+        def allowed(coding):
+            return accepted.get(coding, accepted.get('*', 0.0)) > 0
+
+        if has_br and allowed('br'):
+            return 'br'
+        if allowed('gzip'):
+            return 'gzip'
+        return 'identity'
+
+    def get_stats(self) -> dict:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            'name': self.name,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            'generation': self.generation,
+            'brotli': HAS_BROTLI,
+        }
@@ -0,0 +1,283 @@
+"""Materialized hazard risk outlook with a change feed"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import sys
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import RISK_OUTLOOK_INTERVAL_SECONDS, RISK_OUTLOOK_DAYS, RISK_OUTLOOK_CHANGE_BUFFER
+from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
+
+HAZARD_TYPES = ('flood', 'landslide', 'storm')
+FORECAST_WINDOW_DAYS = 7  # HazardZonePredictor.apply_forecast thresholds are per 7 days
+
+
+class RiskOutlook:
+    """
+    Risk for every province x hazard type x day of the next `days` days
+
+    Each run takes the base prediction for the day's month from
+    HazardZonePredictor and raises it with HazardZonePredictor
+    .apply_forecast, using the forecast precipitation total and maximum
+    wind over the 7 days starting that day (the same rule as
+    /api/v1/hazard/predict). Forecasts come through the weather
+    collector's cache; provinces whose forecast is unavailable keep the
+    previous run's forecast-adjusted entries, or the base risk
+    (`weather_applied` false) when there are none.
+
+    The finished outlook replaces the previous one atomically. Risk levels
+    that differ from the previous run are appended to a bounded change
+    feed with increasing sequence numbers, so notifiers only process what
+    changed. Days newly entering the horizon have nothing to differ from
+    and are not reported.
+    """
+
+    def __init__(
+        self,
+        hazard_predictor,
+        weather_collector,
+        days: int = RISK_OUTLOOK_DAYS,
+        interval: float = RISK_OUTLOOK_INTERVAL_SECONDS,
+        max_changes: int = RISK_OUTLOOK_CHANGE_BUFFER,
+        fetch_workers: int = 8
+    ):
+        self.hazard_predictor = hazard_predictor
+        self.weather_collector = weather_collector
+        self.days = days
+        self.interval = interval
+        self.fetch_workers = fetch_workers
+
+        self._lock = threading.Lock()
+        self._entries: Dict[tuple, Dict] = {}
+        self._changes = deque(maxlen=max_changes)
+        self._seq = 0
+        self._listeners: List[Callable] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.generation = 0
+        self.generated_at = None
+        self.last_run_ms = 0.0
+        self.forecast_failures = 0
+
+    def add_listener(self, callback: Callable):
+        """Register a callback(changes) invoked after each run"""
+        self._listeners.append(callback)
+
+    # ----- Materialization -----
+
+    def _forecast(self, lat: float, lng: float) -> Dict:
+        try:
+            return self.weather_collector.get_forecast(
+                lat=lat, lng=lng, days=self.days + FORECAST_WINDOW_DAYS - 1
+            ) or {}
+        except Exception:
+            return {}
+
+    def _windows(self, daily: Dict) -> tuple:
+        """Per-day 7-day precipitation totals and max wind, or (None, None)"""
+        precip = np.array([v or 0.0 for v in daily.get('precipitation_sum') or []], dtype=float)
+        wind = np.array([v or 0.0 for v in daily.get('wind_speed_10m_max') or []], dtype=float)
+        if len(precip) == 0:
+            return None, None
+
+        totals, max_wind = [], []
+        cumulative = np.concatenate([[0.0], np.cumsum(precip)])
+        for d in range(self.days):
+            end = min(d + FORECAST_WINDOW_DAYS, len(precip))
+            if d >= end:
+                totals.append(None)
+                max_wind.append(None)
+                continue
+            totals.append(float(cumulative[end] - cumulative[d]))
+            max_wind.append(float(wind[d:end].max()) if len(wind) >= end else 0.0)
+        return totals, max_wind
+
+    def build(self, start: date = None, previous: Dict[tuple, Dict] = None) -> Dict[tuple, Dict]:
+        """
+        Compute the full outlook (without publishing it)
+
+        Entries of `previous` with the forecast applied stand in for
+        provinces whose forecast fetch fails this time.
+        """
+        start = start or date.today()
+        previous = previous or {}
+        dates = [start + timedelta(days=d) for d in range(self.days)]
+        provinces = list(VIETNAM_PROVINCES.items())
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="outlook-forecast") as pool:
+            forecasts = list(pool.map(lambda item: self._forecast(item[1]['lat'], item[1]['lng']), provinces))
+
+        entries = {}
+        for (province, info), forecast in zip(provinces, forecasts):
+            totals, max_wind = self._windows(forecast.get('daily') or {})
+            if totals is None:
+                self.forecast_failures += 1
+
+            base = {}
+            for day in dates:
+                for hazard_type in HAZARD_TYPES:
+                    key = (day.month, hazard_type)
+                    if key not in base:
+                        base[key] = self.hazard_predictor.predict_risk(
+                            lat=info['lat'], lng=info['lng'], month=day.month, hazard_type=hazard_type
+                        )
+
+            for d, day in enumerate(dates):
+                for hazard_type in HAZARD_TYPES:
+                    key = (province, hazard_type, day.isoformat())
+                    old = previous.get(key)
+                    if totals is None and old is not None and old['weather_applied']:
+                        entries[key] = old
+                        continue
+                    result = dict(base[(day.month, hazard_type)])
+                    weather_applied = totals is not None and totals[d] is not None
+                    if weather_applied:
+                        self.hazard_predictor.apply_forecast(result, totals[d], max_wind[d])
+                    entries[key] = {
+                        'province': province,
+                        'hazard_type': hazard_type,
+                        'date': day.isoformat(),
+                        'risk_level': result['risk_level'],
+                        'risk_label': result['risk_label'],
+                        'base_risk_level': base[(day.month, hazard_type)]['risk_level'],
+                        'total_precipitation': round(totals[d], 1) if weather_applied else None,
+                        'max_wind': round(max_wind[d], 1) if weather_applied else None,
+                        'weather_applied': weather_applied,
+                    }
+        return entries
+
+    def run_once(self, start: date = None) -> List[Dict]:
+        """Recompute and publish the outlook; returns the changes it produced"""
+        started = time.perf_counter()
+        with self._lock:
+            previous = self._entries
+        entries = self.build(start, previous)
+        now = datetime.now().isoformat(timespec='seconds')
+
+        with self._lock:
+            previous = self._entries
+            changes = []
+            for key, entry in entries.items():
+                old = previous.get(key)
+                if old is None or old['risk_level'] == entry['risk_level']:
+                    continue
+                self._seq += 1
+                changes.append({
+                    'seq': self._seq,
+                    'generation': self.generation + 1,
+                    'province': entry['province'],
+                    'hazard_type': entry['hazard_type'],
+                    'date': entry['date'],
+                    'previous_level': old['risk_level'],
+                    'risk_level': entry['risk_level'],
+                    'risk_label': entry['risk_label'],
+                    'changed_at': now,
+                })
+            self._changes.extend(changes)
+            self._entries = entries
+            self.generation += 1
+            self.generated_at = now
+            self.last_run_ms = (time.perf_counter() - started) * 1000
+
+        for callback in self._listeners:
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"[RiskOutlook] Listener failed: {e}")
+        print(f"[RiskOutlook] Generation {self.generation}: {len(entries)} entries, "
+              f"{len(changes)} changes in {self.last_run_ms:.0f}ms")
+        return changes
+
+    # ----- Reads -----
+
+    def get_outlook(
+        self,
+        province: Optional[str] = None,
+        hazard_type: Optional[str] = None,
+        day: Optional[str] = None,
+        min_risk: int = 1
+    ) -> Dict:
+        """Current outlook entries matching the filters"""
+        with self._lock:
+            entries = self._entries
+            generation, generated_at = self.generation, self.generated_at
+        selected = [
+            e for e in entries.values()
+            if (province is None or e['province'] == province)
+            and (hazard_type is None or e['hazard_type'] == hazard_type)
+            and (day is None or e['date'] == day)
+            and e['risk_level'] >= min_risk
+        ]
+        return {
+            'generation': generation,
+            'generated_at': generated_at,
+            'days': self.days,
+            'total': len(selected),
+            'entries': selected,
+        }
+
+    def get_changes(self, since: int = 0, limit: int = 500) -> Dict:
+        """
+        Changes with seq > since, oldest first
+
+        `truncated` is true when changes after `since` were already dropped
+        from the buffer; the client should re-read the full outlook.
+        """
+        with self._lock:
+            oldest = self._changes[0]['seq'] if self._changes else self._seq + 1
+            changes = [c for c in self._changes if c['seq'] > since][:limit]
+            latest = self._seq
+        return {
+            'changes': changes,
+            'next_since': changes[-1]['seq'] if changes else max(since, 0),
+            'latest_seq': latest,
+            'truncated': since < oldest - 1,
+        }
+
+    # ----- Scheduling -----
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[RiskOutlook] Run failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background materialization thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="risk-outlook", daemon=True)
+        self._thread.start()
+        print(f"[RiskOutlook] Started (interval={self.interval}s, days={self.days})")
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+            buffered = len(self._changes)
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'generation': self.generation,
+            'generated_at': self.generated_at,
+            'last_run_ms': round(self.last_run_ms, 1),
+            'entries': entries,
+            'buffered_changes': buffered,
+            'latest_seq': self._seq,
+            'forecast_failures': self.forecast_failures,
+        }
@@ -2,12 +2,14 @@
 import pytest
 import numpy as np
 import sys
+import threading
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from models.alert_scorer import AlertScoringModel
+from models import duplicate_detector
 from models.duplicate_detector import SemanticDuplicateDetector
 from models.notification_timing import NotificationTimingModel
 
@@ -93,6 +95,82 @@ class TestAlertScoringModel:
         assert all(0 <= v <= 1 for v in importance.values())
 
 
+class _HashEncoder:
+    """SentenceTransformer stand-in: deterministic vectors, no download"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def encode(self, texts, convert_to_numpy=True):
+        single = isinstance(texts, str)
+        vectors = np.array([
+            np.random.default_rng(abs(hash(text)) % 2**32).random(384) for text in ([texts] if single else texts)
+        ])
+        return vectors[0] if single else vectors
+
+
+class TestEmbeddingCache:
+    """Test the embedding cache under concurrent use"""
+
+    def test_concurrent_lookups_and_eviction(self, monkeypatch):
+        """Test threads reading and evicting the shared cache never fail"""
+        monkeypatch.setattr(duplicate_detector, 'SentenceTransformer', _HashEncoder)
+        detector = SemanticDuplicateDetector(threshold=0.9)
+        detector._cache_limit = 50
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(2000):
+                    texts = [f"alert {(offset * 50 + i + j) % 1500}" for j in range(4)]
+                    batch = detector.get_embeddings(texts)
+                    single = detector.get_embedding(texts[0])
+                    assert np.allclose(batch[0], single)
+            except Exception as e:
+                errors.append(e)
+
+        # Switch threads very often so check-then-read and eviction interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        assert errors == []
+        assert detector.get_cache_stats()['cache_size'] <= 50
+
+
+class _Expired:
+    """Deadline stub that has already run out"""
+    expired = True
+
+
+class TestDuplicateDeadline:
+    """Test find_duplicates_within reports whether the deadline cut it short"""
+
+    @pytest.fixture
+    def detector(self, monkeypatch):
+        monkeypatch.setattr(duplicate_detector, 'SentenceTransformer', _HashEncoder)
+        return SemanticDuplicateDetector(threshold=0.9)
+
+    def test_partial_only_when_alerts_left_uncompared(self, detector):
+        """Test an expired deadline is partial only if a candidate was skipped"""
+        new_alert = {'content': 'Lũ lớn', 'alert_type': 'disaster', 'severity': 'high', 'province': 'Huế'}
+        other_province = dict(new_alert, province='Đà Nẵng')
+        same = dict(new_alert)
+
+        assert detector.find_duplicates_within(new_alert, [other_province], _Expired()) == ([], False)
+        assert detector.find_duplicates_within(new_alert, [same], _Expired()) == ([], True)
+        duplicates, partial = detector.find_duplicates_within(new_alert, [same], None)
+        assert len(duplicates) == 1 and not partial
+        assert detector.find_duplicates(new_alert, [same]) == duplicates
+
+
 class TestSemanticDuplicateDetector:
     """Test Semantic Duplicate Detector"""
     
@@ -0,0 +1,1911 @@
+"""Service Tests for Smart Alert AI Service"""
+import asyncio
+import gzip
+import json
+import pytest
+import requests
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.response_cache import ResponseCache
+from services.event_stream import EventBroadcaster
+from services.inference_executor import InferenceExecutor
+from services.admission import (
+    AdmissionController, AdmissionRejected, request_priority,
+    PRIORITY_CRITICAL, PRIORITY_HIGH, PRIORITY_LOW
+)
+from services.degradation import OverloadMonitor
+from utils.deadline import Deadline, DeadlineExceeded, run_within
+from utils.circuit_breaker import CircuitBreaker
+from data_collectors.openmeteo_collector import OpenMeteoCollector
+from data_collectors import resilient_weather
+from data_collectors.resilient_weather import ResilientWeatherCollector
+from services.prewarm import PrewarmScheduler
+from services.risk_outlook import RiskOutlook
+from services.ingestion_scheduler import HostLimiter, IngestionScheduler, PollSource
+from services.alert_pipeline import AlertPipeline, normalize_alert
+from services.data_collector import DataCollector
+from models.alert_scorer import AlertScoringModel
+from utils.features import FeatureExtractor
+from data_collectors.http_client import CachedHttpClient
+from data_collectors.seen_items import BloomFilter, SeenItemFilter, SEEN_KEYS_FIELD, canonical_link, item_id
+from data_collectors.text_matcher import AlertTextMatcher, normalize
+from data_collectors.geocoder import OfflineGeocoder
+from data_collectors.historical_event_store import HistoricalEventStore, DEFAULT_SEASONAL_PATTERN
+from data_collectors.historical_data_collector import HistoricalDataCollector
+from data_collectors.kaggle_ingest import ingest_source, read_hazard_events
+from models.hazard_predictor import HazardZonePredictor
+from data_collectors.weather_archive import WeatherArchive, ARCHIVE_DAILY_VARIABLES
+from models.climatology import Climatology, day_slot
+from models.weather_forecaster import WeatherForecaster, load_weather_frame
+from data_collectors.vietnam_hazard_dataset import VIETNAM_PROVINCES
+from utils import serialization
+from utils.serialization import ORJSONResponse, MsgPackRoute, model_fields_only, negotiated_response, dumps
+
+
+class TestResponseCache:
+    """Test pre-serialized response cache"""
+
+    def test_key_normalization(self):
+        """Test that equivalent query parameters share a key"""
+        key1 = ResponseCache.make_key(province=" Đà Nẵng ", month=10, hazard_type="")
+        key2 = ResponseCache.make_key(hazard_type=None, month=10, province="Đà Nẵng")
+
+        assert key1 == key2
+        assert dict(key1)['province'] == "Đà Nẵng"
+
+    def test_put_and_get(self):
+        """Test stored entry round-trips and compresses"""
+        cache = ResponseCache("test")
+        key = ResponseCache.make_key(month=10)
+        payload = {'total': 1, 'zones': [{'description': 'Vùng ngập lụt'}]}
+
+        assert cache.get(key) is None
+        cache.put(key, payload)
+        entry = cache.get(key)
+
+        assert json.loads(entry['body']) == payload
+        assert gzip.decompress(entry['gzip']) == entry['body']
+        assert cache.get_stats()['hits'] == 1
+        assert cache.get_stats()['misses'] == 1
+
+    def test_put_after_invalidate_not_stored(self):
+        """Test a payload computed before a reload is returned but not cached"""
+        cache = ResponseCache("test")
+        key = ResponseCache.make_key(month=10)
+        generation = cache.generation
+        cache.invalidate()
+
+        entry = cache.put(key, {'total': 1}, generation=generation)
+        assert json.loads(entry['body']) == {'total': 1}
+        assert cache.get(key) is None
+
+        cache.put(key, {'total': 2}, generation=cache.generation)
+        assert json.loads(cache.get(key)['body']) == {'total': 2}
+
+    def test_if_none_match_returns_304(self):
+        """Test conditional request with matching ETag"""
+        cache = ResponseCache("test")
+        entry = cache.put(ResponseCache.make_key(month=1), {'total': 0})
+
+        status, body, headers = cache.render(entry, if_none_match=entry['etag'])
+        assert status == 304
+        assert body == b''
+        assert headers['ETag'] == entry['etag']
+
+        status, _, _ = cache.render(entry, if_none_match='"other"')
+        assert status == 200
+
+    def test_content_negotiation(self):
+        """Test encoding selection from Accept-Encoding"""
+        cache = ResponseCache("test")
+        entry = cache.put(ResponseCache.make_key(month=1), {'total': 0})
+
+        _, body, headers = cache.render(entry, accept_encoding="gzip, deflate")
+        assert headers['Content-Encoding'] == 'gzip'
+        assert body == entry['gzip']
+
+        _, body, headers = cache.render(entry, accept_encoding="gzip;q=0")
+        assert 'Content-Encoding' not in headers
+        assert body == entry['body']
+
+    def test_invalidate_and_lru_bound(self):
+        """Test invalidation and max entry eviction"""
+        cache = ResponseCache("test", max_entries=2)
+        for month in (1, 2, 3):
+            cache.put(ResponseCache.make_key(month=month), {'month': month})
+
+        assert cache.get(ResponseCache.make_key(month=1)) is None
+        assert cache.get(ResponseCache.make_key(month=3)) is not None
+
+        cache.invalidate()
+        assert cache.get(ResponseCache.make_key(month=3)) is None
+        assert cache.get_stats()['generation'] == 1
+
+
+class TestSerialization:
+    """Test fast JSON serialization path"""
+
+    def test_dumps_numpy_and_unicode(self):
+        """Test numpy values and Vietnamese text serialize compactly"""
+        import numpy as np
+
+        body = dumps({'similarity': np.float64(0.9), 'scores': np.array([1.0, 2.0]), 'province': 'Đà Nẵng'})
+
+        assert json.loads(body) == {'similarity': 0.9, 'scores': [1.0, 2.0], 'province': 'Đà Nẵng'}
+        assert 'Đà Nẵng'.encode('utf-8') in body
+
+    def test_orjson_response(self):
+        """Test response renders JSON body with correct media type"""
+        response = ORJSONResponse({'is_duplicate': False, 'duplicates': []})
+
+        assert response.media_type == "application/json"
+        assert json.loads(response.body) == {'is_duplicate': False, 'duplicates': []}
+
+    def test_stdlib_fallback_encodes_dates(self, monkeypatch):
+        """Test datetimes serialize as ISO strings without orjson"""
+        monkeypatch.setattr(serialization, 'HAS_ORJSON', False)
+        body = dumps({'created_at': datetime(2025, 10, 6, 8, 30), 'day': datetime(2025, 10, 6).date()})
+        assert json.loads(body) == {'created_at': '2025-10-06T08:30:00', 'day': '2025-10-06'}
+
+    def test_model_fields_only_drops_undeclared_keys(self):
+        """Test extra keys are removed at the top level and inside nested models"""
+        from typing import List, Optional
+        from pydantic import BaseModel
+
+        class Day(BaseModel):
+            date: str
+
+        class Outlook(BaseModel):
+            days: List[Day]
+            best: Optional[Day] = None
+            raw: dict
+
+        content = {
+            'days': [{'date': '2025-10-06', 'model_state': 1}],
+            'best': {'date': '2025-10-06', 'debug': True},
+            'raw': {'kept': 'as is'},
+            'internal_cache_key': 'x',
+        }
+        assert model_fields_only(content, Outlook) == {
+            'days': [{'date': '2025-10-06'}],
+            'best': {'date': '2025-10-06'},
+            'raw': {'kept': 'as is'},
+        }
+
+
+
+class TestMsgPackNegotiation:
+    """Test MessagePack request/response negotiation"""
+
+    @pytest.fixture
+    def client(self):
+        msgpack = pytest.importorskip("msgpack")
+        from fastapi import FastAPI, Request
+        from fastapi.testclient import TestClient
+        from pydantic import BaseModel
+
+        class EchoRequest(BaseModel):
+            province: str
+            lat: float
+
+        app = FastAPI(default_response_class=ORJSONResponse)
+        app.router.route_class = MsgPackRoute
+
+        @app.post("/echo")
+        async def echo(request: EchoRequest, http_request: Request):
+            return negotiated_response(request.model_dump(), http_request)
+
+        return TestClient(app), msgpack
+
+    def test_msgpack_request_gets_msgpack_response(self, client):
+        """Test msgpack body is decoded, validated and answered in kind"""
+        client, msgpack = client
+        body = msgpack.packb({'province': 'Đà Nẵng', 'lat': 16.05})
+
+        response = client.post("/echo", content=body, headers={'Content-Type': 'application/msgpack'})
+
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/msgpack'
+        assert msgpack.unpackb(response.content) == {'province': 'Đà Nẵng', 'lat': 16.05}
+
+    def test_accept_header_wins(self, client):
+        """Test Accept selects the response format independently of the body"""
+        client, msgpack = client
+
+        response = client.post("/echo", json={'province': 'Huế', 'lat': 16.4},
+                               headers={'Accept': 'application/msgpack'})
+        assert response.headers['content-type'] == 'application/msgpack'
+
+        response = client.post("/echo", content=msgpack.packb({'province': 'Huế', 'lat': 16.4}),
+                               headers={'Content-Type': 'application/msgpack', 'Accept': 'application/json'})
+        assert response.json() == {'province': 'Huế', 'lat': 16.4}
+
+    def test_invalid_msgpack_body(self, client):
+        """Test malformed and schema-invalid msgpack bodies are rejected"""
+        client, msgpack = client
+        headers = {'Content-Type': 'application/msgpack'}
+
+        assert client.post("/echo", content=b'\xc1', headers=headers).status_code == 400
+        assert client.post("/echo", content=msgpack.packb({'lat': 1.0}), headers=headers).status_code == 422
+
+
+
+class TestEventBroadcaster:
+    """Test SSE event fan-out"""
+
+    def test_publish_respects_filters(self):
+        """Test events only reach subscribers whose filters match"""
+        async def run():
+            broadcaster = EventBroadcaster()
+            danang = broadcaster.subscribe(province="Đà Nẵng")
+            storms = broadcaster.subscribe(hazard_type="storm", event_types={'risk_change'})
+
+            broadcaster.publish_alert({'alert_id': 'a1', 'province': 'Đà Nẵng'}, 85.0)
+            broadcaster.publish('risk_change', {'province': 'Huế', 'hazard_type': 'storm'})
+
+            return danang.queue.qsize(), storms.queue.qsize(), await danang.queue.get()
+
+        danang_count, storm_count, frame = asyncio.run(run())
+
+        assert danang_count == 1
+        assert storm_count == 1
+        assert frame.startswith(b"id: 1\nevent: alert\ndata: ")
+        assert json.loads(frame.split(b"data: ", 1)[1])['alert_id'] == 'a1'
+
+    def test_record_risk_publishes_changes_only(self):
+        """Test risk_change is emitted only when the level changes"""
+        async def run():
+            broadcaster = EventBroadcaster()
+            subscriber = broadcaster.subscribe(event_types={'risk_change'})
+
+            results = [
+                broadcaster.record_risk((16.1, 108.2), "Đà Nẵng", "flood", 3),
+                broadcaster.record_risk((16.1, 108.2), "Đà Nẵng", "flood", 3),
+                broadcaster.record_risk((16.1, 108.2), "Đà Nẵng", "flood", 4),
+            ]
+            return results, subscriber.queue.qsize()
+
+        results, queued = asyncio.run(run())
+
+        assert results == [False, False, True]
+        assert queued == 1
+
+    def test_replay_and_overflow(self):
+        """Test Last-Event-ID replay and slow subscriber disconnect"""
+        async def run():
+            broadcaster = EventBroadcaster()
+            subscriber = broadcaster.subscribe()
+            subscriber.queue = asyncio.Queue(maxsize=1)
+
+            for i in range(3):
+                broadcaster.publish('alert', {'alert_id': str(i)})
+            return broadcaster.replay_since(1, subscriber), subscriber.closed, broadcaster.get_stats()
+
+        replayed, closed, stats = asyncio.run(run())
+
+        assert len(replayed) == 2
+        assert closed
+        assert stats['dropped_subscribers'] == 1
+
+    def test_reconnect_gets_each_event_once(self):
+        """Test events published right after a resume are streamed once, not replayed too"""
+        class _Request:
+            async def is_disconnected(self):
+                return True
+
+        async def run():
+            broadcaster = EventBroadcaster()
+            for i in range(2):
+                broadcaster.publish('alert', {'alert_id': str(i)})
+            subscriber = broadcaster.subscribe(last_event_id=1)
+            broadcaster.publish('alert', {'alert_id': '2'})  # before the stream starts reading
+
+            return [frame async for frame in broadcaster.stream(subscriber, _Request(), heartbeat_seconds=0.01)]
+
+        frames = asyncio.run(run())
+        ids = [frame.split(b"\n", 1)[0] for frame in frames if frame.startswith(b"id: ")]
+        assert ids == [b"id: 2", b"id: 3"]
+
+
+
+class TestInferenceExecutor:
+    """Test per-model inference thread pools"""
+
+    def test_run_offloads_to_model_pool(self):
+        """Test calls run in the model's named worker threads"""
+        import threading
+        executor = InferenceExecutor(budgets={'scorer': 2})
+
+        async def run():
+            return await asyncio.gather(*[
+                executor.run('scorer', lambda x: (x * 2, threading.current_thread().name), i)
+                for i in range(4)
+            ])
+
+        results = asyncio.run(run())
+        executor.shutdown()
+
+        assert [value for value, _ in results] == [0, 2, 4, 6]
+        assert all(name.startswith('inference-scorer') for _, name in results)
+        assert executor.get_stats()['scorer']['completed'] == 4
+
+    def test_inline_when_offload_disabled(self):
+        """Test offload switch runs calls on the caller's thread"""
+        import threading
+        executor = InferenceExecutor(offload=False)
+
+        name = asyncio.run(executor.run('scorer', lambda: threading.current_thread().name))
+
+        assert name == threading.current_thread().name
+
+    def test_errors_propagate(self):
+        """Test exceptions from the model call reach the handler"""
+        executor = InferenceExecutor(budgets={'hazard': 1})
+
+        def fail():
+            raise ValueError("bad features")
+
+        with pytest.raises(ValueError):
+            asyncio.run(executor.run('hazard', fail))
+        executor.shutdown()
+
+        assert executor.get_stats()['hazard']['errors'] == 1
+
+
+
+class TestAdmissionController:
+    """Test severity-aware admission control"""
+
+    def test_request_priority(self):
+        """Test the more urgent of severity and alert type wins"""
+        assert request_priority('critical', 'general') == PRIORITY_CRITICAL
+        assert request_priority('medium', 'evacuation') == PRIORITY_CRITICAL
+        assert request_priority('high', 'weather') == PRIORITY_HIGH
+        assert request_priority('low', 'general') == PRIORITY_LOW
+
+    def test_critical_served_before_general(self):
+        """Test waiters are granted in priority order, not arrival order"""
+        async def run():
+            controller = AdmissionController("test", concurrency=1, max_queue=10, max_wait_ms=60000)
+            order = []
+
+            async def job(name, priority):
+                async with controller.slot(priority):
+                    order.append(name)
+                    await asyncio.sleep(0)
+
+            await controller.acquire(PRIORITY_LOW)  # occupy the only slot
+            tasks = [asyncio.create_task(job('general', PRIORITY_LOW)),
+                     asyncio.create_task(job('evacuation', PRIORITY_CRITICAL))]
+            await asyncio.sleep(0)
+            controller.release()
+            await asyncio.gather(*tasks)
+            return order, controller.get_stats()
+
+        order, stats = asyncio.run(run())
+
+        assert order == ['evacuation', 'general']
+        assert stats['admitted'] == 3
+        assert stats['queue_depth'] == 0
+
+    def test_reject_when_wait_exceeds_budget(self):
+        """Test fast rejection with Retry-After when estimated wait is too long"""
+        async def run():
+            controller = AdmissionController("test", concurrency=1, max_queue=10, max_wait_ms=10)
+            controller._service_ms = 1500
+            await controller.acquire(PRIORITY_LOW)
+            with pytest.raises(AdmissionRejected) as exc_info:
+                await controller.acquire(PRIORITY_LOW)
+            return exc_info.value, controller.get_stats()
+
+        rejection, stats = asyncio.run(run())
+
+        assert rejection.retry_after == 2
+        assert stats['rejected'] == 1
+
+    def test_full_queue_sheds_lower_priority(self):
+        """Test a critical request displaces a queued general one"""
+        async def run():
+            controller = AdmissionController("test", concurrency=1, max_queue=1, max_wait_ms=60000)
+            await controller.acquire(PRIORITY_LOW)
+
+            general = asyncio.create_task(controller.acquire(PRIORITY_LOW))
+            await asyncio.sleep(0)
+            critical = asyncio.create_task(controller.acquire(PRIORITY_CRITICAL))
+            await asyncio.sleep(0)
+
+            with pytest.raises(AdmissionRejected):
+                await general
+            with pytest.raises(AdmissionRejected):
+                await controller.acquire(PRIORITY_LOW)  # queue full of higher priority
+
+            controller.release()
+            await critical
+            return controller.get_stats()
+
+        stats = asyncio.run(run())
+
+        assert stats['shed'] == 1
+        assert stats['rejected'] == 1
+        assert stats['active'] == 1
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        """Test a waiter cancelled while queued no longer counts towards depth"""
+        async def run():
+            controller = AdmissionController("test", concurrency=1, max_queue=10, max_wait_ms=60000)
+            await controller.acquire(PRIORITY_LOW)
+
+            waiter = asyncio.create_task(controller.acquire(PRIORITY_LOW))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            cancelled = controller.get_stats()
+
+            controller.release()
+            return cancelled, controller.get_stats()
+
+        cancelled, released = asyncio.run(run())
+
+        assert (cancelled['active'], cancelled['queue_depth']) == (1, 0)
+        assert (released['active'], released['queue_depth']) == (0, 0)
+
+
+
+class TestOverloadMonitor:
+    """Test overload detection with hysteresis"""
+
+    def _monitor(self, load, **kwargs):
+        return OverloadMonitor(
+            depth_sources=[lambda: load['depth']],
+            enabled=True, cpu_high=90, cpu_low=70, queue_high=50, queue_low=10,
+            check_interval=0, cpu_sampler=lambda: load['cpu'], **kwargs
+        )
+
+    def test_enters_on_queue_depth(self):
+        """Test degraded mode starts when queue depth crosses the high mark"""
+        load = {'cpu': 10.0, 'depth': 0}
+        monitor = self._monitor(load, recover_seconds=0)
+
+        assert monitor.is_degraded() is False
+        load['depth'] = 60
+        assert monitor.is_degraded() is True
+
+    def test_recovers_with_hysteresis(self):
+        """Test load between the watermarks keeps the service degraded"""
+        load = {'cpu': 95.0, 'depth': 0}
+        monitor = self._monitor(load, recover_seconds=0)
+        assert monitor.is_degraded() is True
+
+        load['cpu'] = 80.0  # below high, above low
+        assert monitor.is_degraded() is True
+        assert monitor.is_degraded() is True
+
+        load['cpu'] = 20.0
+        monitor.is_degraded()  # starts the calm period
+        assert monitor.is_degraded() is False
+        assert monitor.get_stats()['transitions'] == 2
+
+    def test_hold_time_prevents_flapping(self):
+        """Test recovery waits for the full hold time"""
+        load = {'cpu': 95.0, 'depth': 0}
+        monitor = self._monitor(load, recover_seconds=60)
+        assert monitor.is_degraded() is True
+
+        load['cpu'] = 20.0
+        assert monitor.is_degraded() is True
+        assert monitor.is_degraded() is True
+
+    def test_disabled(self):
+        """Test a disabled monitor never degrades"""
+        load = {'cpu': 100.0, 'depth': 1000}
+        monitor = self._monitor(load)
+        monitor.enabled = False
+
+        assert monitor.is_degraded() is False
+
+
+
+class TestDeadline:
+    """Test per-request deadline propagation"""
+
+    def test_timeout_derived_from_remaining_budget(self):
+        """Test downstream timeouts shrink with the budget"""
+        deadline = Deadline(2000, reserve_ms=0)
+
+        assert deadline.timeout(30) <= 2.0
+        assert deadline.timeout(0.5) == 0.5
+        assert Deadline.timeout_for(None, 30) == 30
+
+    def test_run_within_raises_when_budget_runs_out(self):
+        """Test a slow step is abandoned at the deadline"""
+        async def run():
+            deadline = Deadline(50, reserve_ms=0)
+            started = time.perf_counter()
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                await run_within(deadline, asyncio.sleep(5), 'weather')
+            return exc_info.value, time.perf_counter() - started
+
+        error, elapsed = asyncio.run(run())
+
+        assert error.stage == 'weather'
+        assert elapsed < 1.0
+
+    def test_run_within_without_deadline(self):
+        """Test no deadline means no timeout"""
+        async def value():
+            return 42
+
+        assert asyncio.run(run_within(None, value(), 'scoring')) == 42
+
+
+
+class _FakeOpenMeteo(BaseHTTPRequestHandler):
+    """Local stand-in for Open-Meteo with injectable latency and errors"""
+    delay = 0.0
+    status = 200
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        time.sleep(type(self).delay)
+        body = json.dumps({'current': {'temperature_2m': 30.0}}).encode()
+        try:
+            self.send_response(type(self).status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client timed out and went away
+
+    def log_message(self, *args):
+        pass
+
+
+class TestResilientWeatherCollector:
+    """Test stale-while-revalidate and the circuit breaker against a fake upstream"""
+
+    @pytest.fixture
+    def upstream(self):
+        _FakeOpenMeteo.delay, _FakeOpenMeteo.status, _FakeOpenMeteo.requests = 0.0, 200, 0
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeOpenMeteo)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1/forecast"
+        server.shutdown()
+        server.server_close()
+
+    def _client(self, url, **kwargs):
+        collector = OpenMeteoCollector(cache_enabled=False)
+        collector.forecast_url = url
+        breaker = CircuitBreaker("test", failure_threshold=3, cooldown_seconds=kwargs.pop('cooldown', 60))
+        return ResilientWeatherCollector(collector, breaker=breaker, **kwargs)
+
+    def test_serves_stale_while_refreshing(self, upstream):
+        """Test an expired entry is returned without waiting for a slow upstream"""
+        client = self._client(upstream, fresh_seconds={'current': 0, 'forecast': 0})
+        assert client.get_current_weather(16.05, 108.2)['current']['temperature_2m'] == 30.0
+
+        _FakeOpenMeteo.delay = 1.0
+        started = time.perf_counter()
+        data = client.get_current_weather(16.05, 108.2)
+        elapsed = time.perf_counter() - started
+
+        assert data['current']['temperature_2m'] == 30.0
+        assert elapsed < 0.5
+        assert client.get_stats()['stale_hits'] == 1
+
+        deadline = time.time() + 5
+        while client.get_stats()['background_refreshes'] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert client.get_stats()['background_refreshes'] == 1
+
+    def test_breaker_trips_and_short_circuits(self, upstream):
+        """Test consecutive failures open the circuit and stop upstream calls"""
+        _FakeOpenMeteo.status = 503
+        client = self._client(upstream)
+
+        for i in range(3):
+            assert client.get_current_weather(10.0 + i, 106.0) == {}
+        assert client.breaker.state == CircuitBreaker.OPEN
+        assert _FakeOpenMeteo.requests == 3
+
+        _FakeOpenMeteo.delay = 2.0
+        started = time.perf_counter()
+        assert client.get_current_weather(11.5, 106.0) == {}
+        assert time.perf_counter() - started < 0.5
+        assert _FakeOpenMeteo.requests == 3
+        assert client.get_stats()['circuit_breaker']['short_circuited'] == 1
+
+    def test_breaker_recovers_after_cooldown(self, upstream):
+        """Test a successful half-open trial closes the circuit"""
+        _FakeOpenMeteo.status = 500
+        client = self._client(upstream, cooldown=0.1)
+        for i in range(3):
+            client.get_current_weather(10.0 + i, 106.0)
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+        time.sleep(0.15)
+        _FakeOpenMeteo.status = 200
+        assert client.get_current_weather(12.5, 106.0)['current']['temperature_2m'] == 30.0
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+    def test_short_deadlines_do_not_trip_breaker(self, upstream):
+        """Test timeouts shortened by the caller's deadline are not upstream failures"""
+        _FakeOpenMeteo.delay = 1.0
+        client = self._client(upstream)
+
+        started = time.perf_counter()
+        for i in range(4):
+            assert client.get_current_weather(16.0 + i, 108.2, timeout=0.2) == {}
+        assert client.get_current_weather(15.0, 108.2, timeout=0) == {}
+        assert time.perf_counter() - started < 3.0
+
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        assert client.get_stats()['circuit_breaker']['consecutive_failures'] == 0
+        assert client.get_stats()['upstream_failures'] == 5
+
+    def test_timeout_at_full_budget_counts_as_failure(self, upstream, monkeypatch):
+        """Test a slow upstream still counts when the call had the full timeout"""
+        monkeypatch.setattr(resilient_weather, 'WEATHER_API_TIMEOUT', 0.2)
+        _FakeOpenMeteo.delay = 1.0
+        client = self._client(upstream)
+
+        assert client.get_current_weather(16.05, 108.2, timeout=0.2) == {}
+        assert client.get_stats()['circuit_breaker']['consecutive_failures'] == 1
+
+
+
+class _CountingPredictor:
+    """Hazard predictor stub that counts model calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_risk(self, lat, lng, month=None, hazard_type='flood'):
+        self.calls += 1
+        return {'lat': lat, 'lng': lng, 'risk_level': 3, 'month': month,
+                'hazard_type': hazard_type, 'province': 'Đà Nẵng'}
+
+    def get_high_risk_provinces(self, month=None, min_score=3.0, limit=None):
+        return [{'province': 'Đà Nẵng', 'lat': 16.0544, 'lng': 108.2022}]
+
+
+class _RecordingWeather:
+    """Weather collector stub that records refreshed points"""
+
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh(self, lat, lng, days=7):
+        self.refreshed.append((lat, lng))
+        return True
+
+
+class TestPrewarmScheduler:
+    """Test predictive cache pre-warming"""
+
+    def test_warms_seasonal_targets_and_recent_demand(self):
+        """Test centroids and recently requested points are refreshed"""
+        predictor, weather = _CountingPredictor(), _RecordingWeather()
+        scheduler = PrewarmScheduler(predictor, weather, provinces=[])
+        scheduler.record_request(16.07, 108.22, 'Đà Nẵng', warm=False)
+
+        assert scheduler.run_once() == 2
+        assert weather.refreshed == [(16.0544, 108.2022), (16.07, 108.22)]
+        assert predictor.calls == 6  # 2 points x 3 hazard types
+
+    def test_user_requests_hit_warm_cache(self):
+        """Test requests after a cycle are served without the model"""
+        predictor, weather = _CountingPredictor(), _RecordingWeather()
+        scheduler = PrewarmScheduler(predictor, weather, provinces=['Đà Nẵng'])
+        scheduler.run_once()
+        calls = predictor.calls
+
+        result, hit = scheduler.predict_risk(16.0544, 108.2022, month=datetime.now().month, hazard_type='storm')
+        scheduler.record_request(16.0544, 108.2022, result['province'], warm=hit)
+        _, miss = scheduler.predict_risk(16.5, 108.0, hazard_type='flood')
+        scheduler.record_request(16.5, 108.0, 'Đà Nẵng', warm=miss)
+
+        assert hit is True
+        assert miss is False
+        assert predictor.calls == calls + 1
+        stats = scheduler.get_stats()
+        assert stats['target_provinces'] == ['Đà Nẵng']
+        assert stats['warm_hit_ratio'] == 0.5
+
+    def test_requested_point_is_warm_after_a_cycle(self):
+        """Test a point recorded as demand is served warm at its own coordinates"""
+        scheduler = PrewarmScheduler(_CountingPredictor(), _RecordingWeather(), provinces=['Đà Nẵng'])
+        scheduler.record_request(16.07391, 108.21537, 'Đà Nẵng', warm=False)
+        scheduler.run_once()
+
+        _, hit = scheduler.predict_risk(16.07391, 108.21537, hazard_type='flood')
+        assert hit is True
+
+    def test_cached_prediction_is_a_copy(self):
+        """Test enriching a served prediction does not alter the cache"""
+        scheduler = PrewarmScheduler(_CountingPredictor(), _RecordingWeather(), provinces=[])
+        result, _ = scheduler.predict_risk(16.0, 108.0, month=10)
+        result['risk_level'] = 5
+
+        cached, hit = scheduler.predict_risk(16.0, 108.0, month=10)
+        assert hit is True
+        assert cached['risk_level'] == 3
+
+
+
+def _daily_block(start: str, days: int, rain: float = 1.0) -> dict:
+    """Open-Meteo style daily block with constant values"""
+    first = datetime.strptime(start, "%Y-%m-%d")
+    daily = {'time': [(first + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]}
+    for name in ARCHIVE_DAILY_VARIABLES:
+        daily[name] = [rain] * days
+    return daily
+
+
+class TestWeatherArchive:
+    """Test the SQLite historical weather archive"""
+
+    def test_overlapping_ranges_share_data(self, tmp_path):
+        """Test a range inside an archived one needs no fetch"""
+        archive = WeatherArchive(tmp_path / "archive.db")
+        archive.store(16.05, 108.2, _daily_block("2023-10-01", 30))
+
+        assert archive.missing_ranges(16.05, 108.2, "2023-10-05", "2023-10-20") == []
+        data = archive.get_range(16.03, 108.17, "2023-10-05", "2023-10-20")  # same grid cell
+        assert len(data['daily']['time']) == 16
+        assert data['daily']['time'][0] == "2023-10-05"
+
+    def test_missing_ranges(self, tmp_path):
+        """Test only the unarchived days are reported, small gaps merged"""
+        archive = WeatherArchive(tmp_path / "archive.db")
+        archive.store(16.05, 108.2, _daily_block("2023-10-10", 10))
+
+        assert archive.missing_ranges(16.05, 108.2, "2023-10-01", "2023-10-31", merge_gap_days=0) == [
+            ("2023-10-01", "2023-10-09"), ("2023-10-20", "2023-10-31")
+        ]
+        assert archive.missing_ranges(16.05, 108.2, "2023-10-01", "2023-10-31", merge_gap_days=10) == [
+            ("2023-10-01", "2023-10-31")
+        ]
+
+    def test_retention_evicts_least_recently_used_cells(self, tmp_path):
+        """Test the row limit is enforced by dropping whole cells"""
+        archive = WeatherArchive(tmp_path / "archive.db", max_rows=50)
+        archive.store(10.0, 106.0, _daily_block("2023-01-01", 20))
+        archive.store(16.0, 108.0, _daily_block("2023-01-01", 20))
+        archive.get_range(10.0, 106.0, "2023-01-01", "2023-01-02")  # touch first cell
+        archive.store(21.0, 105.8, _daily_block("2023-01-01", 20))
+
+        stats = archive.get_stats()
+        assert stats['rows'] == 40
+        assert archive.get_range(16.0, 108.0, "2023-01-01", "2023-01-20") == {}
+        assert archive.get_range(10.0, 106.0, "2023-01-01", "2023-01-20") != {}
+
+    def test_collector_fetches_only_missing_days(self, tmp_path):
+        """Test get_historical_weather requests just the gap"""
+        collector = OpenMeteoCollector(cache_enabled=True, archive=WeatherArchive(tmp_path / "archive.db"))
+        requested = []
+
+        def fake_fetch(lat, lng, start_date, end_date):
+            requested.append((start_date, end_date))
+            days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+            return {'daily': _daily_block(start_date, days)}
+
+        collector._fetch_historical = fake_fetch
+        collector.get_historical_weather(16.05, 108.2, "2023-09-01", "2023-09-30")
+        data = collector.get_historical_weather(16.05, 108.2, "2023-09-15", "2023-10-31")
+
+        assert requested == [("2023-09-01", "2023-09-30"), ("2023-10-01", "2023-10-31")]
+        assert len(data['daily']['time']) == 47
+
+
+def _station(province, lat, lng, temp, rain, start="2020-01-01", days=731):
+    """Station entry in the bundled archive format with constant values"""
+    first = datetime.strptime(start, "%Y-%m-%d")
+    times = [(first + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    return {
+        'success': True, 'province': province, 'lat': lat, 'lng': lng,
+        'start_date': times[0], 'end_date': times[-1],
+        'daily_data': {
+            'time': times,
+            'temperature_2m_max': [temp + 4] * days,
+            'temperature_2m_min': [temp - 4] * days,
+            'temperature_2m_mean': [temp] * days,
+            'precipitation_sum': [rain] * days,
+            'wind_speed_10m_max': [10.0] * days,
+        }
+    }
+
+
+class TestClimatology:
+    """Test offline day-of-year climatology"""
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "weather.json"
+        path.write_text(json.dumps({'data': [
+            _station("A", 21.0, 105.0, 20.0, 2.0),
+            _station("B", 11.0, 107.0, 30.0, 10.0),
+        ]}))
+        return path
+
+    def test_day_slot_aligns_calendar_dates(self):
+        """Test the same calendar date maps to one slot in leap and normal years"""
+        assert day_slot(datetime(2023, 3, 1)) == day_slot(datetime(2024, 3, 1)) == 60
+        assert day_slot(datetime(2024, 2, 29)) == 59
+        assert day_slot(datetime(2023, 12, 31)) == 365
+
+    def test_station_point_returns_station_values(self, source, tmp_path):
+        """Test a query on top of a station returns its climatology"""
+        clim = Climatology(source_path=source, cache_path=tmp_path / "clim.npz")
+        estimate = clim.estimate(21.0, 105.0, datetime(2025, 7, 1))
+
+        assert estimate['temperature'] == 20.0
+        assert estimate['precipitation_quantiles']['p90'] == 2.0
+        assert estimate['nearest_station'] == "A"
+
+    def test_idw_interpolates_between_stations(self, source, tmp_path):
+        """Test a midpoint gets an equal blend, nearer points lean to the near station"""
+        clim = Climatology(source_path=source, cache_path=tmp_path / "clim.npz")
+        mid = clim.estimate(16.0, 106.0, datetime(2025, 7, 1))
+        near_a = clim.estimate(20.0, 105.2, datetime(2025, 7, 1))
+
+        assert mid['temperature'] == pytest.approx(25.0, abs=0.2)
+        assert 20.0 < near_a['temperature'] < 21.0
+
+    def test_cache_reused_and_invalidated(self, source, tmp_path):
+        """Test statistics are loaded from the .npz until the source changes"""
+        cache = tmp_path / "clim.npz"
+        Climatology(source_path=source, cache_path=cache).load()
+        assert cache.exists()
+
+        clim = Climatology(source_path=source, cache_path=cache)
+        clim._build = lambda: pytest.fail("should load from cache")
+        assert clim.load()
+
+        source.write_text(json.dumps({'data': [_station("C", 16.0, 108.0, 27.0, 5.0)]}))
+        rebuilt = Climatology(source_path=source, cache_path=cache)
+        assert rebuilt.estimate(16.0, 108.0)['nearest_station'] == "C"
+
+    def test_missing_source_is_unavailable(self, tmp_path):
+        """Test estimates are empty when there is no archive"""
+        clim = Climatology(source_path=tmp_path / "none.json", cache_path=None)
+        assert not clim.is_available
+        assert clim.estimate(21.0, 105.0) == {}
+        assert clim.outlook(21.0, 105.0) == {}
+
+    def test_archive_without_station_data_is_disabled(self, tmp_path):
+        """Test an archive with only failed fetches disables climatology instead of raising"""
+        source = tmp_path / "weather.json"
+        source.write_text(json.dumps({'data': [{'province': 'A', 'success': False, 'daily_data': None}]}))
+        clim = Climatology(source_path=source, cache_path=tmp_path / "clim.npz")
+
+        assert not clim.load()
+        assert clim.features(21.0, 105.0) == {}
+        assert not (tmp_path / "clim.npz").exists()
+
+
+def _weather_source(tmp_path):
+    """Two-province archive at the path WeatherForecaster(data_dir=tmp_path) reads"""
+    path = tmp_path / "weather" / "vietnam_weather_2020_2024.json"
+    path.parent.mkdir()
+    stations = [
+        _station("Hà Nội", 21.0285, 105.8542, 20.0, 2.0, days=400),
+        _station("Khánh Hòa", 12.2585, 109.0526, 28.0, 6.0, days=400),
+    ]
+    stations[0]['daily_data']['temperature_2m_mean'] = [float(i) for i in range(400)]
+    path.write_text(json.dumps({'data': stations}))
+    return path
+
+
+class TestWeatherFrameLoader:
+    """Test flattening the weather archive for WeatherForecaster training"""
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        return _weather_source(tmp_path)
+
+    def test_flattens_with_lag_features(self, source, tmp_path):
+        """Test one row per province-day with previous-day lags per province"""
+        df, from_cache = load_weather_frame(source, tmp_path / "frame.npz")
+
+        assert not from_cache
+        assert len(df) == 800
+        assert df['province_id'].nunique() == 2
+        hanoi = df[df['province_id'] == 0]
+        assert hanoi['prev_temp'].iloc[1:].tolist() == hanoi['temperature'].iloc[:-1].tolist()
+        # No lag leaks across provinces, and humidity is absent from the archive
+        assert df.groupby('province_id')['prev_temp'].apply(lambda s: s.isna().sum()).tolist() == [1, 1]
+        assert df['humidity'].isna().all()
+
+    def test_frame_cache_reused(self, source, tmp_path):
+        """Test the binary cache is used until the archive changes"""
+        first, _ = load_weather_frame(source, tmp_path / "frame.npz")
+        second, from_cache = load_weather_frame(source, tmp_path / "frame.npz")
+
+        assert from_cache
+        assert first.equals(second)
+
+    def test_trains_on_archive_not_synthetic(self, source, tmp_path):
+        """Test training uses real rows and predicts only targets it has"""
+        forecaster = WeatherForecaster(data_dir=tmp_path)
+        metrics = forecaster.train(cache_path=tmp_path / "frame.npz")
+
+        assert metrics['status'] == 'success'
+        assert metrics['source'] == 'archive'
+        assert metrics['targets'] == ['temperature', 'rainfall']
+        assert 'prev_humid' not in forecaster.feature_columns
+        assert metrics['load_seconds'] >= 0 and metrics['train_seconds'] > 0
+
+        result = forecaster.predict(datetime(2021, 1, 10), 1, 1, {'temp': 28, 'humid': 70, 'rain': 6})
+        assert result['humidity'] == 70
+        assert 26 < result['temperature'] < 30
+
+
+class TestWeatherBatchForecast:
+    """Test the batched multi-province weather outlook"""
+
+    @pytest.fixture
+    def forecaster(self, tmp_path):
+        _weather_source(tmp_path)
+        forecaster = WeatherForecaster(data_dir=tmp_path)
+        forecaster.climatology.cache_path = None
+        forecaster.train(cache_path=None)
+        return forecaster
+
+    def test_rollout_matches_chained_predictions(self, forecaster):
+        """Test one batched step per day equals feeding predict() its own output"""
+        start = datetime(2021, 3, 1)
+        batch = forecaster.forecast_batch(start, days=3, province_ids=[0, 40])
+        assert [p['province_id'] for p in batch['provinces']] == [0, 40]
+
+        for province in batch['provinces']:
+            pid = province['province_id']
+            prev = forecaster.climatology.estimate(
+                VIETNAM_PROVINCES[province['province']]['lat'],
+                VIETNAM_PROVINCES[province['province']]['lng'],
+                start - timedelta(days=1)
+            )
+            current = {'temp': prev['temperature'], 'humid': 75, 'rain': prev['precipitation']}
+            for day, expected in enumerate(province['forecasts']):
+                # Unrounded state is fed forward in the batch, so compare loosely
+                single = forecaster.predict(start + timedelta(days=day), pid, province['region_id'], current)
+                assert single['temperature'] == pytest.approx(expected['temperature'], abs=1.0)
+                current = {'temp': expected['temperature'], 'humid': 75, 'rain': expected['rainfall']}
+
+    def test_outlook_cached_per_version_and_date(self, forecaster):
+        """Test the national outlook is computed once and subsets are slices"""
+        first = forecaster.forecast_batch(datetime(2021, 3, 1), days=7)
+        subset = forecaster.forecast_batch(datetime(2021, 3, 1), days=2, province_ids=[5])
+
+        assert not first['cached'] and subset['cached']
+        assert len(first['provinces']) == len(VIETNAM_PROVINCES)
+        assert subset['provinces'][0]['forecasts'] == first['provinces'][5]['forecasts'][:2]
+        assert subset['model_version'] == forecaster.model_version
+
+        forecaster.model_version = "retrained"
+        assert not forecaster.forecast_batch(datetime(2021, 3, 1), days=2)['cached']
+
+    def test_untrained_uses_climatology(self, tmp_path):
+        """Test the outlook falls back to climatology without a model"""
+        _weather_source(tmp_path)
+        forecaster = WeatherForecaster(data_dir=tmp_path)
+        forecaster.climatology.cache_path = None
+        batch = forecaster.forecast_batch(datetime(2021, 3, 1), days=2, province_ids=[0])
+
+        assert batch['model_version'] == "climatology"
+        assert batch['provinces'][0]['forecasts'][0]['rainfall'] == 2.0
+
+
+class _ConstantForecast:
+    """Weather collector stub returning the same daily values everywhere"""
+
+    def __init__(self, rain=10.0, wind=20.0, available=True):
+        self.rain = rain
+        self.wind = wind
+        self.available = available
+
+    def get_forecast(self, lat, lng, days=7, timeout=None):
+        if not self.available:
+            return {}
+        return {'daily': {
+            'time': [str(i) for i in range(days)],
+            'precipitation_sum': [self.rain] * days,
+            'wind_speed_10m_max': [self.wind] * days,
+        }}
+
+
+class TestRiskOutlook:
+    """Test the materialized risk outlook and its change feed"""
+
+    @pytest.fixture
+    def predictor(self, tmp_path):
+        return HazardZonePredictor(data_dir=tmp_path, cold_start=False)
+
+    def test_covers_every_province_hazard_and_day(self, predictor):
+        """Test one entry per province x hazard type x day"""
+        outlook = RiskOutlook(predictor, _ConstantForecast(), days=3)
+        outlook.run_once(start=datetime(2025, 10, 1).date())
+
+        result = outlook.get_outlook()
+        assert result['generation'] == 1
+        assert result['total'] == len(VIETNAM_PROVINCES) * 3 * 3
+        assert {e['date'] for e in result['entries']} == {'2025-10-01', '2025-10-02', '2025-10-03'}
+
+    def test_forecast_raises_risk_like_predict_endpoint(self, predictor):
+        """Test >200mm over the 7-day window raises flood risk by one level"""
+        outlook = RiskOutlook(predictor, _ConstantForecast(rain=40.0), days=2)
+        outlook.run_once(start=datetime(2025, 10, 1).date())
+
+        entry = outlook.get_outlook(province="Hà Nội", hazard_type="flood", day="2025-10-01")['entries'][0]
+        assert entry['total_precipitation'] == 280.0
+        assert entry['risk_level'] == min(5, entry['base_risk_level'] + 1)
+
+    def test_unavailable_forecast_keeps_base_risk(self, predictor):
+        """Test provinces without a forecast keep the base prediction"""
+        outlook = RiskOutlook(predictor, _ConstantForecast(available=False), days=1)
+        outlook.run_once(start=datetime(2025, 10, 1).date())
+
+        entries = outlook.get_outlook()['entries']
+        assert all(not e['weather_applied'] and e['risk_level'] == e['base_risk_level'] for e in entries)
+        assert outlook.forecast_failures == len(VIETNAM_PROVINCES)
+
+    def test_change_feed_reports_only_differences(self, predictor):
+        """Test the first run is a baseline and later runs emit only changed levels"""
+        weather = _ConstantForecast(rain=10.0, wind=20.0)
+        outlook = RiskOutlook(predictor, weather, days=2)
+        start = datetime(2025, 10, 1).date()
+        notified = []
+        outlook.add_listener(notified.append)
+
+        assert outlook.run_once(start=start) == []
+        assert outlook.run_once(start=start) == []
+
+        weather.wind = 80.0
+        changes = outlook.run_once(start=start)
+        assert changes and all(c['hazard_type'] == 'storm' for c in changes)
+        assert all(c['risk_level'] == c['previous_level'] + 1 for c in changes)
+        assert notified[-1] == changes
+
+        feed = outlook.get_changes(since=0, limit=5)
+        assert [c['seq'] for c in feed['changes']] == [1, 2, 3, 4, 5]
+        assert feed['next_since'] == 5 and feed['latest_seq'] == len(changes)
+        assert outlook.get_changes(since=feed['latest_seq'])['changes'] == []
+
+    def test_failed_forecast_keeps_previous_weather_entries(self, predictor):
+        """Test a failed fetch carries the last forecast-adjusted risk instead of reporting a downgrade"""
+        weather = _ConstantForecast(rain=40.0, wind=80.0)
+        outlook = RiskOutlook(predictor, weather, days=2)
+        start = datetime(2025, 10, 1).date()
+        outlook.run_once(start=start)
+        before = outlook.get_outlook()['entries']
+
+        weather.available = False
+        assert outlook.run_once(start=start) == []
+        assert outlook.get_outlook()['entries'] == before
+        assert all(e['weather_applied'] for e in before)
+
+    def test_new_horizon_day_not_reported(self, predictor):
+        """Test rolling over to the next day reports no changes for the day entering the horizon"""
+        outlook = RiskOutlook(predictor, _ConstantForecast(), days=2)
+        outlook.run_once(start=datetime(2025, 10, 1).date())
+        assert outlook.run_once(start=datetime(2025, 10, 2).date()) == []
+        assert {e['date'] for e in outlook.get_outlook()['entries']} == {'2025-10-02', '2025-10-03'}
+
+    def test_truncated_feed_flagged(self, predictor):
+        """Test a client behind the buffer is told to resync"""
+        weather = _ConstantForecast(wind=20.0)
+        outlook = RiskOutlook(predictor, weather, days=2, max_changes=3)
+        start = datetime(2025, 10, 1).date()
+        outlook.run_once(start=start)
+        weather.wind = 80.0
+        outlook.run_once(start=start)
+
+        assert outlook.get_changes(since=0)['truncated']
+        assert not outlook.get_changes(since=outlook.get_changes()['latest_seq'] - 1)['truncated']
+
+
+
+class _FeedStub:
+    """Fake collector feed: returns queued batches and records call times"""
+
+    def __init__(self, batches=None, delay=0.0, fail=False):
+        self.batches = list(batches or [])
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self):
+        started = time.monotonic()
+        time.sleep(self.delay)
+        self.calls.append((started, time.monotonic()))
+        if self.fail:
+            raise ConnectionError("feed down")
+        return self.batches.pop(0) if self.batches else []
+
+
+class TestIngestionScheduler:
+    """Test concurrent collector polling"""
+
+    @staticmethod
+    def _item(n, minutes_old=0):
+        created = (datetime.now() - timedelta(minutes=minutes_old)).isoformat()
+        return {'id': f"NEWS_{n}", 'link': f"https://example.vn/{n}", 'created_at': created}
+
+    def test_interval_adapts_to_new_items(self):
+        """Test new items shorten the interval and repeats or errors lengthen it"""
+        feed = _FeedStub(batches=[[self._item(1, 10), self._item(2, 30)], [self._item(2)]])
+        source = PollSource("news", feed, host="a.vn", base_interval=100, min_interval=10, max_interval=1000)
+        received = []
+        scheduler = IngestionScheduler([source], sink=lambda name, items: received.append((name, items)))
+
+        assert len(scheduler.poll(source)) == 2
+        assert source.interval == 50
+        assert scheduler.poll(source) == []
+        assert source.interval == 75
+        assert [len(items) for _, items in received] == [2]
+
+        stats = scheduler.get_stats()['sources']['news']
+        assert stats['polls'] == 2 and stats['items'] == 3 and stats['new_items'] == 2
+        assert 10 * 60 <= stats['ingest_lag_s'] <= 30 * 60
+        assert stats['new_per_minute'] > 0
+
+        failing = PollSource("down", _FeedStub(fail=True), host="b.vn", base_interval=100, max_interval=1000)
+        assert scheduler.poll(failing) == []
+        assert failing.errors == 1 and failing.interval == 150
+        assert 'ConnectionError' in failing.last_error
+
+    def test_items_not_accepted_are_offered_again(self):
+        """Test items the sink did not take come back on the next poll"""
+        batch = [self._item(1), self._item(2), self._item(3)]
+        source = PollSource("news", _FeedStub(batches=[batch, batch, batch]), host="a.vn")
+        offered = []
+
+        def sink(name, items):
+            offered.append([item['id'] for item in items])
+            return 1
+
+        scheduler = IngestionScheduler([source], sink=sink)
+        for _ in range(3):
+            scheduler.poll(source)
+        assert offered == [['NEWS_1', 'NEWS_2', 'NEWS_3'], ['NEWS_2', 'NEWS_3'], ['NEWS_3']]
+
+    def test_hosts_polled_concurrently_but_politely(self):
+        """Test different hosts overlap while polls of one host are serialized with a gap"""
+        same_a, same_b = _FeedStub(delay=0.2), _FeedStub(delay=0.2)
+        other = _FeedStub(delay=0.2)
+        sources = [
+            PollSource("vtv-1", same_a, host="vtv.vn", base_interval=60, min_interval=60),
+            PollSource("vtv-2", same_b, host="vtv.vn", base_interval=60, min_interval=60),
+            PollSource("vov", other, host="vov.vn", base_interval=60, min_interval=60),
+        ]
+        scheduler = IngestionScheduler(sources, workers=4, limiter=HostLimiter(concurrency=1, min_gap=0.1))
+        scheduler.start()
+        try:
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not (same_a.calls and same_b.calls and other.calls):
+                time.sleep(0.02)
+        finally:
+            scheduler.stop()
+
+        (first, second) = sorted(same_a.calls + same_b.calls)
+        assert second[0] >= first[1] + 0.1  # same host: after the first ends, plus the gap
+        assert other.calls[0][0] < first[1]  # other host: overlapped with the first
+        stats = scheduler.get_stats()
+        assert not stats['running']
+        assert all(s['polls'] == 1 for s in stats['sources'].values())
+
+
+
+class _FakeFeedServer(BaseHTTPRequestHandler):
+    """Local RSS host supporting ETag / Last-Modified, with injectable failures"""
+    FEED = b"<rss><channel><item><title>Lu lut</title></item></channel></rss>"
+    body = FEED
+    etag = '"v1"'
+    last_modified = None
+    failures = 0  # next N requests answer 503
+    requests = []
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests.append(dict(self.headers))
+        if cls.failures > 0:
+            cls.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if (cls.etag and self.headers.get('If-None-Match') == cls.etag) or \
+                (cls.last_modified and self.headers.get('If-Modified-Since') == cls.last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+        if cls.etag:
+            self.send_header('ETag', cls.etag)
+        if cls.last_modified:
+            self.send_header('Last-Modified', cls.last_modified)
+        self.send_header('Content-Length', str(len(cls.body)))
+        self.end_headers()
+        self.wfile.write(cls.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCachedHttpClient:
+    """Test conditional requests and retries against a local feed server"""
+
+    @pytest.fixture
+    def feed_url(self):
+        _FakeFeedServer.body, _FakeFeedServer.etag, _FakeFeedServer.last_modified = _FakeFeedServer.FEED, '"v1"', None
+        _FakeFeedServer.failures, _FakeFeedServer.requests = 0, []
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeFeedServer)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}/rss"
+        server.shutdown()
+        server.server_close()
+
+    def test_etag_revalidation_survives_restart(self, feed_url, tmp_path):
+        """Test a 304 returns the cached body, also from a new client on the same cache dir"""
+        client = CachedHttpClient(cache_dir=tmp_path)
+        first = client.get(feed_url)
+        assert first.status_code == 200 and not first.not_modified
+        assert 'Lu lut' in first.text
+
+        second = CachedHttpClient(cache_dir=tmp_path).get(feed_url)
+        assert second.not_modified and second.content == first.content
+        assert _FakeFeedServer.requests[-1]['If-None-Match'] == '"v1"'
+
+        _FakeFeedServer.etag = '"v2"'
+        _FakeFeedServer.body = _FakeFeedServer.body.replace(b"Lu lut", b"Bao so 3")
+        third = client.get(feed_url)
+        assert not third.not_modified and 'Bao so 3' in third.text
+        assert client.get(feed_url).not_modified
+        assert client.get_stats()['not_modified'] == 1
+
+    def test_last_modified_revalidation(self, feed_url, tmp_path):
+        """Test If-Modified-Since is sent when the server has no ETag"""
+        _FakeFeedServer.etag = None
+        _FakeFeedServer.last_modified = 'Mon, 06 Oct 2025 08:00:00 GMT'
+        client = CachedHttpClient(cache_dir=tmp_path)
+        client.get(feed_url)
+        assert client.get(feed_url).not_modified
+        assert _FakeFeedServer.requests[-1]['If-Modified-Since'] == _FakeFeedServer.last_modified
+
+    def test_retries_with_backoff_then_gives_up(self, feed_url, tmp_path):
+        """Test 5xx responses are retried and raise once retries are exhausted"""
+        client = CachedHttpClient(cache_dir=tmp_path, retries=2, backoff_base=0.01, max_backoff=0.05)
+        _FakeFeedServer.failures = 2
+        assert client.get(feed_url).status_code == 200
+        assert len(_FakeFeedServer.requests) == 3
+        assert client.get_stats()['retried'] == 2
+
+        _FakeFeedServer.failures = 5
+        with pytest.raises(requests.HTTPError):
+            client.get(feed_url)
+        assert client.get_stats()['failures'] == 1
+
+
+
+class TestSeenItemFilter:
+    """Test the persistent seen-item filter"""
+
+    @staticmethod
+    def _news(link, title, content="Mưa lớn gây ngập lụt"):
+        return {'link': link, 'title': title, 'content': content}
+
+    def test_canonical_link_ignores_feed_noise(self):
+        """Test scheme, www, tracking params, fragment and trailing slash are ignored"""
+        base = canonical_link("https://vnexpress.net/lu-lut-mien-trung-123.html?page=2")
+        assert canonical_link("http://www.vnexpress.net/lu-lut-mien-trung-123.html/?utm_source=rss&page=2#top") == base
+        assert canonical_link("https://vnexpress.net/lu-lut-mien-trung-124.html?page=2") != base
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added key is found and the false-positive rate is near target"""
+        bloom = BloomFilter(capacity=5000, error_rate=0.01)
+        added = [SeenItemFilter.keys(f"https://vtv.vn/{i}")[0] for i in range(5000)]
+        for key in added:
+            bloom.add(key)
+        assert all(key in bloom for key in added)
+        others = [SeenItemFilter.keys(f"https://vov.vn/{i}")[0] for i in range(5000)]
+        assert sum(key in bloom for key in others) / len(others) < 0.03
+
+    def test_bloom_count_ignores_repeated_keys(self):
+        """Test adding a key again does not count towards capacity"""
+        bloom = BloomFilter(capacity=100)
+        key = SeenItemFilter.keys("https://vtv.vn/same")[0]
+        for _ in range(500):
+            bloom.add(key)
+        assert bloom.count == 1
+
+    def test_only_new_items_pass_across_restarts(self, tmp_path):
+        """Test items are filtered by link or content, and the store survives a restart"""
+        db_path = tmp_path / "seen.db"
+        seen = SeenItemFilter(db_path=db_path, capacity=100)
+        first = [self._news("https://vtv.vn/a", "Bão số 3"), self._news("https://vtv.vn/b", "Lũ quét")]
+        assert seen.filter_new(first, source='NEWS_VTV') == first
+        assert seen.filter_new(first) == []
+        seen.close()
+
+        seen = SeenItemFilter(db_path=db_path, capacity=100)
+        batch = [
+            self._news("https://www.vtv.vn/a/?utm_source=rss", "Bão số 3 (cập nhật)"),  # same link
+            self._news("https://vov.vn/x", "  BÃO SỐ 3 ", "<p>Mưa lớn gây ngập  lụt</p>"),  # same content
+            self._news("https://vtv.vn/c", "Sạt lở đất"),
+            self._news("https://vtv.vn/c", "Sạt lở đất"),  # repeated within the batch
+        ]
+        assert [item['link'] for item in seen.filter_new(batch)] == ["https://vtv.vn/c"]
+        stats = seen.get_stats()
+        assert stats['stored_keys'] == 6 and stats['false_positives'] == 0
+
+    def test_bloom_grows_past_capacity(self, tmp_path):
+        """Test the filter is resized instead of saturating"""
+        seen = SeenItemFilter(db_path=tmp_path / "seen.db", capacity=10)
+        items = [self._news(f"https://vtv.vn/{i}", f"Tin {i}", f"Nội dung {i}") for i in range(50)]
+        assert len(seen.filter_new(items)) == 50
+        assert seen.bloom.capacity >= 100
+        assert seen.filter_new(items) == []
+
+    def test_ids_unique_within_one_second(self):
+        """Test two alerts published in the same second get different ids"""
+        created = datetime(2025, 10, 6, 8, 0, 0)
+        first = item_id("DDMFC", created, "https://ddmfc.gov.vn/1")
+        assert first.startswith(f"DDMFC_{int(created.timestamp())}_")
+        assert first != item_id("DDMFC", created, "https://ddmfc.gov.vn/2")
+        assert first == item_id("DDMFC", created, "http://www.ddmfc.gov.vn/1/")
+        assert item_id("DDMFC", created, "", "Bão") != item_id("DDMFC", created, "", "Lũ")
+
+
+class TestAlertTextMatcher:
+    """Test the shared province / keyword matcher"""
+
+    matcher = AlertTextMatcher()
+
+    def test_leftmost_province_and_spellings(self):
+        """Test the first province in the text wins, whatever its spelling"""
+        result = self.matcher.analyze("Mưa lớn ở Quảng Nam, Đà Nẵng và Hà Nội")
+        assert result['province'] == 'Quảng Nam'
+        assert result['provinces'] == ['Quảng Nam', 'Đà Nẵng', 'Hà Nội']
+        assert self.matcher.analyze("Lũ quét (Hoà Bình): 3 người mất tích")['province'] == 'Hòa Bình'
+        assert self.matcher.analyze("Ngap lut o Quang Ngai")['province'] == 'Quảng Ngãi'
+        assert self.matcher.analyze("Triều cường tại TP.HCM")['province'] == 'Hồ Chí Minh'
+        assert self.matcher.analyze("Sạt lở ở Bà Rịa-Vũng Tàu")['province'] == 'Bà Rịa - Vũng Tàu'
+        assert self.matcher.analyze("Bão số 5 trên Biển Đông")['province'] == 'Toàn quốc'
+        assert normalize("Thanh Hoá") == normalize("THANH HÓA")
+
+    def test_severity(self):
+        """Test severity levels, including keywords hidden in province names"""
+        assert self.matcher.analyze("Rủi ro thiên tai cấp độ 4")['severity'] == 'critical'
+        assert self.matcher.analyze("Nguy cơ cao xảy ra lũ quét, cực kỳ nguy hiểm")['severity'] == 'critical'
+        assert self.matcher.analyze("Gió mạnh trên biển")['severity'] == 'high'
+        assert self.matcher.analyze("Mưa vừa ở Cao Bằng")['severity'] == 'medium'
+
+    def test_alert_type_profiles(self):
+        """Test hazard precedence differs between news and NCHMF bulletins"""
+        text = "Bão số 3 gây lũ lớn trên các sông"
+        assert self.matcher.analyze(text)['alert_type'] == 'disaster'
+        assert self.matcher.analyze(text, profile='nchmf')['alert_type'] == 'weather'
+        assert self.matcher.analyze("Sơ tán dân vùng lũ")['alert_type'] == 'evacuation'
+        assert self.matcher.analyze("Dông và mưa rào", profile='nchmf')['alert_type'] == 'weather'
+        assert self.matcher.analyze("Khai mạc hội chợ")['alert_type'] == 'general'
+
+    def test_token_boundaries_and_relevance(self):
+        """Test keywords only match whole syllables"""
+        result = self.matcher.analyze("Xây lũy tre làng, khai trương cửa hàng")
+        assert result['alert_type'] == 'general'
+        assert not result['disaster_related']
+        assert self.matcher.analyze("Severe flooding hits central provinces")['disaster_related']
+        assert self.matcher.analyze("Cảnh báo sạt lở đất")['disaster_related']
+
+    def test_extra_places(self):
+        """Test additional place names report their province"""
+        matcher = AlertTextMatcher(extra_places={'Hội An': 'Quảng Nam'})
+        assert matcher.analyze("Ngập sâu ở phố cổ Hội An")['province'] == 'Quảng Nam'
+
+
+def _nchmf_page(warnings) -> bytes:
+    """NCHMF-like listing page; warnings are (iso date, text), newest first"""
+    items = ''.join(
+        f'<div class="news-item" data-date="{date}"><h3>{text}</h3><!-- ad --><p>Theo NCHMF</p></div>'
+        for date, text in warnings
+    )
+    return f'<html><body><div class="menu"><a href="#">Trang chủ</a></div>{items}</body></html>'.encode('utf-8')
+
+
+class _FakeNchmfServer(BaseHTTPRequestHandler):
+    """Local NCHMF host serving pages by path (404 otherwise)"""
+    pages = {}
+    requests = []
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests.append(self.path)
+        body = cls.pages.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body or b'')))
+        self.end_headers()
+        self.wfile.write(body or b'')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNCHMFParsing:
+    """Test NCHMF parser backends, incremental fetches and archive paging"""
+
+    @pytest.fixture
+    def collector(self):
+        pytest.importorskip("bs4")
+        from data_collectors.nchmf_collector import NCHMFCollector
+        _FakeNchmfServer.pages, _FakeNchmfServer.requests = {}, []
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeNchmfServer)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        collector = NCHMFCollector(delay_seconds=0, http_client=CachedHttpClient(cache_dir=None))
+        collector.MAIN_PAGE = f"{base}/index.html"
+        collector.ARCHIVE_PAGE = base + "/archive?page={page}"
+        yield collector
+        server.shutdown()
+        server.server_close()
+
+    def test_backends_agree(self, collector):
+        """Test lxml and html.parser extract the same warnings"""
+        pytest.importorskip("lxml")
+        from data_collectors.nchmf_collector import NCHMFCollector
+        page = _nchmf_page([
+            ("2025-10-06T08:00:00", "Cảnh báo lũ quét tại Quảng Nam, cấp độ 3"),
+            ("2025-10-05T20:00:00", "Tin bão số 10 trên Biển Đông (Hoà Bình)"),
+        ])
+        results = []
+        for parser in ('lxml', 'html.parser'):
+            parsed = NCHMFCollector(delay_seconds=0, http_client=collector.http, parser=parser)._parse_page(page)[0]
+            results.append([(w['id'], w['content'], w['province'], w['severity'], w['alert_type']) for w in parsed])
+        assert results[0] == results[1]
+        assert results[0][0][1] == "Cảnh báo lũ quét tại Quảng Nam, cấp độ 3 Theo NCHMF"
+        assert results[0][1][2:] == ('Hòa Bình', 'medium', 'weather')
+
+    def test_incremental_stops_at_last_seen(self, collector):
+        """Test an incremental fetch returns only warnings above the last seen one"""
+        old = [("2025-10-05T08:00:00", f"Cảnh báo mưa lớn khu vực Bắc Bộ, bản tin {i}") for i in range(3)]
+        _FakeNchmfServer.pages["/index.html"] = _nchmf_page(old)
+        assert len(collector.fetch_warnings(incremental=True)) == 3
+        assert collector.fetch_warnings(incremental=True) == []
+
+        _FakeNchmfServer.pages["/index.html"] = _nchmf_page(
+            [("2025-10-06T08:00:00", "Tin áp thấp nhiệt đới gần Biển Đông")] + old
+        )
+        new = collector.fetch_warnings(incremental=True)
+        assert [w['content'] for w in new] == ["Tin áp thấp nhiệt đới gần Biển Đông Theo NCHMF"]
+        assert len(collector.fetch_warnings()) == 4
+
+    def test_history_pages_back_in_parallel(self, collector):
+        """Test archive paging stops at the first page older than the window"""
+        now = datetime.now()
+        for page in range(1, 9):
+            _FakeNchmfServer.pages[f"/archive?page={page}"] = _nchmf_page([
+                ((now - timedelta(days=(page - 1) * 4 + i)).isoformat(timespec='seconds'),
+                 f"Cảnh báo lũ trên sông Hồng, trang {page} tin {i}")
+                for i in range(4)
+            ])
+        warnings = collector.fetch_historical_warnings(days_back=10, concurrency=2)
+        created = [w['created_at'] for w in warnings]
+        assert len(warnings) == 10 and created == sorted(created, reverse=True)
+        assert len({w['id'] for w in warnings}) == 10
+        # page 3 reaches past the window; at most `concurrency` pages beyond it were requested
+        assert set(_FakeNchmfServer.requests) <= {f"/archive?page={p}" for p in range(1, 6)}
+
+        _FakeNchmfServer.pages = {}
+        assert collector.fetch_historical_warnings(days_back=10) == []
+
+    def test_history_requests_spaced_per_host(self, collector):
+        """Test parallel archive workers still start requests delay_seconds apart"""
+        now = datetime.now()
+        for page in range(1, 5):
+            _FakeNchmfServer.pages[f"/archive?page={page}"] = _nchmf_page([
+                ((now - timedelta(hours=page)).isoformat(timespec='seconds'), f"Cảnh báo mưa lớn, trang {page}")
+            ])
+        started, get = [], collector.http.get
+        collector.http.get = lambda url, **kwargs: started.append(time.monotonic()) or get(url, **kwargs)
+        collector.delay_seconds = 0.1
+
+        assert len(collector.fetch_historical_warnings(days_back=10, concurrency=4, max_pages=4)) == 4
+        started.sort()
+        assert all(b - a >= 0.09 for a, b in zip(started, started[1:]))
+
+    def test_history_mixes_utc_and_local_dates(self, collector):
+        """Test UTC data-date stamps compare with the naive cutoff and dates"""
+        now = datetime.now()
+        utc = datetime.now(timezone.utc)
+        _FakeNchmfServer.pages["/archive?page=1"] = _nchmf_page([
+            (utc.strftime('%Y-%m-%dT%H:%M:%SZ'), "Cảnh báo mưa lớn khu vực Nam Bộ"),
+            ((now - timedelta(days=1)).isoformat(timespec='seconds'), "Cảnh báo lũ trên sông Cả"),
+            ((utc - timedelta(days=20)).isoformat(timespec='seconds'), "Tin bão số 3 trên Biển Đông"),
+        ])
+        warnings = collector.fetch_historical_warnings(days_back=10)
+        assert len(warnings) == 2
+        assert all(datetime.fromisoformat(w['created_at']).tzinfo is None for w in warnings)
+        assert abs(datetime.fromisoformat(warnings[0]['created_at']) - now) < timedelta(minutes=1)
+
+
+class _BatchScorer:
+    """Scorer stub recording batch sizes; can be held to back up the pipeline"""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict_batch(self, features_list):
+        self.release.wait(5)
+        self.batches.append(len(features_list))
+        return [features['severity_score'] * 20.0 for features in features_list]
+
+
+class _ExactDuplicateDetector:
+    """Duplicate detector stub: same province and same case-folded content; can be made to fail"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0  # next calls that raise
+
+    def batch_find_duplicates(self, new_alerts, existing_alerts):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("embedding model unavailable")
+        return {
+            new['id']: [
+                {'alert': old, 'similarity': 1.0} for old in existing_alerts
+                if old['province'] == new['province'] and old['content'].casefold() == new['content'].casefold()
+            ]
+            for new in new_alerts
+        }
+
+
+def _collected(i, content, province='Quảng Nam', severity='high'):
+    return {
+        'id': f"NEWS_{i}", 'source': 'NEWS_VTV', 'content': content, 'severity': severity,
+        'alert_type': 'disaster', 'province': province, 'created_at': datetime.now().isoformat(),
+    }
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+class TestAlertPipeline:
+    """Test the collector -> scored alert pipeline"""
+
+    def _pipeline(self, tmp_path, **kwargs):
+        self.scorer = _BatchScorer()
+        self.detector = _ExactDuplicateDetector()
+        self.persisted = []
+        self.store = DataCollector(db_path=tmp_path / "feedback.db")
+        return AlertPipeline(
+            self.scorer, self.detector, FeatureExtractor(), self.store,
+            sink=self.persisted.append, batch_wait=0.05, **kwargs
+        )
+
+    def test_normalize_alert(self):
+        """Test collector dicts are clamped to the scorer's vocabulary"""
+        alert = normalize_alert({'id': 'X_1', 'title': ' Lũ quét ', 'severity': 'EXTREME',
+                                 'alert_type': 'storm', 'created_at': '2025-10-06T01:00:00Z'}, 'nchmf')
+        assert alert['alert_id'] == 'X_1' and alert['content'] == 'Lũ quét'
+        assert (alert['severity'], alert['alert_type'], alert['province']) == ('medium', 'general', 'Toàn quốc')
+        assert datetime.fromisoformat(alert['created_at']).tzinfo is None
+        assert normalize_alert({'content': '  '}, 'news') is None
+
+    def test_dedupes_scores_and_persists_in_batches(self, tmp_path):
+        """Test duplicates within a batch and across polls are dropped, the rest stored"""
+        pipeline = self._pipeline(tmp_path)
+        pipeline.start()
+        try:
+            pipeline.submit('news:vtv', [
+                _collected(1, "Lũ quét tại Nam Trà My"),
+                _collected(2, "LŨ QUÉT TẠI NAM TRÀ MY"),  # same story, same batch
+                _collected(3, "Lũ quét tại Nam Trà My", province='Kon Tum'),
+                _collected(4, "Sạt lở đèo Lò Xo", severity='critical'),
+                {'id': 'NEWS_5', 'content': ''},  # invalid
+            ])
+            assert _wait_for(lambda: len(self.persisted) == 3)
+            pipeline.submit('news:vov', [_collected(6, "Sạt lở đèo Lò Xo"), _collected(1, "Lũ quét tại Nam Trà My")])
+            assert _wait_for(lambda: pipeline.stages['dedupe'].received == 6)
+        finally:
+            pipeline.stop()
+
+        assert [a['alert_id'] for a in self.persisted] == ['NEWS_1', 'NEWS_3', 'NEWS_4']
+        assert self.persisted[2]['priority_score'] == 80.0
+        assert max(self.scorer.batches) > 1 and sum(self.scorer.batches) == 3
+        stored = self.store.get_recent_ingested_alerts()
+        assert {a['alert_id'] for a in stored} == {'NEWS_1', 'NEWS_3', 'NEWS_4'}
+
+        stats = pipeline.get_stats()['stages']
+        assert stats['fetch']['received'] == 7 and stats['fetch']['dropped'] == 0
+        assert stats['normalize']['dropped'] == 1
+        assert stats['dedupe']['dropped'] == 3
+        assert stats['persist']['emitted'] == 3
+        assert not pipeline.get_stats()['running']
+
+    def test_dedupe_window_survives_restart(self, tmp_path):
+        """Test a restarted pipeline still drops alerts it stored before"""
+        pipeline = self._pipeline(tmp_path)
+        pipeline.start()
+        pipeline.submit('ddmfc', [_collected(1, "Bão số 3 đổ bộ")])
+        assert _wait_for(lambda: len(self.persisted) == 1)
+        pipeline.stop()
+
+        restarted = self._pipeline(tmp_path)
+        restarted.start()
+        restarted.submit('nchmf', [_collected(9, "Bão số 3 đổ bộ"), _collected(10, "Mưa lớn ở Huế")])
+        assert _wait_for(lambda: len(self.persisted) == 1)
+        restarted.stop()
+        assert self.persisted[0]['alert_id'] == 'NEWS_10'
+
+    def test_backpressure_blocks_then_drops(self, tmp_path):
+        """Test a stalled stage fills the bounded queues and submit() gives up"""
+        pipeline = self._pipeline(tmp_path, queue_size=1, batch_size=1, submit_timeout=0.1)
+        self.scorer.release.clear()
+        pipeline.start()
+        items = [_collected(i, f"Tin số {i} về lũ") for i in range(10)]
+        accepted = pipeline.submit('news:vtv', items)
+        assert accepted < 10
+        assert pipeline.get_stats()['stages']['fetch']['dropped'] == 10 - accepted
+        self.scorer.release.set()
+        pipeline.stop()
+        assert len(self.persisted) == accepted
+
+    def test_failed_batches_are_retried_then_dead_lettered(self, tmp_path):
+        """Test a failing stage retries its batch and keeps what still fails for the next start"""
+        pipeline = self._pipeline(tmp_path, retries=1, retry_backoff=0.01)
+        self.detector.failures = 1
+        pipeline.start()
+        pipeline.submit('news:vtv', [_collected(1, "Lũ quét tại Nam Trà My")])
+        assert _wait_for(lambda: len(self.persisted) == 1)
+
+        self.detector.failures = 2
+        pipeline.submit('news:vtv', [_collected(2, "Sạt lở đèo Lò Xo")])
+        assert _wait_for(lambda: pipeline.stages['dedupe'].dead_lettered == 1)
+        pipeline.stop()
+        assert len(self.persisted) == 1
+
+        restarted = self._pipeline(tmp_path, retries=1, retry_backoff=0.01)
+        restarted.start()
+        assert _wait_for(lambda: len(self.persisted) == 1)
+        restarted.stop()
+        assert self.persisted[0]['alert_id'] == 'NEWS_2'
+        assert self.store.take_dead_letters() == []
+
+    def test_items_marked_seen_only_once_handled(self, tmp_path):
+        """Test collector keys are marked after storing (or discarding), and not stored themselves"""
+        seen = SeenItemFilter(db_path=tmp_path / "seen.db")
+        pipeline = self._pipeline(tmp_path, seen_filter=seen)
+        items = [_collected(1, "Lũ quét tại Nam Trà My"), _collected(2, "LŨ QUÉT TẠI NAM TRÀ MY")]
+        keys = []
+        for item in items:
+            item_keys = SeenItemFilter.keys(f"https://vtv.vn/{item['id']}", item['content'])
+            item[SEEN_KEYS_FIELD] = [key.hex() for key in item_keys]
+            keys.append(item_keys)
+        assert not any(seen.seen(k) for k in keys)
+
+        pipeline.start()
+        pipeline.submit('news:vtv', items)
+        assert _wait_for(lambda: len(self.persisted) == 1)
+        pipeline.stop()
+
+        assert all(seen.seen(k) for k in keys)  # stored one and its duplicate
+        assert SEEN_KEYS_FIELD not in self.persisted[0]
+        assert SEEN_KEYS_FIELD not in self.store.get_recent_ingested_alerts()[0]
+
+    def test_scorer_batch_matches_single_predictions(self):
+        """Test predict_batch gives the same scores as predict"""
+        scorer = AlertScoringModel(cold_start=True)
+        extractor = FeatureExtractor()
+        features = [
+            extractor.extract_features(normalize_alert(_collected(i, "Lũ lớn", severity=severity), 'news'))
+            for i, severity in enumerate(['low', 'medium', 'high', 'critical'])
+        ]
+        assert scorer.predict_batch(features) == pytest.approx([scorer.predict(f) for f in features])
+
+
+class TestOfflineGeocoder:
+    """Test gazetteer lookups for alerts without coordinates"""
+
+    geocoder = OfflineGeocoder()
+
+    def test_district_from_text_within_province(self):
+        """Test the first district named in the alert's province wins"""
+        entry = self.geocoder.geocode('Quảng Nam', text="Lũ quét ở Nam Trà My, sạt lở tại Bắc Trà My")
+        assert (entry['name'], entry['level']) == ('Nam Trà My', 'district')
+        assert self.geocoder.geocode('Hồ Chí Minh', district='Quận 1')['lat'] == pytest.approx(10.7756)
+        assert self.geocoder.geocode('TP.HCM', district='huyện Cần Giờ')['name'] == 'Cần Giờ'
+        assert self.geocoder.geocode(text="Ngap lut o Hoi An")['province'] == 'Quảng Nam'
+
+    def test_ambiguous_names_and_fallbacks(self):
+        """Test names shared by provinces need the province; otherwise the province is used"""
+        assert self.geocoder.geocode('Cần Thơ', text="Mưa lớn ở Phong Điền")['lat'] == pytest.approx(9.99)
+        assert self.geocoder.geocode(text="Mưa lớn ở Phong Điền") is None
+        assert self.geocoder.geocode('Đắk Lắk', text="Lũ ở Đắk Lắk")['level'] == 'province'  # not district "Lắk"
+        assert self.geocoder.geocode('Hà Nội', text="Ngập ở Quận 10")['level'] == 'province'  # not "Quận 1"
+        assert self.geocoder.geocode('Bà Rịa - Vũng Tàu')['name'] == 'Bà Rịa-Vũng Tàu'
+        assert self.geocoder.geocode('Toàn quốc', text="Bão trên Biển Đông") is None
+
+    def test_ordinary_words_are_not_places(self):
+        """Test names only match as written as places or after an administrative prefix"""
+        assert self.geocoder.find_in_text("Mưa lớn ở các tỉnh duyên hải Nam Trung Bộ") is None
+        assert self.geocoder.find_in_text("Duyên hải Nam Trung Bộ có mưa to") is None
+        assert self.geocoder.find_in_text("Duyên Hải Nam Trung Bộ có mưa to") is None
+        assert self.geocoder.find_in_text("Lực lượng cứu hộ được vinh danh") is None
+        assert self.geocoder.find_in_text("Vinh danh lực lượng cứu hộ") is None
+        assert self.geocoder.find_in_text("lũ ở hội an") is None
+        assert self.geocoder.find_in_text("Ngập sâu ở thị xã Duyên Hải")['name'] == 'Duyên Hải'
+        assert self.geocoder.find_in_text("Mưa lớn ở TP. Vinh")['name'] == 'Vinh'
+        assert self.geocoder.find_in_text("Sạt lở ở huyện ba vì")['name'] == 'Ba Vì'
+        assert self.geocoder.find_in_text("LŨ QUÉT Ở MÙ CANG CHẢI")['name'] == 'Mù Cang Chải'
+
+    def test_geocode_alert_feeds_distance_feature(self):
+        """Test filled coordinates give a non-zero distance to the user"""
+        alert = {'province': 'Lào Cai', 'content': 'Sạt lở đất ở Sa Pa', 'lat': None, 'lng': None,
+                 'created_at': datetime.now().isoformat(), 'user_lat': 21.0285, 'user_lng': 105.8542}
+        self.geocoder.geocode_alert(alert)
+        assert (alert['district'], alert['geo_precision']) == ('Sa Pa', 'district')
+        assert FeatureExtractor.extract_features(alert)['distance_km'] > 200
+
+        fixed = {'province': 'Lào Cai', 'content': 'Sa Pa', 'lat': 1.0, 'lng': 2.0}
+        assert self.geocoder.geocode_alert(fixed)['lat'] == 1.0 and 'geo_precision' not in fixed
+
+
+def _event(event_id, event_type, date, provinces, severity='high'):
+    return {'event_id': event_id, 'event_type': event_type, 'date': date,
+            'provinces_affected': provinces, 'severity': severity}
+
+
+class TestHistoricalEventStore:
+    """Test the indexed event store and its seasonal pattern table"""
+
+    EVENTS = [
+        _event('F1', 'flood', '2020-10-15', ['Quảng Bình'], 'critical'),
+        _event('F2', 'flood', '2021-10-20', ['Quảng Bình', 'Quảng Trị']),
+        _event('D1', 'drought', '2019-03-01', ['Ninh Thuận'], 'medium'),
+        _event('S1', 'weather', '2020-10-01', ['Toàn quốc']),
+        _event('H1', 'flood', '2022-10-05', ['Hồ Chí Minh'], 'low'),
+    ]
+
+    def test_patterns_match_event_counts(self, tmp_path):
+        """Test probabilities count local plus nationwide events of the month"""
+        store = HistoricalEventStore(tmp_path / "events.db")
+        store.add_events(self.EVENTS)
+
+        assert store.seasonal_pattern('Quảng Bình', 10) == pytest.approx({
+            'flood_probability': 2 / 3, 'storm_probability': 1 / 3, 'drought_probability': 0.0,
+            'avg_severity': (4 + 3 + 3) / 3, 'sample_size': 3
+        })
+        assert store.seasonal_pattern('Ninh Thuận', 3)['drought_probability'] == 1.0
+        # Alias spellings share one row; provinces without local events get the nationwide ones
+        assert store.seasonal_pattern('TP.HCM', 10) == store.seasonal_pattern('Hồ Chí Minh', 10)
+        assert store.seasonal_pattern('Hà Nội', 10)['storm_probability'] == 1.0
+        assert store.seasonal_pattern('Hà Nội', 3) == DEFAULT_SEASONAL_PATTERN
+        assert [e['event_id'] for e in store.events_for('Quảng Trị', 10)] == ['S1', 'F2']
+
+    def test_table_persists_and_updates(self, tmp_path):
+        """Test a reopened store serves the stored table; replaced events rebuild it"""
+        store = HistoricalEventStore(tmp_path / "events.db")
+        store.add_events(self.EVENTS)
+        before = store.seasonal_pattern('Quảng Bình', 10)
+        store.close()
+
+        reopened = HistoricalEventStore(tmp_path / "events.db")
+        assert reopened.seasonal_pattern('Quảng Bình', 10) == before
+        reopened.add_events([_event('F1', 'flood', '2020-11-15', ['Quảng Bình'], 'critical')])
+        assert reopened.event_count == len(self.EVENTS)
+        assert reopened.seasonal_pattern('Quảng Bình', 10)['sample_size'] == 2
+        assert reopened.seasonal_pattern('Quảng Bình', 11)['avg_severity'] == 4.0
+
+    def test_collector_builds_store_once(self, tmp_path):
+        """Test get_seasonal_patterns fetches history only to fill an empty store"""
+        calls = []
+
+        class _Collector(HistoricalDataCollector):
+            def fetch_historical_disasters(self, start_year=2000, end_year=None, province=None, event_type=None):
+                calls.append(start_year)
+                return TestHistoricalEventStore.EVENTS
+
+        collector = _Collector(HistoricalEventStore(tmp_path / "events.db"))
+        for _ in range(3):
+            assert collector.get_seasonal_patterns('Quảng Trị', 10)['sample_size'] == 2
+        assert len(calls) == 1
+
+        restarted = _Collector(HistoricalEventStore(tmp_path / "events.db"))
+        assert restarted.get_seasonal_patterns('Quảng Bình', 10)['sample_size'] == 3
+        assert len(calls) == 1
+
+    def test_empty_source_is_fetched_once(self, tmp_path):
+        """Test an empty history falls back to defaults without refetching per call"""
+        calls = []
+
+        class _Collector(HistoricalDataCollector):
+            def fetch_historical_disasters(self, start_year=2000, end_year=None, province=None, event_type=None):
+                calls.append(start_year)
+                return []
+
+        collector = _Collector(HistoricalEventStore(tmp_path / "events.db"))
+        for _ in range(3):
+            assert collector.get_seasonal_patterns('Quảng Trị', 10)['sample_size'] == 0
+        assert len(calls) == 1
+
+
+_LANDSLIDE_CSV = """source_name,event_date,country_name,admin_division_name,landslide_size,fatality_count,latitude,longitude,notes
+a,10/15/2020 12:00:00 AM,Vietnam,Quảng Trị,large,22,16.7,107.0,x
+b,08/03/2017 05:30:00 PM,Vietnam,,medium,,22.33,103.84,"unnamed, near Sa Pa"
+c,08/03/2017 05:30:00 PM,Nepal,Bagmati,small,1,27.7,85.3,x
+d,07/01/2019 12:00:00 AM,Viet Nam,Lao Cai,unknown,0,22.4,104.0,x
+"""
+_EMDAT_CSV = """Dis No,Disaster Type,Country,ISO,Location,Start Year,Start Month,Start Day,Total Deaths,Total Affected
+1,Flood,Viet Nam,VNM,"Quang Binh, Quang Tri provinces",2020,10,6,102,500000
+2,Storm,Viet Nam,VNM,,2019,,,0,
+3,Earthquake,Viet Nam,VNM,Dien Bien,2001,2,19,,
+4,Flood,Thailand,THA,Bangkok,2011,9,1,800,2000000
+"""
+
+
+class TestKaggleIngestion:
+    """Test chunked normalization of Kaggle CSVs into partitioned columnar parts"""
+
+    def _ingest(self, tmp_path):
+        (tmp_path / "landslide").mkdir()
+        (tmp_path / "landslide" / "catalog.csv").write_text(_LANDSLIDE_CSV, encoding='utf-8')
+        (tmp_path / "emdat").mkdir()
+        (tmp_path / "emdat" / "emdat.csv").write_text(_EMDAT_CSV, encoding='utf-8')
+        out = tmp_path / "events"
+        stats = [
+            ingest_source('landslide_nasa', tmp_path / "landslide", out, chunk_rows=2),
+            ingest_source('emdat_vietnam', tmp_path / "emdat", out, chunk_rows=2),
+        ]
+        return out, stats
+
+    def test_normalizes_to_hazard_schema(self, tmp_path):
+        """Test rows outside Vietnam are dropped and provinces, dates and severities normalized"""
+        out, stats = self._ingest(tmp_path)
+        assert [(s['rows_read'], s['events_written']) for s in stats] == [(4, 3), (4, 3)]
+
+        events = read_hazard_events(out).sort_values(['source', 'date', 'province'])
+        rows = [(r.province, str(r.date.date()), r.hazard_type, r.severity) for r in events.itertuples()]
+        assert rows == [
+            ('Toàn quốc', '2019-01-01', 'storm', 2),
+            ('Quảng Bình', '2020-10-06', 'flood', 5),
+            ('Quảng Trị', '2020-10-06', 'flood', 5),
+            ('Lào Cai', '2017-08-03', 'landslide', 2),  # nearest centroid
+            ('Lào Cai', '2019-07-01', 'landslide', 2),
+            ('Quảng Trị', '2020-10-15', 'landslide', 4),
+        ]
+
+    def test_partitions_and_reingest(self, tmp_path):
+        """Test parts land in type/year partitions, reads prune them, re-ingesting replaces them"""
+        out, _ = self._ingest(tmp_path)
+        assert (out / "hazard_type=landslide" / "year=2017").is_dir()
+        assert sorted(read_hazard_events(out, years=[2019])['hazard_type']) == ['landslide', 'storm']
+        assert len(read_hazard_events(out, hazard_types=['drought'])) == 0
+
+        ingest_source('emdat_vietnam', tmp_path / "emdat", out, chunk_rows=100)
+        assert len(read_hazard_events(out)) == 6
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,135 @@
+"""Circuit breaker for calls to unreliable upstream services"""
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    closed     -> calls go through; `failure_threshold` failures in a row
+                  open the circuit
+    open       -> calls fail fast with CircuitOpenError for `cooldown_seconds`
+    half_open  -> one trial call is let through; success closes the
+                  circuit, failure opens it for another cool-down
+
+    Usage:
+        data = breaker.call(fetch, url, timeout=5)
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+        self.trips = 0
+        self.short_circuited = 0
+        self.last_error = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def _retry_in(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the half-open trial)"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Exception = None):
+        with self._lock:
+            self._failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200] if error is not None else None
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                    print(f"[CircuitBreaker] '{self.name}' opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """End a call whose outcome says nothing about upstream health"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn through the breaker; raises CircuitOpenError when open"""
+        return self.call_ignoring((), fn, *args, **kwargs)
+
+    def call_ignoring(self, ignored: tuple, fn, *args, **kwargs):
+        """
+        Like call(), but exceptions of the `ignored` types are re-raised
+        without counting as upstream failures (e.g. the caller's own
+        shortened timeout)
+        """
+        if not self.allow():
+            with self._lock:
+                retry_in = self._retry_in()
+            raise CircuitOpenError(self.name, retry_in)
+        try:
+            result = fn(*args, **kwargs)
+        except ignored:
+            self.release()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def get_stats(self) -> dict:
+        """Breaker state for health reporting"""
+        with self._lock:
+            state = self._current_state()
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_in_s': round(self._retry_in(), 1) if state == self.OPEN else 0.0,
+                'trips': self.trips,
+                'short_circuited': self.short_circuited,
+                'last_error': self.last_error,
+            }
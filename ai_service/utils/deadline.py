@@ -0,0 +1,89 @@
+"""Per-request deadlines propagated from the client to downstream calls"""
+import asyncio
+import time
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import DEADLINE_HEADER, DEADLINE_MAX_MS, DEADLINE_RESERVE_MS
+
+from fastapi import HTTPException
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request budget runs out before a required step"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Monotonic point in time by which a request must be answered
+
+    Created from the client's remaining budget (a relative number of
+    milliseconds, so client and server clocks need not agree). Each
+    downstream call takes its timeout from `timeout()`, i.e. whatever is
+    left of the budget, capped by that call's own default.
+
+    Usage:
+        deadline = Deadline.from_request(request)
+        data = collector.get_forecast(lat, lng, timeout=Deadline.timeout_for(deadline, 30))
+    """
+
+    def __init__(self, budget_ms: float, reserve_ms: float = DEADLINE_RESERVE_MS):
+        self.budget_ms = budget_ms
+        self.reserve_ms = reserve_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    @classmethod
+    def from_request(cls, request) -> 'Deadline':
+        """Deadline from the request header, or None if the client sent none"""
+        value = request.headers.get(DEADLINE_HEADER)
+        if value is None:
+            return None
+        try:
+            budget_ms = float(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header")
+        if budget_ms <= 0:
+            raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER} must be positive")
+        return cls(min(budget_ms, DEADLINE_MAX_MS))
+
+    def remaining(self) -> float:
+        """Seconds left, minus the reserve for building the response"""
+        return max(0.0, self.expires_at - time.monotonic() - self.reserve_ms / 1000)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for a downstream call: the remaining budget, at most `cap`"""
+        return min(cap, self.remaining())
+
+    @staticmethod
+    def timeout_for(deadline: 'Deadline', cap: float) -> float:
+        """`deadline.timeout(cap)`, or `cap` when there is no deadline"""
+        return cap if deadline is None else deadline.timeout(cap)
+
+
+async def run_within(deadline: Deadline, awaitable, stage: str):
+    """
+    Await `awaitable`, giving up when the deadline passes
+
+    Raises:
+        DeadlineExceeded: the budget ran out first (or was already spent)
+    """
+    if deadline is None:
+        return await awaitable
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage)
@@ -0,0 +1,208 @@
+"""Fast JSON and MessagePack serialization for API requests and responses"""
+import json
+from typing import get_args
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+def _default(obj):
+    """Fallback encoder for numpy values and dates (stdlib JSON and MessagePack)"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """
+    Serialize content to compact UTF-8 JSON bytes
+
+    Uses orjson when installed (numpy values supported natively),
+    otherwise the standard library encoder with the same output shape.
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        separators=(',', ':'),
+        default=_default
+    ).encode('utf-8')
+
+
+def _nested_model(annotation):
+    """The BaseModel inside Model / Optional[Model] / List[Model], if any"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def model_fields_only(content, model):
+    """
+    Drop keys the response model does not declare (nested models too)
+
+    The filtering FastAPI's response_model would do, without validation:
+    for endpoints that return a Response directly from already-checked
+    data but must not leak extra internal keys.
+    """
+    if isinstance(content, list):
+        return [model_fields_only(item, model) for item in content]
+    if not isinstance(content, dict):
+        return content
+    filtered = {}
+    for name, field in model.model_fields.items():
+        if name not in content:
+            continue
+        nested = _nested_model(field.annotation)
+        filtered[name] = content[name] if nested is None else model_fields_only(content[name], nested)
+    return filtered
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson
+
+    Returning this directly from an endpoint is the trusted fast path:
+    FastAPI skips response_model validation and jsonable_encoder, so
+    payloads assembled from already-validated data (e.g. alert dicts
+    echoed back by duplicate detection) are serialized exactly once.
+    It also skips response_model filtering; pass payloads with extra
+    keys through model_fields_only().
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    """Response rendered as MessagePack (application/msgpack)"""
+
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, use_bin_type=True, default=_default)
+
+
+def _media_type(header_value: str) -> str:
+    """Media type of a Content-Type header without parameters"""
+    return (header_value or '').split(';', 1)[0].strip().lower()
+
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    Decide whether the client should get a MessagePack response
+
+    An explicit Accept preference wins (msgpack q-value above JSON's).
+    Without one (no Accept, or */*), reply in the request body's format.
+    """
+    if not HAS_MSGPACK:
+        return False
+
+    accept = request.headers.get('accept', '')
+    msgpack_q = json_q = wildcard_q = None
+    for part in accept.lower().split(','):
+        media, _, params = part.strip().partition(';')
+        media = media.strip()
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(q, msgpack_q or 0.0)
+        elif media == 'application/json':
+            json_q = q
+        elif media in ('*/*', 'application/*'):
+            wildcard_q = q
+
+    if msgpack_q is not None:
+        return msgpack_q > 0 and msgpack_q >= (json_q if json_q is not None else 0.0)
+    if json_q is not None:
+        return False
+    return bool(request.scope.get('msgpack_body')) and wildcard_q != 0.0
+
+
+def negotiated_response(content, request: Request, status_code: int = 200, response_model=None) -> Response:
+    """
+    Render content as MessagePack or JSON according to request headers
+
+    With `response_model`, keys the model does not declare are dropped
+    first (see model_fields_only).
+    """
+    if response_model is not None:
+        content = model_fields_only(content, response_model)
+    if wants_msgpack(request):
+        return MsgPackResponse(content, status_code=status_code)
+    return ORJSONResponse(content, status_code=status_code)
+
+
+class MsgPackRequest(Request):
+    """Request whose body is MessagePack, exposed to FastAPI through json()"""
+
+    async def json(self):
+        if not hasattr(self, '_json'):
+            try:
+                self._json = msgpack.unpackb(await self.body(), raw=False)
+            except Exception:
+                raise HTTPException(status_code=400, detail="Invalid MessagePack body")
+        return self._json
+
+
+class MsgPackRoute(APIRoute):
+    """
+    Route that accepts MessagePack request bodies alongside JSON
+
+    FastAPI only decodes bodies declared as JSON, so msgpack requests are
+    re-labelled as JSON and decoded by MsgPackRequest.json(). The original
+    format is kept in scope['msgpack_body'] for response negotiation.
+    """
+
+    def get_route_handler(self):
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            if _media_type(request.headers.get('content-type')) in MSGPACK_MEDIA_TYPES:
+                if not HAS_MSGPACK:
+                    raise HTTPException(status_code=415, detail="MessagePack support not installed")
+                scope = dict(request.scope)
+                scope['headers'] = [
+                    (name, b'application/json' if name == b'content-type' else value)
+                    for name, value in request.scope['headers']
+                ]
+                scope['msgpack_body'] = True
+                request = MsgPackRequest(scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler